@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Aggregation functions for 'DataTable.group_by'.
+
+An accumulator does not store data per group, it only define how a state is
+created, updated with every value and converted to the result. The states
+of all the groups are stored by the aggregation loop, so one accumulator
+object serves all the groups. Like in SQL, 'None' values are ignored.
+
+Custom accumulators subclass 'Accumulator' and implement 'start', 'add' and
+'result'.
+"""
+
+
+class Accumulator(object):
+    u"""Base class of the aggregation functions."""
+
+    def __init__(self, column=None):
+        self.column = column
+        """Aggregated column (None for functions over the whole row)."""
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.column)
+
+    def start(self):
+        u"""Return the initial state of a group."""
+        return None
+
+    def add(self, state, value):
+        u"""Return the state updated with 'value'."""
+        raise NotImplementedError
+
+    def result(self, state):
+        u"""Return the aggregated value of a state."""
+        return state
+
+
+class Count(Accumulator):
+    u"""Number of rows (or of values not None when 'column' is given)."""
+
+    def start(self):
+        return 0
+
+    def add(self, state, value):
+        if self.column is not None and value is None:
+            return state
+        return state + 1
+
+
+class Sum(Accumulator):
+    def add(self, state, value):
+        if value is None:
+            return state
+        if state is None:
+            return value
+        return state + value
+
+
+class Min(Accumulator):
+    def add(self, state, value):
+        if value is None:
+            return state
+        if state is None or value < state:
+            return value
+        return state
+
+
+class Max(Accumulator):
+    def add(self, state, value):
+        if value is None:
+            return state
+        if state is None or value > state:
+            return value
+        return state
+
+
+class Mean(Accumulator):
+    u"""Arithmetic mean, state is the list [sum, count]."""
+
+    def start(self):
+        return [0, 0]
+
+    def add(self, state, value):
+        if value is not None:
+            state[0] += value
+            state[1] += 1
+        return state
+
+    def result(self, state):
+        if not state[1]:
+            return None
+        return float(state[0]) / state[1]
+
+
+class First(Accumulator):
+    _missing = object()
+
+    def start(self):
+        return self._missing
+
+    def add(self, state, value):
+        if state is self._missing:
+            return value
+        return state
+
+    def result(self, state):
+        return None if state is self._missing else state
+
+
+class Last(First):
+    def add(self, state, value):
+        return value
+
+
+# Name -> accumulator class, for aggregations given as strings.
+AGGREGATES = {
+    'count': Count,
+    'sum': Sum,
+    'min': Min,
+    'max': Max,
+    'mean': Mean,
+    'first': First,
+    'last': Last,
+}
+
+
+def accumulator(spec):
+    u"""Return an accumulator from a specification.
+
+    'spec' may be an 'Accumulator' instance, a function name ('count') or a
+    tuple (function name, column) like ('sum', 'age').
+    """
+    if isinstance(spec, Accumulator):
+        return spec
+    if isinstance(spec, basestring):
+        spec = (spec,)
+    if isinstance(spec, tuple) and spec and spec[0] in AGGREGATES:
+        return AGGREGATES[spec[0]](*spec[1:])
+    raise ValueError("Unknown aggregation '%r'" % (spec,))
+
+
+def aggregate(rows, key, accumulators, getters):
+    u"""Single pass hash aggregation.
+
+    Yield a tuple 'key + results' per group, in order of first appearance.
+    Memory is proportional to the number of groups.
+
+    Args:
+        rows: iterable of row tuples.
+        key: function that return the group key (a tuple) of a row.
+        accumulators: list of 'Accumulator' objects.
+        getters: function that get the aggregated value from a row, for
+            every accumulator.
+    """
+    groups = {}
+    order = []
+    specs = zip(range(len(accumulators)), accumulators, getters)
+    for row in rows:
+        k = key(row)
+        states = groups.get(k)
+        if states is None:
+            states = groups[k] = [acc.start() for acc in accumulators]
+            order.append(k)
+        for i, acc, getter in specs:
+            states[i] = acc.add(states[i], getter(row))
+    for k in order:
+        states = groups.pop(k)
+        yield k + tuple(acc.result(state)
+                        for acc, state in zip(accumulators, states))
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Binary on-disk format for 'DataTable' objects.
+
+Layout (little endian, blocks aligned to 8 bytes)::
+
+    preamble   magic 'DTBL', version (H), padding (H), header offset (Q),
+               header size (Q)
+    blocks     per column: values block and optional nulls block. Numeric
+               columns store fixed width values; string columns store a
+               heap with the encoded values and a block of 'nrows + 1'
+               offsets into the heap.
+    header     JSON with 'name', 'colnames', 'nrows' and the type and block
+               offsets of every column.
+
+Files are opened with 'mmap', so a table is usable without reading the file
+and pages are loaded on demand and shared between processes. Values are
+decoded from the mapped buffer on access.
+"""
+
+import array
+import json
+import mmap
+import struct
+
+from itertools import imap, izip
+
+MAGIC = 'DTBL'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sHHQQ')
+ALIGNMENT = 8
+CHUNK = 4096
+
+# Fixed width types: name -> struct format of one value.
+FIXED_TYPES = {'int': 'q', 'float': 'd', 'bool': '?'}
+# Variable width types: name -> encoding (None for raw bytes).
+VAR_TYPES = {'bytes': None, 'unicode': 'utf-8'}
+# Python types -> type name.
+PY_TYPES = {int: 'int', long: 'int', float: 'float', bool: 'bool',
+            str: 'bytes', unicode: 'unicode'}
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+def column_type(values):
+    u"""Return the type name of the values of a column ('None' allowed)."""
+    found = set(imap(type, values))
+    found.discard(type(None))
+    found = set(PY_TYPES.get(t, t.__name__) for t in found)
+    if not found:
+        return 'bytes'
+    if len(found) > 1 or not found <= set(PY_TYPES.values()):
+        raise BinaryFormatError("Unsupported column types: %s"
+                                % ', '.join(sorted(found)))
+    return found.pop()
+
+
+###############################################################################
+# Writer
+###############################################################################
+
+
+def _align(fileobj):
+    pad = -fileobj.tell() % ALIGNMENT
+    if pad:
+        fileobj.write('\x00' * pad)
+    return fileobj.tell()
+
+
+def _write_fixed(fileobj, typ, values, nulls):
+    fmt = FIXED_TYPES[typ]
+    offset = _align(fileobj)
+    chunk = []
+    for i, value in enumerate(values):
+        if value is None:
+            nulls[i] = 1
+            value = 0
+        chunk.append(value)
+        if len(chunk) == CHUNK:
+            fileobj.write(struct.pack('<%i%s' % (len(chunk), fmt), *chunk))
+            chunk = []
+    if chunk:
+        fileobj.write(struct.pack('<%i%s' % (len(chunk), fmt), *chunk))
+    return {'values': offset}
+
+
+def _write_var(fileobj, typ, values, nulls):
+    encoding = VAR_TYPES[typ]
+    heap = _align(fileobj)
+    offsets = array.array('l', [0])
+    size = 0
+    for i, value in enumerate(values):
+        if value is None:
+            nulls[i] = 1
+        else:
+            if encoding is not None:
+                value = value.encode(encoding)
+            fileobj.write(value)
+            size += len(value)
+        offsets.append(size)
+    offset = _align(fileobj)
+    for start in xrange(0, len(offsets), CHUNK):
+        chunk = offsets[start:start + CHUNK]
+        fileobj.write(struct.pack('<%iq' % len(chunk), *chunk))
+    return {'heap': heap, 'offsets': offset}
+
+
+def write_table(path, name, colnames, nrows, columns):
+    u"""Write a table in binary format.
+
+    Args:
+        path: destination file.
+        name: name of the table.
+        colnames: column names.
+        nrows: number of rows.
+        columns: list of functions that return an iterator over the values
+            of every column (every column is read twice).
+    """
+    with open(path, 'wb') as fileobj:
+        fileobj.write('\x00' * PREAMBLE.size)
+        specs = []
+        for colname, values in izip(colnames, columns):
+            typ = column_type(values())
+            nulls = bytearray(nrows)
+            try:
+                if typ in FIXED_TYPES:
+                    spec = _write_fixed(fileobj, typ, values(), nulls)
+                else:
+                    spec = _write_var(fileobj, typ, values(), nulls)
+            except struct.error as exc:
+                raise BinaryFormatError("Column '%s': %s" % (colname, exc))
+            spec['type'] = typ
+            if any(nulls):
+                spec['nulls'] = _align(fileobj)
+                fileobj.write(nulls)
+            specs.append(spec)
+        header = json.dumps({'name': name, 'colnames': list(colnames),
+                             'nrows': nrows, 'columns': specs})
+        offset = _align(fileobj)
+        fileobj.write(header)
+        fileobj.seek(0)
+        fileobj.write(PREAMBLE.pack(MAGIC, VERSION, 0, offset, len(header)))
+
+
+###############################################################################
+# Reader
+###############################################################################
+
+
+class MappedColumn(object):
+    u"""Read-only column of fixed width values over a mapped buffer."""
+
+    readonly = True
+
+    def __init__(self, buf, nrows, spec):
+        self.buf = buf
+        self.size = nrows
+        self.spec = spec
+        self.nulls = spec.get('nulls')
+        self.fmt = FIXED_TYPES.get(spec['type'])
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return "%s(%s, %i)" % (self.__class__.__name__, self.spec['type'],
+                               self.size)
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("MappedColumn index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.size)
+            if step != 1:
+                return list(self)[index]
+            return self._read(start, max(stop - start, 0))
+        index = self._check_index(index)
+        if self.nulls is not None and self.buf[self.nulls + index] != '\x00':
+            return None
+        return self._value(index)
+
+    def __iter__(self):
+        for start in xrange(0, self.size, CHUNK):
+            for value in self._read(start, min(CHUNK, self.size - start)):
+                yield value
+
+    def _value(self, index):
+        size = struct.calcsize(self.fmt)
+        return struct.unpack_from('<' + self.fmt, self.buf,
+                                  self.spec['values'] + index * size)[0]
+
+    def _values(self, start, count):
+        size = struct.calcsize(self.fmt)
+        return list(struct.unpack_from('<%i%s' % (count, self.fmt), self.buf,
+                                       self.spec['values'] + start * size))
+
+    def _read(self, start, count):
+        u"""Return the values of a range of rows."""
+        values = self._values(start, count)
+        if self.nulls is not None:
+            mask = self.buf[self.nulls + start:self.nulls + start + count]
+            for i, flag in enumerate(mask):
+                if flag != '\x00':
+                    values[i] = None
+        return values
+
+    def materialize(self):
+        u"""Return a writable copy of the column."""
+        if self.nulls is None and self.spec['type'] == 'float':
+            return array.array('d', self)
+        if self.nulls is None and self.spec['type'] == 'int':
+            values = list(self)
+            try:
+                return array.array('l', values)
+            except OverflowError:
+                return values
+        return list(self)
+
+
+class MappedStrings(MappedColumn):
+    u"""Read-only column of variable width values over a mapped buffer."""
+
+    def __init__(self, buf, nrows, spec):
+        MappedColumn.__init__(self, buf, nrows, spec)
+        self.encoding = VAR_TYPES[spec['type']]
+
+    def _offsets(self, start, count):
+        return struct.unpack_from('<%iq' % (count + 1), self.buf,
+                                  self.spec['offsets'] + start * 8)
+
+    def _value(self, index):
+        return self._values(index, 1)[0]
+
+    def _values(self, start, count):
+        heap = self.spec['heap']
+        offsets = self._offsets(start, count)
+        buf = self.buf
+        values = [buf[heap + offsets[i]:heap + offsets[i + 1]]
+                  for i in xrange(count)]
+        if self.encoding is not None:
+            values = [v.decode(self.encoding) for v in values]
+        return values
+
+
+def read_table(path):
+    u"""Map a binary table file.
+
+    Returns (header, columns) where 'columns' are read-only sequences over
+    the mapped file.
+    """
+    with open(path, 'rb') as fileobj:
+        buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buf) < PREAMBLE.size:
+        raise BinaryFormatError("Not a DataTable binary file")
+    magic, version, _, offset, size = PREAMBLE.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise BinaryFormatError("Not a DataTable binary file")
+    if version != VERSION:
+        raise BinaryFormatError("Unsupported version '%i'" % version)
+    header = json.loads(buf[offset:offset + size])
+    nrows = header['nrows']
+    columns = []
+    for spec in header['columns']:
+        cls = MappedColumn if spec['type'] in FIXED_TYPES else MappedStrings
+        columns.append(cls(buf, nrows, spec))
+    return header, columns
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Compact binary encoding of columns of values.
+
+Layout (little endian)::
+
+    header     magic 'DTC1', rows (I), columns (H), names size (I)
+    names      JSON list with the column names
+    columns    per column: type (B), nulls flag (B), data size (Q), a mask
+               of 'rows' bytes when there are nulls, and the data
+
+Numeric and boolean columns are packed with 'struct'. Strings are stored as
+the packed lengths followed by all the values joined (unicode is encoded and
+decoded at once). Columns with mixed or other types are pickled.
+
+Used by 'datarows.dumps_many' and for pickle 'DataTable' objects.
+"""
+
+import json
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from itertools import izip
+
+from _binfmt import FIXED_TYPES, BinaryFormatError, column_type
+
+MAGIC = 'DTC1'
+HEADER = struct.Struct('<4sIHI')
+COLUMN = struct.Struct('<BBQ')
+
+# Column types, stored by position.
+TYPES = ('int', 'float', 'bool', 'bytes', 'unicode', 'pickle')
+# Value stored in place of the nulls.
+NULLS = {'int': 0, 'float': 0.0, 'bool': False, 'bytes': '', 'unicode': u''}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def _encode_column(values):
+    u"""Return (type, nulls mask or None, data) of a column."""
+    try:
+        typ = column_type(values)
+    except BinaryFormatError:
+        typ = 'pickle'
+    nulls = None
+    if typ != 'pickle':
+        if None in values:
+            nulls = bytearray(v is None for v in values)
+            null = NULLS[typ]
+            values = [null if v is None else v for v in values]
+        try:
+            if typ in FIXED_TYPES:
+                return typ, nulls, struct.pack(
+                    '<%i%s' % (len(values), FIXED_TYPES[typ]), *values)
+            if typ == 'unicode':
+                # Lengths in characters, decoded at once.
+                data = u''.join(values).encode('utf-8')
+            else:
+                data = ''.join(values)
+            return typ, nulls, struct.pack('<%iI' % len(values),
+                                           *map(len, values)) + data
+        except struct.error:
+            # Out of range integers.
+            values = [None if flag else v for flag, v in
+                      izip(nulls or bytearray(len(values)), values)]
+    return 'pickle', None, pickle.dumps(list(values), 2)
+
+
+def dumps_columns(names, nrows, columns):
+    u"""Encode columns (sequences of 'nrows' values) to a string."""
+    names = json.dumps(list(names))
+    out = [HEADER.pack(MAGIC, nrows, len(columns), len(names)), names]
+    for values in columns:
+        typ, nulls, data = _encode_column(values)
+        out.append(COLUMN.pack(TYPES.index(typ), nulls is not None,
+                               len(data)))
+        if nulls is not None:
+            out.append(str(nulls))
+        out.append(data)
+    return ''.join(out)
+
+
+def _decode_column(typ, nrows, data):
+    if typ in FIXED_TYPES:
+        return list(struct.unpack('<%i%s' % (nrows, FIXED_TYPES[typ]), data))
+    if typ == 'pickle':
+        return pickle.loads(data)
+    size = nrows * 4
+    lengths = struct.unpack('<%iI' % nrows, data[:size])
+    data = data[size:]
+    if typ == 'unicode':
+        data = data.decode('utf-8')
+    values = []
+    pos = 0
+    for length in lengths:
+        values.append(data[pos:pos + length])
+        pos += length
+    return values
+
+
+def loads_columns(data):
+    u"""Decode a string of 'dumps_columns', return (names, nrows, columns)."""
+    data = str(data)
+    try:
+        magic, nrows, ncols, size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise CodecError("Not encoded columns")
+        pos = HEADER.size
+        names = json.loads(data[pos:pos + size])
+        pos += size
+        columns = []
+        for _ in xrange(ncols):
+            typ, has_nulls, length = COLUMN.unpack_from(data, pos)
+            typ = TYPES[typ]
+            pos += COLUMN.size
+            nulls = None
+            if has_nulls:
+                nulls = data[pos:pos + nrows]
+                pos += nrows
+            values = _decode_column(typ, nrows, data[pos:pos + length])
+            pos += length
+            if nulls is not None:
+                values = [None if flag != '\x00' else v
+                          for flag, v in izip(nulls, values)]
+            columns.append(values)
+    except (struct.error, IndexError, ValueError) as exc:
+        raise CodecError("Invalid data: %s" % exc)
+    return names, nrows, columns
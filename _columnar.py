@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""Column oriented storage for 'DataTable' objects.
+
+A 'ColumnStore' behaves like the list of tuples used by the default 'rows'
+storage, but keeps every column in its own container. Numeric columns are
+stored in typed 'array.array' objects and fall back to a plain 'list' the
+first time a value of another type is stored in them.
+
+Columns with few distinct values may be dictionary encoded ('DictColumn'):
+every row stores the small integer code of its value, and the values are
+stored once.
+"""
+
+import array
+
+from operator import eq
+from itertools import compress, count, imap, izip, repeat
+
+# Python type -> 'array' typecode for the typed columns.
+TYPECODES = {int: 'l', float: 'd'}
+
+# Default of 'ColumnStore._writable' when no value will be stored.
+_NO_VALUE = object()
+
+# Typecodes of the dictionary codes, by number of distinct values.
+CODE_TYPECODES = ((0x100, 'B'), (0x10000, 'H'))
+
+# Max. distinct values of the columns encoded with 'encoded="auto"'.
+AUTO_LIMIT = 256
+
+# Types of the columns encoded with 'encoded="auto"'.
+AUTO_TYPES = (str, unicode)
+
+
+def new_column(value):
+    u"""Return an empty column suitable for store 'value'."""
+    typecode = TYPECODES.get(type(value))
+    if typecode is None:
+        return []
+    return array.array(typecode)
+
+
+def column_type(column):
+    u"""Return the python type accepted by a typed column (or None)."""
+    if isinstance(column, array.array):
+        for typ, typecode in TYPECODES.items():
+            if column.typecode == typecode:
+                return typ
+    return None
+
+
+def code_typecode(size):
+    u"""Return the typecode of the codes of a dictionary of 'size' values."""
+    for limit, typecode in CODE_TYPECODES:
+        if size <= limit:
+            return typecode
+    return 'l'
+
+
+class DictColumn(object):
+    u"""Dictionary encoded column, list-like over the decoded values.
+
+    Args:
+        values: initial values.
+        limit: max. number of distinct values (None for no limit), see
+            'accepts'.
+    """
+
+    def __init__(self, values=(), limit=None):
+        self.codes = array.array('B')
+        """Code of the value of every row."""
+        self.values = []
+        """Distinct values, indexed by code."""
+        self.lookup = {}
+        """Value -> code."""
+        self.limit = limit
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return imap(self.values.__getitem__, self.codes)
+
+    def __repr__(self):
+        return "DictColumn(%r)" % list(self)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            obj = self.__class__(limit=self.limit)
+            obj.values = self.values[:]
+            obj.lookup = self.lookup.copy()
+            obj.codes = self.codes[index]
+            return obj
+        return self.values[self.codes[index]]
+
+    def __setitem__(self, index, value):
+        self.codes[index] = self.code(value)
+
+    def __delitem__(self, index):
+        del self.codes[index]
+
+    def code(self, value):
+        u"""Return the code of 'value', added to the dictionary if new."""
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+            typecode = code_typecode(len(self.values))
+            if typecode != self.codes.typecode:
+                self.codes = array.array(typecode, self.codes)
+        return code
+
+    def accepts(self, value):
+        u"""Check if 'value' can be stored without exceed the limit."""
+        try:
+            if value in self.lookup:
+                return True
+        except TypeError:
+            # Unhashable values are not encoded.
+            return False
+        return self.limit is None or len(self.values) < self.limit
+
+    def accepts_all(self, values):
+        u"""Check if all the 'values' can be stored (see 'accepts')."""
+        try:
+            new = set(values).difference(self.lookup)
+        except TypeError:
+            return False
+        return self.limit is None or len(self.values) + len(new) <= self.limit
+
+    def positions(self, value):
+        u"""Return the positions of the rows equal to 'value'."""
+        try:
+            code = self.lookup.get(value)
+        except TypeError:
+            code = None
+        if code is None:
+            return []
+        return list(compress(count(), imap(eq, self.codes, repeat(code))))
+
+    def distinct(self):
+        u"""Return the values stored, in order of first appearance."""
+        seen = bytearray(len(self.values))
+        missing = len(self.values)
+        used = []
+        for code in self.codes:
+            if not seen[code]:
+                seen[code] = 1
+                used.append(code)
+                missing -= 1
+                if not missing:
+                    # Every value found, the rest are repeated.
+                    break
+        return [self.values[code] for code in used]
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+    def insert(self, index, value):
+        self.codes.insert(index, self.code(value))
+
+    def extend(self, values):
+        # Codes first: 'code' may replace the array with a wider one.
+        codes = map(self.code, values)
+        self.codes.extend(codes)
+
+
+class ColumnStore(object):
+    u"""List-like container that stores rows column by column.
+
+    Args:
+        columns: initial column containers.
+        encoded: positions of the columns created as 'DictColumn', or
+            'auto' for encode the string columns while they have less than
+            'AUTO_LIMIT' distinct values.
+    """
+
+    def __init__(self, columns=None, encoded=()):
+        self.columns = list(columns or ())
+        """Column containers."""
+        self.types = [column_type(c) for c in self.columns]
+        """Python type accepted by every column (None for generic lists)."""
+        self.size = len(self.columns[0]) if self.columns else 0
+        """Number of rows stored."""
+        self.encoded = encoded
+        """Dictionary encoded columns for the first row layout."""
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        if not self.columns:
+            return repeat((), self.size)
+        return izip(*self.columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        index = self._check_index(index)
+        return tuple(c[index] for c in self.columns)
+
+    def __setitem__(self, index, row):
+        index = self._check_index(index)
+        self._check_width(row)
+        for i, value in enumerate(row):
+            self._writable(i, value)[index] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            size = len(xrange(*index.indices(self.size)))
+        else:
+            self._check_index(index)
+            size = 1
+        for i in xrange(len(self.columns)):
+            del self._writable(i)[index]
+        self.size -= size
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __str__(self):
+        return str(list(self))
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ColumnStore index out of range")
+        return index
+
+    def _check_width(self, row):
+        if not self.columns and not self.size:
+            # First row defines the layout of the columns.
+            self.columns = [self._new_column(i, value)
+                            for i, value in enumerate(row)]
+            self.types = [column_type(c) for c in self.columns]
+        elif len(row) != len(self.columns):
+            raise ValueError("Row width '%i' does not match the number of "
+                             "columns ('%i')" % (len(row), len(self.columns)))
+
+    def _new_column(self, i, value):
+        if self.encoded == 'auto':
+            if type(value) in AUTO_TYPES:
+                return DictColumn(limit=AUTO_LIMIT)
+        elif i in self.encoded:
+            return DictColumn()
+        return new_column(value)
+
+    def _writable(self, i, value=_NO_VALUE):
+        u"""Return column 'i' ready for store 'value'."""
+        if getattr(self.columns[i], 'readonly', False):
+            # Copy on write of read-only columns (mapped files).
+            self.columns[i] = self.columns[i].materialize()
+            self.types[i] = column_type(self.columns[i])
+        if (isinstance(self.columns[i], DictColumn) and
+                value is not _NO_VALUE and
+                not self.columns[i].accepts(value)):
+            # Too many distinct values (or unhashable): decode the column.
+            self.columns[i] = list(self.columns[i])
+        typ = self.types[i]
+        if (typ is not None and value is not _NO_VALUE and
+                type(value) is not typ):
+            # Promote to a generic column, values of any type are allowed.
+            self.columns[i] = list(self.columns[i])
+            self.types[i] = None
+        return self.columns[i]
+
+    def _extendable(self, i, values):
+        u"""Return column 'i' ready for store all the 'values'."""
+        column = self._writable(i)
+        typ = self.types[i]
+        if typ is not None and set(imap(type, values)) != set([typ]):
+            self.columns[i] = list(column)
+            self.types[i] = None
+        elif (isinstance(column, DictColumn) and
+              not column.accepts_all(values)):
+            self.columns[i] = list(column)
+        return self.columns[i]
+
+    def column(self, i):
+        u"""Return the container of the column 'i'."""
+        return self.columns[i]
+
+    def encode(self, i, limit=None):
+        u"""Dictionary encode the column 'i'."""
+        if not isinstance(self.columns[i], DictColumn):
+            self.columns[i] = DictColumn(self.columns[i], limit)
+            self.types[i] = None
+        return self.columns[i]
+
+    def append(self, row):
+        self._check_width(row)
+        for i, value in enumerate(row):
+            self._writable(i, value).append(value)
+        self.size += 1
+
+    def insert(self, index, row):
+        self._check_width(row)
+        for i, value in enumerate(row):
+            self._writable(i, value).insert(index, value)
+        self.size += 1
+
+    def extend(self, rows):
+        u"""Append a sequence of rows column by column."""
+        if not rows:
+            return
+        self._check_width(rows[0])
+        if len(set(imap(len, rows))) > 1:
+            for row in rows:
+                self._check_width(row)
+        for i, values in enumerate(izip(*rows)):
+            self._extendable(i, values).extend(values)
+        self.size += len(rows)
+
+    def pop(self, index=-1):
+        row = self[index]
+        del self[index]
+        return row
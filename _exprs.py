@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""Compiled row expressions.
+
+Predicates and calculated fields of 'DataTable' are compiled to a single
+function that works directly over the row tuple:
+
+- Column expressions (``col('age') > 30``) generate python source with
+  positional access (``row[3] > 30``) that is compiled once.
+- String expressions (``"row.first_name.startswith('P')"``) are parsed into
+  column expressions, or rewritten to positional access when they use
+  python constructs not supported by the column expressions.
+- Plain callables receive a light 'tuple' subclass with attribute access
+  to the columns (like 'namedtuple'), instead of a dict built per row.
+"""
+
+import ast
+import operator
+
+from keyword import iskeyword
+
+###############################################################################
+# Column expressions
+###############################################################################
+
+
+def lit(value):
+    u"""Return 'value' as an expression."""
+    if isinstance(value, Expr):
+        return value
+    return Literal(value)
+
+
+class Expr(object):
+    u"""Base class of the column expressions."""
+
+    __hash__ = object.__hash__
+
+    def __nonzero__(self):
+        raise TypeError("Column expressions have no truth value, use '&', "
+                        "'|' and '~' instead of 'and', 'or' and 'not'.")
+
+    # Comparison
+    def __eq__(self, other):
+        return Compare('==', self, lit(other))
+
+    def __ne__(self, other):
+        return Compare('!=', self, lit(other))
+
+    def __lt__(self, other):
+        return Compare('<', self, lit(other))
+
+    def __le__(self, other):
+        return Compare('<=', self, lit(other))
+
+    def __gt__(self, other):
+        return Compare('>', self, lit(other))
+
+    def __ge__(self, other):
+        return Compare('>=', self, lit(other))
+
+    # Arithmetic
+    def __add__(self, other):
+        return BinOp('+', self, lit(other))
+
+    def __radd__(self, other):
+        return BinOp('+', lit(other), self)
+
+    def __sub__(self, other):
+        return BinOp('-', self, lit(other))
+
+    def __rsub__(self, other):
+        return BinOp('-', lit(other), self)
+
+    def __mul__(self, other):
+        return BinOp('*', self, lit(other))
+
+    def __rmul__(self, other):
+        return BinOp('*', lit(other), self)
+
+    def __div__(self, other):
+        return BinOp('/', self, lit(other))
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        return BinOp('/', lit(other), self)
+
+    __rtruediv__ = __rdiv__
+
+    def __mod__(self, other):
+        return BinOp('%', self, lit(other))
+
+    def __neg__(self):
+        return BinOp('-', Literal(0), self)
+
+    # Logical
+    def __and__(self, other):
+        return And(self, lit(other))
+
+    def __or__(self, other):
+        return Or(self, lit(other))
+
+    def __invert__(self):
+        return Not(self)
+
+    # Methods
+    def startswith(self, prefix):
+        return Call('startswith', self, lit(prefix))
+
+    def endswith(self, suffix):
+        return Call('endswith', self, lit(suffix))
+
+    def between(self, low, high):
+        u"""Inclusive range comparison."""
+        return Between(self, lit(low), lit(high))
+
+    def isin(self, values):
+        return IsIn(self, Literal(frozenset(values)))
+
+    def columns(self):
+        u"""Return the set of column names used in the expression."""
+        out = set()
+        for child in self.children():
+            out.update(child.columns())
+        return out
+
+    def children(self):
+        return ()
+
+    def source(self, colnames, consts):
+        u"""Return python source of the expression over 'row'."""
+        raise NotImplementedError
+
+    def compile(self, colnames):
+        u"""Compile expression to a function over row tuples."""
+        consts = {}
+        code = 'lambda row: %s' % self.source(colnames, consts)
+        return eval(code, consts)
+
+
+class Column(Expr):
+    def __init__(self, name):
+        self.name = name
+
+    def columns(self):
+        return set([self.name])
+
+    def source(self, colnames, consts):
+        try:
+            return 'row[%i]' % colnames.index(self.name)
+        except ValueError:
+            raise KeyError(self.name)
+
+    def __repr__(self):
+        return "col(%r)" % self.name
+
+
+class Literal(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def source(self, colnames, consts):
+        name = '_k%i' % len(consts)
+        consts[name] = self.value
+        return name
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+class BinOp(Expr):
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def children(self):
+        return (self.left, self.right)
+
+    def source(self, colnames, consts):
+        return '(%s %s %s)' % (self.left.source(colnames, consts), self.op,
+                               self.right.source(colnames, consts))
+
+    def __repr__(self):
+        return '(%r %s %r)' % (self.left, self.op, self.right)
+
+
+class Compare(BinOp):
+    pass
+
+
+class And(BinOp):
+    def __init__(self, left, right):
+        BinOp.__init__(self, 'and', left, right)
+
+    def __repr__(self):
+        return '(%r & %r)' % (self.left, self.right)
+
+
+class Or(BinOp):
+    def __init__(self, left, right):
+        BinOp.__init__(self, 'or', left, right)
+
+    def __repr__(self):
+        return '(%r | %r)' % (self.left, self.right)
+
+
+class Not(Expr):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def children(self):
+        return (self.operand,)
+
+    def source(self, colnames, consts):
+        return '(not %s)' % self.operand.source(colnames, consts)
+
+    def __repr__(self):
+        return '~%r' % self.operand
+
+
+class Call(Expr):
+    def __init__(self, method, target, argument):
+        self.method = method
+        self.target = target
+        self.argument = argument
+
+    def children(self):
+        return (self.target, self.argument)
+
+    def source(self, colnames, consts):
+        return '%s.%s(%s)' % (self.target.source(colnames, consts),
+                              self.method,
+                              self.argument.source(colnames, consts))
+
+    def __repr__(self):
+        return '%r.%s(%r)' % (self.target, self.method, self.argument)
+
+
+class Between(Expr):
+    def __init__(self, target, low, high):
+        self.target = target
+        self.low = low
+        self.high = high
+
+    def children(self):
+        return (self.target, self.low, self.high)
+
+    def source(self, colnames, consts):
+        return '(%s <= %s <= %s)' % (self.low.source(colnames, consts),
+                                     self.target.source(colnames, consts),
+                                     self.high.source(colnames, consts))
+
+    def __repr__(self):
+        return '%r.between(%r, %r)' % (self.target, self.low, self.high)
+
+
+class IsIn(Expr):
+    def __init__(self, target, values):
+        self.target = target
+        self.values = values
+
+    def children(self):
+        return (self.target, self.values)
+
+    def source(self, colnames, consts):
+        return '(%s in %s)' % (self.target.source(colnames, consts),
+                               self.values.source(colnames, consts))
+
+    def __repr__(self):
+        return '%r.isin(%r)' % (self.target, self.values)
+
+
+def col(name):
+    u"""Return an expression that reference the column 'name'."""
+    return Column(name)
+
+
+def conjuncts(expr):
+    u"""Return the terms of an expression joined by '&'."""
+    if isinstance(expr, And):
+        return conjuncts(expr.left) + conjuncts(expr.right)
+    return [expr]
+
+
+def _column_literal(term):
+    u"""Return (column name, op, value) of 'column op literal' terms."""
+    left, right, op = term.left, term.right, term.op
+    if isinstance(left, Literal):
+        left, right, op = right, left, _FLIPPED.get(op, op)
+    if isinstance(left, Column) and isinstance(right, Literal):
+        return left.name, op, right.value
+    return None
+
+
+_FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+def ranges(expr):
+    u"""Return the bounds of the columns compared to values in 'expr'.
+
+    Returns {column: (low, low_inclusive, high, high_inclusive)} for the
+    range terms ('<', '<=', '>', '>=', '==', 'between') joined by '&'. A
+    'None' bound means there is no bound.
+    """
+    out = {}
+
+    def update(name, low, low_inc, high, high_inc):
+        cur_low, cur_low_inc, cur_high, cur_high_inc = \
+            out.get(name, (None, True, None, True))
+        if low is not None and (cur_low is None or low >= cur_low):
+            cur_low_inc = low_inc and (cur_low_inc or low != cur_low)
+            cur_low = low
+        if high is not None and (cur_high is None or high <= cur_high):
+            cur_high_inc = high_inc and (cur_high_inc or high != cur_high)
+            cur_high = high
+        out[name] = (cur_low, cur_low_inc, cur_high, cur_high_inc)
+
+    for term in conjuncts(expr):
+        if isinstance(term, Compare):
+            found = _column_literal(term)
+            if found is None:
+                continue
+            name, op, value = found
+            if op == '==':
+                update(name, value, True, value, True)
+            elif op in ('>', '>='):
+                update(name, value, op == '>=', None, True)
+            elif op in ('<', '<='):
+                update(name, None, True, value, op == '<=')
+        elif (isinstance(term, Between) and
+              isinstance(term.target, Column) and
+              isinstance(term.low, Literal) and
+              isinstance(term.high, Literal)):
+            update(term.target.name, term.low.value, True, term.high.value,
+                   True)
+    return out
+
+
+def prefixes(expr):
+    u"""Return {column: prefix} for 'column.startswith(prefix)' terms."""
+    out = {}
+    for term in conjuncts(expr):
+        if (isinstance(term, Call) and term.method == 'startswith' and
+                isinstance(term.target, Column) and
+                isinstance(term.argument, Literal) and
+                isinstance(term.argument.value, basestring)):
+            out[term.target.name] = term.argument.value
+    return out
+
+
+def equalities(expr):
+    u"""Return {column: value} for the 'column == value' terms of 'expr'."""
+    out = {}
+    for term in conjuncts(expr):
+        if isinstance(term, Compare) and term.op == '==':
+            found = _column_literal(term)
+            if found is not None:
+                out[found[0]] = found[2]
+    return out
+
+
+###############################################################################
+# String expressions
+###############################################################################
+
+ROW_NAME = 'row'
+
+_BINOPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+           ast.Mod: '%'}
+_CMPOPS = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=',
+           ast.Gt: '>', ast.GtE: '>='}
+_NAMES = {'None': None, 'True': True, 'False': False}
+
+
+class UnsupportedExpression(ValueError):
+    pass
+
+
+def _column_name(node):
+    u"""Return column name of 'row.name' or 'row["name"]' nodes."""
+    if isinstance(node, ast.Attribute):
+        value, name = node.value, node.attr
+    elif (isinstance(node, ast.Subscript) and
+          isinstance(node.slice, ast.Index) and
+          isinstance(node.slice.value, ast.Str)):
+        value, name = node.value, node.slice.value.s
+    else:
+        return None
+    if isinstance(value, ast.Name) and value.id == ROW_NAME:
+        return name
+    return None
+
+
+def _literal(node):
+    return Literal(ast.literal_eval(node))
+
+
+def _to_expr(node):
+    u"""Convert an 'ast' node to a column expression."""
+    name = _column_name(node)
+    if name is not None:
+        return Column(name)
+    if isinstance(node, (ast.Num, ast.Str)):
+        return Literal(node.n if isinstance(node, ast.Num) else node.s)
+    if isinstance(node, ast.Name) and node.id in _NAMES:
+        return Literal(_NAMES[node.id])
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        try:
+            return _literal(node)
+        except ValueError:
+            raise UnsupportedExpression(node)
+    if isinstance(node, ast.BoolOp):
+        cls = And if isinstance(node.op, ast.And) else Or
+        return reduce(cls, map(_to_expr, node.values))
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            return Not(_to_expr(node.operand))
+        if isinstance(node.op, ast.USub):
+            return -_to_expr(node.operand)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        return BinOp(_BINOPS[type(node.op)], _to_expr(node.left),
+                     _to_expr(node.right))
+    if isinstance(node, ast.Compare):
+        terms = []
+        left = _to_expr(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _to_expr(comparator)
+            if type(op) in _CMPOPS:
+                terms.append(Compare(_CMPOPS[type(op)], left, right))
+            elif isinstance(op, (ast.In, ast.NotIn)) and \
+                    isinstance(right, Literal):
+                term = IsIn(left, right)
+                terms.append(Not(term) if isinstance(op, ast.NotIn) else term)
+            else:
+                raise UnsupportedExpression(node)
+            left = right
+        return reduce(And, terms)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and
+            node.func.attr in ('startswith', 'endswith') and
+            len(node.args) == 1 and not node.keywords and
+            not node.starargs and not node.kwargs):
+        return Call(node.func.attr, _to_expr(node.func.value),
+                    _to_expr(node.args[0]))
+    raise UnsupportedExpression(node)
+
+
+def parse(source):
+    u"""Convert a string expression over 'row' to a column expression.
+
+    Raises 'UnsupportedExpression' when the string use python constructs
+    without an equivalent column expression.
+    """
+    node = ast.parse(source.strip(), mode='eval')
+    return _to_expr(node.body)
+
+
+class _PositionalAccess(ast.NodeTransformer):
+    u"""Rewrite 'row.name' nodes to 'row[index]'."""
+
+    def __init__(self, colnames):
+        self.colnames = colnames
+
+    def visit_Attribute(self, node):
+        return self._rewrite(node) or self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        return self._rewrite(node) or self.generic_visit(node)
+
+    def _rewrite(self, node):
+        name = _column_name(node)
+        if name is None:
+            return None
+        try:
+            index = self.colnames.index(name)
+        except ValueError:
+            raise KeyError(name)
+        return ast.copy_location(
+            ast.Subscript(value=ast.Name(id=ROW_NAME, ctx=ast.Load()),
+                          slice=ast.Index(value=ast.Num(n=index)),
+                          ctx=ast.Load()), node)
+
+
+def compile_source(source, colnames):
+    u"""Compile a string expression over 'row' to a function."""
+    try:
+        return parse(source).compile(colnames)
+    except UnsupportedExpression:
+        pass
+    tree = ast.parse('lambda %s: %s' % (ROW_NAME, source.strip()),
+                     mode='eval')
+    tree = ast.fix_missing_locations(_PositionalAccess(colnames).visit(tree))
+    return eval(compile(tree, '<expression>', 'eval'), {})
+
+
+###############################################################################
+# Attribute access for callables
+###############################################################################
+
+_row_classes = {}
+_ROW_CLASSES_SIZE = 128
+
+
+def _row_getitem(self, item):
+    if isinstance(item, basestring):
+        return tuple.__getitem__(self, self._index[item])
+    return tuple.__getitem__(self, item)
+
+
+def _is_identifier(name):
+    try:
+        name = str(name)
+    except UnicodeError:
+        return False
+    return (name.replace('_', 'a').isalnum() and not name[0].isdigit() and
+            not iskeyword(name))
+
+
+def row_class(colnames):
+    u"""Return a 'tuple' subclass with attribute access to 'colnames'."""
+    cls = _row_classes.get(colnames)
+    if cls is None:
+        namespace = {
+            '__slots__': (),
+            '_index': dict((name, i) for i, name in enumerate(colnames)),
+            '__getitem__': _row_getitem,
+        }
+        for i, name in enumerate(colnames):
+            if _is_identifier(name):
+                namespace[str(name)] = property(operator.itemgetter(i))
+        cls = type('Row', (tuple,), namespace)
+        if len(_row_classes) >= _ROW_CLASSES_SIZE:
+            _row_classes.clear()
+        _row_classes[colnames] = cls
+    return cls
+
+
+def compile_expr(expr, colnames):
+    u"""Return a function that evaluate 'expr' over row tuples.
+
+    'expr' may be a column expression, a string expression or a callable
+    that access the columns by attribute.
+    """
+    if isinstance(expr, Expr):
+        return expr.compile(colnames)
+    if isinstance(expr, basestring):
+        return compile_source(expr, colnames)
+    cls = row_class(colnames)
+    new = tuple.__new__
+
+    def inner(row):
+        return expr(new(cls, row))
+    return inner
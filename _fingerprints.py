@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Memory lean 'distinct' and 'dup' with row fingerprints.
+
+Instead of a dict with every distinct row, a 'FingerprintSet' stores a
+fixed size digest of every distinct key (64 or 128 bits) in 'array.array'
+slots with open addressing: 8 or 16 bytes per slot and no per key objects.
+With 1M distinct keys the slots use 16 MiB (64 bits) or 32 MiB (128 bits),
+plus 16 MiB of positions with 'source' (64 bits 'long').
+
+Fingerprints are the first bits of the MD5 digest of a canonical encoding
+of the keys ('encode'), not of the Python hashes (hash(-1) == hash(-2)):
+keys that are equal for Python (1 and 1.0, 'a' and u'a') have the same
+fingerprint, and different keys collide with a probability near
+n**2 / 2**bits. Keys with the same fingerprint are merged unless the set
+verifies the matches against the source keys ('source'), then the
+positions are stored.
+"""
+
+import array
+import hashlib
+import marshal
+import struct
+
+from itertools import imap, izip
+from types import NoneType
+
+# Slot value of the empty slots (fingerprints never start by 0).
+EMPTY = 0
+# Initial number of slots.
+INITIAL_SLOTS = 1024
+# Max. fraction of used slots before grow.
+MAX_LOAD = 0.5
+# Types only equal to values of the same type, marshaled as they are.
+PLAIN_TYPES = frozenset([int, str, NoneType])
+
+BITS = (64, 128)
+
+
+def _normalize(value):
+    u"""Return the value of its type class with the same marshal data."""
+    typ = type(value)
+    if typ is bool or typ is long:
+        return int(value)
+    if typ is float:
+        return int(value) if value.is_integer() else value
+    if typ is unicode:
+        try:
+            return value.encode('ascii')
+        except UnicodeEncodeError:
+            return value
+    if typ is tuple:
+        return tuple(map(_normalize, value))
+    return value
+
+
+def encode(key):
+    u"""Return the canonical encoding of a key (a byte string).
+
+    Keys that are equal for Python have the same encoding: numbers, byte
+    strings, unicode, None and tuples of them are normalized and
+    marshaled, other types are encoded by their 'repr'.
+    """
+    if type(key) is not tuple or not PLAIN_TYPES.issuperset(imap(type, key)):
+        key = _normalize(key)
+    try:
+        # Version 0 does not share the interned strings.
+        return marshal.dumps(key, 0)
+    except ValueError:
+        # Not a marshal type code.
+        return '\xff' + repr(key)
+
+
+def fingerprint(key, bits=64):
+    u"""Return the fingerprint of a key, a string of 'bits' / 8 bytes."""
+    return hashlib.md5(encode(key)).digest()[:bits // 8]
+
+
+class FingerprintSet(object):
+    u"""Set of key fingerprints.
+
+    Args:
+        bits: size of the fingerprints, 64 or 128.
+        source: function that return the key of a position, for verify the
+            matching fingerprints (None for trust them).
+    """
+
+    def __init__(self, bits=64, source=None):
+        if bits not in BITS:
+            raise ValueError("Fingerprints of 64 or 128 bits")
+        self.bits = bits
+        self.unpack = struct.Struct('<%ii' % (bits // 32)).unpack
+        """Split a fingerprint in 32 bits words."""
+        self.source = source
+        self.size = 0
+        """Number of keys."""
+        self._alloc(INITIAL_SLOTS)
+
+    def __len__(self):
+        return self.size
+
+    def _alloc(self, nslots):
+        self.mask = nslots - 1
+        # One array per word of the fingerprints ('i' is 32 bits on every
+        # platform, 'l' is not).
+        self.slots = [array.array('i', [EMPTY]) * nslots
+                      for _ in xrange(self.bits // 32)]
+        self.positions = (array.array('l', [0]) * nslots
+                          if self.source is not None else None)
+
+    def _grow(self):
+        slots, positions = self.slots, self.positions
+        self._alloc(len(slots[0]) * 2)
+        for i, head in enumerate(slots[0]):
+            if head != EMPTY:
+                self._store(self._free(head), [s[i] for s in slots],
+                            positions[i] if positions is not None else 0)
+
+    def _free(self, head):
+        u"""Return the first empty slot for a fingerprint."""
+        first = self.slots[0]
+        mask = self.mask
+        i = head & mask
+        while first[i] != EMPTY:
+            i = (i + 1) & mask
+        return i
+
+    def _store(self, i, fp, pos):
+        for slots, word in izip(self.slots, fp):
+            slots[i] = word
+        if self.positions is not None:
+            self.positions[i] = pos
+
+    def add(self, key, pos=0):
+        u"""Add the key at position 'pos', return False if already in."""
+        fp = self.unpack(fingerprint(key, self.bits))
+        head = fp[0]
+        if head == EMPTY:
+            head = 1
+            fp = (head,) + fp[1:]
+        slots = self.slots
+        first = slots[0]
+        mask = self.mask
+        i = head & mask
+        while True:
+            value = first[i]
+            if value == EMPTY:
+                break
+            if (value == head and
+                    all(s[i] == word for s, word in izip(slots, fp)) and
+                    (self.source is None or
+                     self.source(self.positions[i]) == key)):
+                return False
+            i = (i + 1) & mask
+        self._store(i, fp, pos)
+        self.size += 1
+        if self.size > len(first) * MAX_LOAD:
+            self._grow()
+        return True
+
+    def nbytes(self):
+        u"""Return the size of the slots in bytes."""
+        arrays = list(self.slots)
+        if self.positions is not None:
+            arrays.append(self.positions)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+def f_fingerprint(keys, bits=64, source=None, dup=False):
+    u"""Yield the distinct keys (or the duplicates with 'dup').
+
+    Args:
+        keys: keys (tuples) of the rows, in order.
+        bits: size of the fingerprints, 64 or 128.
+        source: function that return the key at a position of 'keys', for
+            verify the matches (see 'FingerprintSet').
+        dup: yield the keys already seen instead of the new ones.
+    """
+    seen = FingerprintSet(bits, source)
+    add = seen.add
+    for pos, key in enumerate(keys):
+        if add(key, pos) is not dup:
+            yield key
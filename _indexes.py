@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Column indexes for 'DataTable' objects.
+
+An index map the key of every row (the values of the indexed columns) to
+the row positions in the table. Positions are kept up to date by the table
+on append and update; mutations that shift positions (insert or delete in
+the middle) mark the index as 'stale' and it is rebuilt on next use.
+Positions are absolute: tables with ring buffer storage build them from the
+number of rows evicted from the front, so evictions do not shift them.
+"""
+
+import array
+import operator
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import imap, islice
+from sys import getsizeof
+
+# Entries measured by 'nbytes' by default.
+SAMPLE = 1000
+
+
+def key_getter(positions):
+    u"""Return a function that get the index key from a row."""
+    if len(positions) == 1:
+        return operator.itemgetter(positions[0])
+    return operator.itemgetter(*positions)
+
+
+def sampled(items, count, sample):
+    u"""Return about 'sample' of the 'count' items and the scale factor."""
+    step = max(count // sample, 1)
+    items = list(islice(items, 0, None, step))
+    return items, float(count) / len(items) if items else 0
+
+
+class HashIndex(object):
+    u"""Hash index for equality lookups in O(1)."""
+
+    kind = 'hash'
+
+    def __init__(self, columns, positions):
+        self.columns = columns
+        """Names of the indexed columns."""
+        self.key = key_getter(positions)
+        """Function that get the key of a row."""
+        self.map = {}
+        """key -> position (int) or sorted list of positions."""
+        self.stale = True
+        """Positions are not valid, index must be rebuilt."""
+
+    def __len__(self):
+        return len(self.map)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, ', '.join(self.columns))
+
+    def build(self, rows, start=0):
+        u"""Index 'rows', the first one at position 'start'."""
+        self.map = {}
+        self.stale = False
+        for pos, row in enumerate(rows, start):
+            self.add(pos, row)
+
+    def add(self, pos, row):
+        key = self.key(row)
+        bucket = self.map.get(key)
+        if bucket is None:
+            # Unique keys store the position without list overhead.
+            self.map[key] = pos
+        elif isinstance(bucket, list):
+            if pos > bucket[-1]:
+                bucket.append(pos)
+            else:
+                insort(bucket, pos)
+        else:
+            self.map[key] = [bucket, pos] if bucket < pos else [pos, bucket]
+
+    def discard(self, pos, row):
+        key = self.key(row)
+        bucket = self.map.get(key)
+        if isinstance(bucket, list):
+            bucket.remove(pos)
+            if len(bucket) == 1:
+                self.map[key] = bucket[0]
+        elif bucket == pos:
+            del self.map[key]
+
+    def lookup(self, key):
+        u"""Return the sorted positions of the rows with 'key'."""
+        bucket = self.map.get(key)
+        if bucket is None:
+            return []
+        if isinstance(bucket, list):
+            return bucket
+        return [bucket]
+
+    def nbytes(self, sample=SAMPLE):
+        u"""Estimate the size of the index in bytes from 'sample' entries.
+
+        Keys of one column are the values of the rows and are not counted,
+        keys of more columns are tuples of them.
+        """
+        entries, scale = sampled(self.map.iteritems(), len(self.map), sample)
+        size = 0
+        for key, bucket in entries:
+            if len(self.columns) > 1:
+                size += getsizeof(key)
+            if isinstance(bucket, list):
+                size += getsizeof(bucket) + sum(imap(getsizeof, bucket))
+            else:
+                size += getsizeof(bucket)
+        return getsizeof(self.map) + int(size * scale)
+
+
+class SortedIndex(object):
+    u"""Ordered index for range and prefix queries in O(log n + k)."""
+
+    kind = 'sorted'
+
+    def __init__(self, columns, positions):
+        self.columns = columns
+        """Names of the indexed columns."""
+        self.key = key_getter(positions)
+        """Function that get the key of a row."""
+        self.keys = []
+        """Sorted keys."""
+        self.positions = array.array('l')
+        """Row positions, in the order of 'keys' (ascending for ties)."""
+        self.stale = True
+        """Positions are not valid, index must be rebuilt."""
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, ', '.join(self.columns))
+
+    def build(self, rows, start=0):
+        u"""Index 'rows', the first one at position 'start'."""
+        key = self.key
+        pairs = sorted((key(row), pos) for pos, row in enumerate(rows, start))
+        self.keys = [k for k, _ in pairs]
+        self.positions = array.array('l', (pos for _, pos in pairs))
+        self.stale = False
+
+    def _locate(self, key, pos):
+        u"""Return where (key, pos) is (or must be) in the index."""
+        lo = bisect_left(self.keys, key)
+        hi = bisect_right(self.keys, key, lo)
+        return lo + bisect_left(self.positions[lo:hi], pos)
+
+    def add(self, pos, row):
+        key = self.key(row)
+        if not self.keys or key > self.keys[-1]:
+            # Fast path for appends in key order.
+            i = len(self.keys)
+        else:
+            i = self._locate(key, pos)
+        self.keys.insert(i, key)
+        self.positions.insert(i, pos)
+
+    def discard(self, pos, row):
+        i = self._locate(self.key(row), pos)
+        if i < len(self.positions) and self.positions[i] == pos:
+            del self.keys[i]
+            del self.positions[i]
+
+    def lookup(self, key):
+        u"""Return the sorted positions of the rows with 'key'."""
+        return self.range(key, key)
+
+    def nbytes(self, sample=SAMPLE):
+        u"""Estimate the size of the index in bytes (see 'HashIndex')."""
+        size = getsizeof(self.keys) + getsizeof(self.positions)
+        if len(self.columns) > 1:
+            keys, scale = sampled(self.keys, len(self.keys), sample)
+            size += int(sum(imap(getsizeof, keys)) * scale)
+        return size
+
+    def range(self, low=None, high=None, low_inclusive=True,
+              high_inclusive=True):
+        u"""Return the sorted positions of the rows with key in the range.
+
+        'None' in 'low' or 'high' means no bound.
+        """
+        keys = self.keys
+        if low is None:
+            lo = 0
+        elif low_inclusive:
+            lo = bisect_left(keys, low)
+        else:
+            lo = bisect_right(keys, low)
+        if high is None:
+            hi = len(keys)
+        elif high_inclusive:
+            hi = bisect_right(keys, high, lo)
+        else:
+            hi = bisect_left(keys, high, lo)
+        return sorted(self.positions[lo:hi])
+
+    def prefix(self, prefix):
+        u"""Return the sorted positions of the string keys with 'prefix'."""
+        keys = self.keys
+        lo = hi = bisect_left(keys, prefix)
+        size = len(keys)
+        while (hi < size and isinstance(keys[hi], basestring) and
+               keys[hi].startswith(prefix)):
+            hi += 1
+        return sorted(self.positions[lo:hi])
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Parsing helpers for load 'DataTable' objects from text files.
+
+Values are converted column by column over chunks of rows: 'map' with a
+builtin type converts a whole column at C speed, and the per value
+converter is used only for the columns with missing or invalid values.
+"""
+
+from itertools import izip
+
+# Candidate types for inference, from the most to the least specific.
+INFERRED_TYPES = (int, float)
+
+
+def _is_type(typ, value):
+    try:
+        typ(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def infer_type(values):
+    u"""Return the python type of a sample of string values.
+
+    Empty strings are missing values and do not take part in the inference.
+    Returns 'str' when no numeric type is valid for all the values.
+    """
+    values = [v for v in values if v != '']
+    if not values:
+        return str
+    for typ in INFERRED_TYPES:
+        if all(_is_type(typ, v) for v in values):
+            return typ
+    return str
+
+
+def value_converter(typ, strict=False):
+    u"""Return a function that convert one string value to 'typ'.
+
+    Empty strings are converted to 'None' for the non string types. Invalid
+    values raise 'ValueError' when 'strict', or are tried with the next
+    inferred types and kept as strings in last instance.
+    """
+    if typ is str:
+        return str
+    fallback = INFERRED_TYPES[INFERRED_TYPES.index(typ) + 1:] \
+        if typ in INFERRED_TYPES else ()
+
+    def convert(value):
+        if value == '':
+            return None
+        try:
+            return typ(value)
+        except ValueError:
+            if strict:
+                raise
+        for other in fallback:
+            try:
+                return other(value)
+            except ValueError:
+                pass
+        return value
+    return convert
+
+
+def convert_column(typ, values, strict=False):
+    u"""Convert a column of string values to 'typ'."""
+    if typ is str:
+        return values
+    try:
+        # Fast path: builtin conversion of the whole column.
+        return map(typ, values)
+    except (ValueError, TypeError):
+        return map(value_converter(typ, strict), values)
+
+
+def convert_rows(rows, types, strict=None):
+    u"""Convert a chunk of rows and return a list of tuples.
+
+    'strict' is a list of flags, one per column, to raise 'ValueError' on
+    invalid values.
+    """
+    if not rows:
+        return []
+    strict = strict or [False] * len(types)
+    columns = [convert_column(typ, values, flag)
+               for typ, flag, values in izip(types, strict, izip(*rows))]
+    return zip(*columns)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Instrumentation of the 'DataTable' operations.
+
+Operations ('filter', 'select', 'distinct', 'dup', 'add_field') emit the
+'onOperation(record)' event of the table when it has subscribers, with
+the rows in and out, the wall time, the calls to the predicate (python
+path only: 0 when the operation used an index or NumPy) and the shallow
+size of the result, estimated from 'SAMPLE' rows so the record does not
+scan the result. Without subscribers nothing is measured.
+
+'Profile' is a context manager that collects the records of some tables
+(and the tables derived from them, they share the events).
+"""
+
+from collections import OrderedDict
+from timeit import default_timer
+
+from _indexes import SAMPLE
+from _utils import SDict
+
+# Record fields summed by 'Profile.summary'.
+TOTALS = ('seconds', 'rows_in', 'rows_out', 'predicate_calls', 'bytes')
+
+
+class PredicateCounter(object):
+    u"""Count the calls to the predicates of an operation."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def wrap(self, function):
+        u"""Return 'function' counting its calls."""
+        def counted(*args):
+            self.calls += 1
+            return function(*args)
+        return counted
+
+
+def operation_record(table, operation, args, kwargs, counter, start, result):
+    u"""Return the record of an operation started at 'start'."""
+    seconds = default_timer() - start
+    return SDict(table=table.name, operation=operation, args=args,
+                 kwargs=kwargs, rows_in=len(table), rows_out=len(result),
+                 seconds=seconds, predicate_calls=counter.calls,
+                 bytes=result.memory_usage(deep=False,
+                                           sample=SAMPLE)['total'])
+
+
+class Profile(object):
+    u"""Collect the operation records of some tables.
+
+    Used as context manager, the records emitted inside the block are
+    stored in 'records'.
+    """
+
+    def __init__(self, *tables):
+        self.signals = []
+        for table in tables:
+            signal = table.events.onOperation
+            if not any(s is signal for s in self.signals):
+                self.signals.append(signal)
+        self.records = []
+        """Operation records, in order of completion."""
+
+    def __enter__(self):
+        for signal in self.signals:
+            signal.connect(self.records.append)
+        return self
+
+    def __exit__(self, *exc_info):
+        for signal in self.signals:
+            signal.disconnect(self.records.append)
+
+    def summary(self):
+        u"""Return the totals by operation: name -> dict."""
+        out = OrderedDict()
+        for record in sorted(self.records, key=lambda r: -r.seconds):
+            totals = out.setdefault(record.operation, dict.fromkeys(TOTALS, 0))
+            totals['count'] = totals.get('count', 0) + 1
+            for field in TOTALS:
+                totals[field] += record[field]
+        return out
+
+    def report(self):
+        u"""Return a text table of the records, slowest first."""
+        lines = ["%-10s %10s %10s %10s %10s %10s  %s"
+                 % ('operation', 'seconds', 'rows_in', 'rows_out', 'calls',
+                    'bytes', 'arguments')]
+        for record in sorted(self.records, key=lambda r: -r.seconds):
+            arguments = ', '.join(
+                [repr(a) for a in record.args] +
+                ['%s=%r' % item for item in sorted(record.kwargs.items())])
+            lines.append("%-10s %10.6f %10i %10i %10i %10i  %s"
+                         % (record.operation, record.seconds, record.rows_in,
+                            record.rows_out, record.predicate_calls,
+                            record.bytes, arguments))
+        return '\n'.join(lines)
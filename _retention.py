@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Retention policies for 'DataTable' objects.
+
+A 'Retention' bounds a table by the age of its rows (a timestamp column)
+and/or by the size of its rows ('_utils.total_size'). Rows expire from the
+front: the table is assumed to receive rows in time order, so the expired
+rows are always the oldest ones and every check stops at the first row to
+keep. Expired rows are removed in bulk and reported with the 'onExpire'
+event of the table.
+
+There is no background thread: the policy is checked on write ('append',
+'extend' and 'insert') and on access (iteration and 'len'), in the thread
+that uses the table, so a table that is only read still drops its expired
+rows. With 'interval' the policy is checked at most once every 'interval'
+seconds ('expire' removes the expired rows at any time).
+
+Tables with a retention store their rows in a '_ringbuffer.Window' (or in
+their 'RingBuffer'), so removing rows from the front is O(1) amortized. The
+age of the first row is only checked when the clock reaches its deadline,
+and with 'slack' the expired rows are removed every 'slack' seconds at once.
+"""
+
+import time
+
+from itertools import imap
+from operator import itemgetter
+from sys import getsizeof
+
+from _utils import LEAF_TYPES, parse_size, size_fmt, total_size
+
+
+def row_size(row):
+    u"""Return the size of a row and its values in bytes."""
+    if type(row) is tuple:
+        for value in row:
+            if type(value) not in LEAF_TYPES:
+                break
+        else:
+            return getsizeof(row) + sum(imap(getsizeof, row))
+    return total_size(row, readable_output=False)
+
+
+class Retention(object):
+    u"""Retention policy of a 'DataTable'.
+
+    Args:
+        max_age: seconds a row is kept, by the value of 'column'.
+        column: timestamp column (seconds, like 'clock').
+        max_bytes: max. size of the rows, number of bytes or text like
+            '512 MB' (see '_utils.parse_size').
+        interval: min. seconds between the checks of the policy on write
+            and access (None for check it every time).
+        slack: seconds the rows are kept after 'max_age' so they are
+            removed in larger groups.
+        clock: function that return the current time.
+    """
+
+    def __init__(self, max_age=None, column=None, max_bytes=None,
+                 interval=None, slack=0, clock=time.time):
+        if max_age is None and max_bytes is None:
+            raise ValueError("Retention without 'max_age' or 'max_bytes'")
+        if max_age is not None and column is None:
+            raise ValueError("Retention by 'max_age' needs a 'column'")
+        self.max_age = max_age
+        self.column = column
+        self.max_bytes = None if max_bytes is None else parse_size(max_bytes)
+        self.interval = interval
+        self.slack = slack
+        self.clock = clock
+        self.size = None
+        """Size of the rows stored (None when unknown)."""
+        self.deadline = None
+        """Time when the first row expires (None when unknown)."""
+        self.checked = None
+        """Time of the last check with 'interval' (see 'check')."""
+        self.key = None
+
+    def __repr__(self):
+        args = []
+        if self.max_age is not None:
+            args.append('max_age=%r, column=%r' % (self.max_age, self.column))
+        if self.max_bytes is not None:
+            args.append('max_bytes=%r' % size_fmt(self.max_bytes))
+        if self.interval is not None:
+            args.append('interval=%r' % self.interval)
+        return 'Retention(%s)' % ', '.join(args)
+
+    def attach(self, table):
+        u"""Start to enforce the policy on 'table'."""
+        if self.column is not None:
+            self.key = itemgetter(table.colnames.index(self.column))
+        self.invalidate()
+        self.checked = None
+        table.events.onEvict.connect(self.discard)
+
+    def detach(self, table):
+        u"""Stop to enforce the policy on 'table'."""
+        table.events.onEvict.disconnect(self.discard)
+
+    def added(self, rows):
+        u"""Account the size of stored 'rows'."""
+        if self.max_bytes is not None and self.size is not None:
+            self.size += sum(map(row_size, rows))
+
+    def discard(self, rows):
+        u"""Account the size of removed 'rows'."""
+        self.deadline = None
+        if self.max_bytes is not None and self.size is not None:
+            self.size -= sum(map(row_size, rows))
+
+    def invalidate(self):
+        u"""Rows replaced or deleted, recompute the size and the deadline."""
+        self.size = None
+        self.deadline = None
+
+    def expired(self, rows):
+        u"""Return the number of rows to remove from the front of 'rows'.
+
+        The accounted size is updated as if they were removed.
+        """
+        size = len(rows)
+        count = 0
+        if self.max_age is not None and size:
+            now = self.clock()
+            key = self.key
+            if self.deadline is None:
+                self.deadline = key(rows[0]) + self.max_age + self.slack
+            if now >= self.deadline:
+                limit = now - self.max_age
+                while count < size and key(rows[count]) < limit:
+                    count += 1
+        if self.max_bytes is not None:
+            if self.size is None:
+                self.size = sum(map(row_size, rows))
+            total = self.size - sum(row_size(rows[i]) for i in xrange(count))
+            while count < size and total > self.max_bytes:
+                total -= row_size(rows[count])
+                count += 1
+            # Size once the rows are removed.
+            self.size = total
+        if count:
+            self.deadline = None
+        return count
+
+    def expire(self, table):
+        u"""Remove the expired rows of 'table', return how many."""
+        count = self.expired(table.list)
+        if count:
+            table._expire(count)
+        return count
+
+    def check(self, table):
+        u"""Remove the expired rows of 'table' if a check is due.
+
+        With 'interval', the rows are checked at most once every 'interval'
+        seconds.
+        """
+        if self.interval is not None:
+            now = self.clock()
+            if self.checked is not None and \
+                    now - self.checked < self.interval:
+                return 0
+            self.checked = now
+        return self.expire(table)
+
+    def enforce(self, table, rows):
+        u"""Account the stored 'rows' and remove the expired ones."""
+        self.added(rows)
+        self.check(table)
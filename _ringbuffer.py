@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Windowed row storage for 'DataTable' objects.
+
+A 'RingBuffer' behaves like the list of tuples used by the default 'rows'
+storage, but holds at most 'capacity' rows. Once full, every append evicts
+a row in O(1): the oldest one ('evict_oldest', the first slot is reused
+and the start moves forward) or the newest one ('evict_newest', the last
+row is replaced). Rows are never shifted in memory.
+
+'offset' counts the rows evicted from the front: it is the absolute
+position of the first row, so positions stored outside (indexes) stay
+valid while the window moves.
+
+A 'Window' is an unbounded list of rows where removing rows from the front
+('popfront', used by the retention policies) is O(1) amortized: removed
+rows leave a dead prefix that is compacted when it is larger than the live
+rows.
+"""
+
+from itertools import chain, islice
+
+# Eviction policies.
+OVERFLOWS = ('evict_oldest', 'evict_newest')
+
+
+class RingBuffer(object):
+    u"""List-like container of the last 'capacity' rows.
+
+    Args:
+        capacity: max. number of rows.
+        overflow: row evicted when full, 'evict_oldest' or 'evict_newest'.
+    """
+
+    def __init__(self, capacity, overflow='evict_oldest'):
+        if capacity <= 0:
+            raise ValueError("RingBuffer capacity must be positive")
+        if overflow not in OVERFLOWS:
+            raise ValueError("Unknown overflow '%s'" % overflow)
+        self.capacity = capacity
+        self.overflow = overflow
+        self.items = []
+        """Row slots, the window starts at 'start'."""
+        self.start = 0
+        """Slot of the first row."""
+        self.offset = 0
+        """Rows evicted from the front (absolute position of the first)."""
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        if not self.start:
+            return iter(self.items)
+        return chain(islice(self.items, self.start, None),
+                     islice(self.items, 0, self.start))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.items[self._slot(index)]
+
+    def __setitem__(self, index, row):
+        self.items[self._slot(index)] = row
+
+    def __delitem__(self, index):
+        rows = list(self)
+        del rows[index]
+        self._reset(rows)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __str__(self):
+        return str(list(self))
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.items.__sizeof__()
+
+    def _slot(self, index):
+        size = len(self.items)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("RingBuffer index out of range")
+        return (self.start + index) % self.capacity
+
+    def _reset(self, rows):
+        u"""Store 'rows' from the first slot (the offset is kept)."""
+        self.items = rows
+        self.start = 0
+
+    def append(self, row):
+        u"""Append a row, return (position, row) of the evicted row or None.
+
+        The position is absolute (see 'offset').
+        """
+        items = self.items
+        if len(items) < self.capacity:
+            items.append(row)
+            return None
+        if self.overflow == 'evict_oldest':
+            start = self.start
+            evicted = (self.offset, items[start])
+            items[start] = row
+            self.start = (start + 1) % self.capacity
+            self.offset += 1
+            return evicted
+        last = (self.start - 1) % self.capacity
+        evicted = (self.offset + self.capacity - 1, items[last])
+        items[last] = row
+        return evicted
+
+    def extend(self, rows):
+        u"""Append rows, return the list of evicted (position, row)."""
+        evicted = []
+        for row in rows:
+            pair = self.append(row)
+            if pair is not None:
+                evicted.append(pair)
+        return evicted
+
+    def insert(self, index, row):
+        u"""Insert a row (in O(n)), return the evicted (position, row)."""
+        rows = list(self)
+        rows.insert(index, row)
+        evicted = None
+        if len(rows) > self.capacity:
+            if self.overflow == 'evict_oldest':
+                evicted = (self.offset, rows.pop(0))
+                self.offset += 1
+            else:
+                evicted = (self.offset + self.capacity - 1, rows.pop())
+        self._reset(rows)
+        return evicted
+
+    def pop(self, index=-1):
+        row = self[index]
+        del self[index]
+        return row
+
+    def popfront(self, count):
+        u"""Remove the first 'count' rows (in O(n)) and return them."""
+        rows = list(self)
+        self._reset(rows[count:])
+        self.offset += count
+        return rows[:count]
+
+
+class Window(object):
+    u"""List-like container of rows with cheap removal from the front."""
+
+    def __init__(self, rows=()):
+        self.items = list(rows)
+        """Rows, the live ones start at 'start'."""
+        self.start = 0
+        """Size of the dead prefix of 'items'."""
+        self.offset = 0
+        """Rows removed from the front (absolute position of the first)."""
+
+    def __len__(self):
+        return len(self.items) - self.start
+
+    def __iter__(self):
+        if not self.start:
+            return iter(self.items)
+        return islice(self.items, self.start, None)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.items[self._slot(index)]
+
+    def __setitem__(self, index, row):
+        self.items[self._slot(index)] = row
+
+    def __delitem__(self, index):
+        self._compact()
+        del self.items[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __str__(self):
+        return str(list(self))
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.items.__sizeof__()
+
+    def _slot(self, index):
+        size = len(self.items) - self.start
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Window index out of range")
+        return self.start + index
+
+    def _compact(self):
+        u"""Release the dead prefix (the offset is kept)."""
+        if self.start:
+            del self.items[:self.start]
+            self.start = 0
+
+    def append(self, row):
+        self.items.append(row)
+
+    def extend(self, rows):
+        self.items.extend(rows)
+
+    def insert(self, index, row):
+        self._compact()
+        self.items.insert(index, row)
+
+    def pop(self, index=-1):
+        row = self[index]
+        del self[index]
+        return row
+
+    def popfront(self, count):
+        u"""Remove the first 'count' rows and return them."""
+        start = self.start
+        rows = self.items[start:start + count]
+        # Release the rows before the compaction.
+        self.items[start:start + len(rows)] = [None] * len(rows)
+        self.start = start = start + len(rows)
+        self.offset += len(rows)
+        if start > len(self.items) // 2:
+            self._compact()
+        return rows
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Vectorized evaluation of column expressions with NumPy (optional).
+
+Columns of the 'columnar' storage are exposed to NumPy without copies:
+typed 'array.array' columns and the numeric columns of mapped binary files
+are wrapped with 'numpy.frombuffer'. Other columns are converted to object
+arrays. Expressions are evaluated as whole column operations (boolean masks
+for predicates), and expressions without vectorized equivalent (or with
+integer results out of the range of the NumPy types) raise 'NotVectorizable'
+so the caller can use the pure python path.
+
+When NumPy is not installed 'numpy' is None and nothing is vectorized.
+"""
+
+import array
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from _binfmt import MappedColumn, MappedStrings
+from _columnar import DictColumn
+from _exprs import (And, Between, BinOp, Column, Compare, IsIn, Literal, Not,
+                    Or)
+
+
+class NotVectorizable(ValueError):
+    pass
+
+
+# NumPy dtype of the mapped fixed width columns.
+MAPPED_DTYPES = {'int': '<i8', 'float': '<f8'}
+
+# Operators of the expressions over arrays.
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge, '+': operator.add,
+    '-': operator.sub, '*': operator.mul, '/': operator.div,
+    '%': operator.mod,
+}
+
+
+def as_array(column):
+    u"""Return a NumPy array with the values of a column."""
+    if isinstance(column, array.array) and column.typecode in 'lBHd':
+        if not len(column):
+            return numpy.zeros(0, column.typecode)
+        # Only valid while the column is not modified.
+        return numpy.frombuffer(column, dtype=column.typecode)
+    if isinstance(column, DictColumn):
+        # Decode with the (small) array of distinct values.
+        values = numpy.empty(len(column.values), dtype=object)
+        for code, value in enumerate(column.values):
+            values[code] = value
+        return values[as_array(column.codes)]
+    if (isinstance(column, MappedColumn) and
+            not isinstance(column, MappedStrings) and
+            column.nulls is None and column.spec['type'] in MAPPED_DTYPES):
+        return numpy.frombuffer(column.buf,
+                                dtype=MAPPED_DTYPES[column.spec['type']],
+                                count=len(column),
+                                offset=column.spec['values'])
+    out = numpy.empty(len(column), dtype=object)
+    out[:] = list(column)
+    return out
+
+
+def evaluate(expr, getcolumn):
+    u"""Evaluate an expression, 'getcolumn(name)' return column arrays."""
+    if isinstance(expr, Column):
+        return getcolumn(expr.name)
+    if isinstance(expr, Literal):
+        return expr.value
+    if isinstance(expr, And):
+        return numpy.logical_and(evaluate(expr.left, getcolumn),
+                                 evaluate(expr.right, getcolumn))
+    if isinstance(expr, Or):
+        return numpy.logical_or(evaluate(expr.left, getcolumn),
+                                evaluate(expr.right, getcolumn))
+    if isinstance(expr, Compare) and expr.op in OPERATORS:
+        return OPERATORS[expr.op](evaluate(expr.left, getcolumn),
+                                  evaluate(expr.right, getcolumn))
+    if isinstance(expr, BinOp) and expr.op in OPERATORS:
+        left = evaluate(expr.left, getcolumn)
+        right = evaluate(expr.right, getcolumn)
+        return checked(expr.op, left, right,
+                       OPERATORS[expr.op](left, right))
+    if isinstance(expr, Not):
+        return numpy.logical_not(evaluate(expr.operand, getcolumn))
+    if isinstance(expr, Between):
+        target = evaluate(expr.target, getcolumn)
+        return numpy.logical_and(evaluate(expr.low, getcolumn) <= target,
+                                 target <= evaluate(expr.high, getcolumn))
+    if isinstance(expr, IsIn):
+        return numpy.in1d(evaluate(expr.target, getcolumn),
+                          list(evaluate(expr.values, getcolumn)))
+    raise NotVectorizable(expr)
+
+
+def checked(op, left, right, result):
+    u"""Return 'result' if the integer operation did not overflow.
+
+    NumPy integers wrap around, python integers do not: the operation is
+    repeated with floats and results near the bounds of the integer type
+    raise 'NotVectorizable' (with a margin for the rounding of the 64 bits
+    values).
+    """
+    dtype = getattr(result, 'dtype', None)
+    if dtype is None or dtype.kind not in 'iu':
+        return result
+    info = numpy.iinfo(dtype)
+    if info.bits < 53:
+        low, high = info.min, info.max
+    else:
+        high = 2.0 ** (info.bits - 2)
+        low = -high if info.min else 0
+    exact = OPERATORS[op](numpy.asarray(left, dtype=float),
+                          numpy.asarray(right, dtype=float))
+    if numpy.any(exact < low) or numpy.any(exact > high):
+        raise NotVectorizable(op)
+    return result
+
+
+def column_values(expr, colnames, columns, size):
+    u"""Evaluate 'expr' over the columns, return an array of 'size' values."""
+    cache = {}
+
+    def getcolumn(name):
+        if name not in cache:
+            cache[name] = as_array(columns[colnames.index(name)])
+        return cache[name]
+
+    try:
+        with numpy.errstate(divide='raise', invalid='raise'):
+            result = numpy.asarray(evaluate(expr, getcolumn))
+    except (TypeError, ArithmeticError):
+        # Let the python path give the same errors as without NumPy.
+        raise NotVectorizable(expr)
+    if result.ndim == 0:
+        value = result.item()
+        result = numpy.empty(size, dtype=result.dtype)
+        result.fill(value)
+    if result.shape != (size,):
+        raise NotVectorizable(expr)
+    return result
+
+
+def positions(expr, colnames, columns, size):
+    u"""Return the positions of the rows where 'expr' is true."""
+    mask = column_values(expr, colnames, columns, size)
+    return numpy.flatnonzero(mask.astype(bool))
+
+
+def to_column(values):
+    u"""Convert an array of values to a 'ColumnStore' column."""
+    if values.dtype.kind == 'i':
+        return array.array('l', values.astype('l').tostring())
+    if values.dtype.kind == 'f':
+        return array.array('d', values.astype('d').tostring())
+    return values.tolist()
+
+
+def take(column, rows):
+    u"""Return a new column with the values at the positions 'rows'."""
+    if isinstance(column, DictColumn):
+        out = column[:0]
+        codes = as_array(column.codes)[rows]
+        out.codes = array.array(column.codes.typecode, codes.tostring())
+        return out
+    if isinstance(column, (list, MappedStrings)) or (
+            isinstance(column, MappedColumn) and column.nulls is not None):
+        return [column[pos] for pos in rows.tolist()]
+    return to_column(as_array(column)[rows])
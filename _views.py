@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Live views over the rows of a 'DataTable'.
+
+A 'DistinctView' keeps the number of rows of every distinct key (reference
+counts) up to date with the events of the table, so the distinct keys and
+the duplicates are known without scan the table again. Every mutation
+costs O(1) per row and the counts are O(1).
+"""
+
+from collections import OrderedDict
+from itertools import repeat
+
+# Priority of the view handlers: after the handlers that can reject rows
+# (capacity checkers).
+PRIORITY = -1
+
+
+class DistinctView(object):
+    u"""Distinct keys of a table, maintained incrementally.
+
+    Args:
+        events: events of the table.
+        rows: rows stored when the view is created.
+        key: function that return the (hashable) key of a row.
+
+    Keys are kept in order of first appearance while rows are only
+    appended; 'ordered' becomes False when other mutations can change it.
+    """
+
+    def __init__(self, events, rows, key):
+        self.events = events
+        self.key = key
+        self.counts = OrderedDict()
+        """Key -> number of rows."""
+        self.dups = set()
+        """Keys with more than one row."""
+        self.duplicates = []
+        """Key of every duplicate row, in row order (while 'ordered')."""
+        self.size = 0
+        """Number of rows."""
+        self.ordered = True
+        """Keys are in the order of the rows of the table."""
+        self.closed = False
+        self.extend(rows)
+        self.handlers = [
+            ('onAppendRow', self.add),
+            ('onExtend', self.extend),
+            ('onInsertRow', self.insert),
+            ('onUpdate', self.update),
+            ('onDelete', self.delete),
+            ('onEvict', self.delete),
+            ('onExpire', self.delete),
+        ]
+        for name, handler in self.handlers:
+            events[name].connect(handler, priority=PRIORITY)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __getitem__(self, key):
+        u"""Return the number of rows with 'key'."""
+        return self.counts.get(key, 0)
+
+    def __repr__(self):
+        return "DistinctView(%i keys, %i rows)" % (len(self), self.size)
+
+    @property
+    def count(self):
+        u"""Number of distinct keys."""
+        return len(self.counts)
+
+    @property
+    def dup_count(self):
+        u"""Number of duplicate rows (rows after the first of every key)."""
+        return self.size - len(self.counts)
+
+    def dup(self):
+        u"""Return the duplicate keys, once for every duplicate row.
+
+        Keys are in row order while 'ordered', else grouped by key in order
+        of first appearance.
+        """
+        if self.ordered:
+            return list(self.duplicates)
+        out = []
+        for key in self.counts:
+            if key in self.dups:
+                out.extend(repeat(key, self.counts[key] - 1))
+        return out
+
+    def add(self, row):
+        key = self.key(row)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count > 1:
+            if count == 2:
+                self.dups.add(key)
+            if self.ordered:
+                self.duplicates.append(key)
+        self.size += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def insert(self, index, row):
+        if index < self.size:
+            self._unordered()
+        self.add(row)
+
+    def update(self, index, old, row):
+        self._unordered()
+        self.discard(old)
+        self.add(row)
+
+    def discard(self, row):
+        key = self.key(row)
+        count = self.counts[key] - 1
+        if count:
+            self.counts[key] = count
+            if count == 1:
+                self.dups.discard(key)
+        else:
+            del self.counts[key]
+        self.size -= 1
+
+    def delete(self, rows):
+        self._unordered()
+        for row in rows:
+            self.discard(row)
+
+    def _unordered(self):
+        u"""The order of the rows changed, it is not kept anymore."""
+        self.ordered = False
+        self.duplicates = []
+
+    def close(self):
+        u"""Stop to follow the table."""
+        self.closed = True
+        for name, handler in self.handlers:
+            if handler in self.events[name]:
+                self.events[name].disconnect(handler)
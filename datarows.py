@@ -6,14 +6,26 @@ less memory that dicts or class instances. In essence is like 'namedtuple' but
 mutable.
 
 Inspired by 'namedlist' package.
+
+Many records of the same class can be stored in a 'DataRowArray', that keeps
+the values column by column (numbers in typed arrays) and gives views with
+the 'DataRow' API.
 """
 
 import sys
 import json
+import keyword
 import collections
 
+from functools import partial
+from operator import attrgetter
+from itertools import imap, islice, izip
+
+from _codec import dumps_columns, loads_columns
+from _columnar import ColumnStore
+
 __version__ = '0.0.1a1'
-__all__ = ['datarow_factory']
+__all__ = ['datarow_factory', 'DataRowArray', 'dumps_many', 'loads_many']
 
 ###############################################################################
 # Blocks of the Class
@@ -66,11 +78,18 @@ def __repr__(self):
 
 
 def __getstate__(self):
+    values = self.values()
+    if len(values) == self.slots_length:
+        # All the attributes are set: values in order.
+        return values
     return dict((slot, getattr(self, slot))
                 for slot in self.__slots__ if hasattr(self, slot))
 
 
 def __setstate__(self, state):
+    if isinstance(state, tuple):
+        self.update(*state)
+        return
     for slot, value in state.items():
         setattr(self, slot, value)
 
@@ -90,7 +109,8 @@ def _get(self, attr, default=None):
 
 def _attrget(self, *attr):
     u"""Recreate object with selected attributes."""
-    return datarow_factory(*attr)(*[self.get(x) for x in attr])
+    cls = _datarow_class(attr, 'DataRow', None, __name__)
+    return cls(*[self.get(x) for x in attr])
 
 
 def _todict(self):
@@ -108,6 +128,11 @@ def _values(self):
     return tuple(v for k, v in self)
 
 
+def _from_values(cls, rows):
+    u"""Return a list of objects from an iterable of tuples of values."""
+    return [cls(*values) for values in rows]
+
+
 def _find(self, attr):
     return self.__slots__.index(attr)
 
@@ -117,10 +142,120 @@ def _json(self):
     return json.dumps(vars(self))
 
 
+###############################################################################
+# Generated methods
+###############################################################################
+
+_METHODS_TEMPLATE = """\
+def __init__(self, *args, **kwargs):
+    if kwargs or len(args) != {length}:
+        self.update(*args, **kwargs)
+        return
+    {attrs}, = args
+
+def update(self, *args, **kwargs):
+    nargs = len(args)
+    if nargs + len(kwargs) > {length}:
+        raise ValueError(u"Number of fields incorrect ('{{}}' > '{{}}')."
+                         .format(nargs + len(kwargs), {length}))
+    if nargs == {length}:
+        {attrs}, = args
+        return
+{update}
+def __iter__(self):
+    try:
+        return iter(({items},))
+    except AttributeError:
+        return _iter(self)
+
+def values(self):
+    try:
+        return ({attrs},)
+    except AttributeError:
+        return _values(self)
+
+def __eq__(self, other):
+    if other.__class__ is self.__class__:
+        try:
+            return ({attrs},) == ({other_attrs},)
+        except AttributeError:
+            pass
+    return _eq(self, other)
+
+def _from_values(cls, rows):
+    new = object.__new__
+    out = []
+    append = out.append
+    for values in rows:
+        self = new(cls)
+        {attrs}, = values
+        append(self)
+    return out
+"""
+
+_UPDATE_TEMPLATE = """\
+    if nargs > {index}:
+        self.{name} = args[{index}]
+    elif {name!r} in kwargs:
+        self.{name} = kwargs[{name!r}]
+    elif not hasattr(self, {name!r}):
+        self.{name} = _default
+"""
+
+
+def _generate_methods(fields, default_value):
+    u"""Return the methods specialized for 'fields' (like 'namedtuple').
+
+    Return None when the code can not be generated (keywords as fields).
+    """
+    fields = [str(f) for f in fields]
+    if any(keyword.iskeyword(f) for f in fields):
+        return None
+    source = _METHODS_TEMPLATE.format(
+        length=len(fields),
+        attrs=', '.join('self.%s' % f for f in fields),
+        other_attrs=', '.join('other.%s' % f for f in fields),
+        items=', '.join('(%r, self.%s)' % (f, f) for f in fields),
+        update=''.join(_UPDATE_TEMPLATE.format(index=i, name=f)
+                       for i, f in enumerate(fields)))
+    namespace = {'_default': default_value, '_iter': __iter__,
+                 '_values': _values, '_eq': __eq__}
+    exec source in namespace
+    methods = dict((name, namespace[name])
+                   for name in ('__init__', 'update', '__iter__', 'values',
+                                '__eq__'))
+    methods['_from_values'] = classmethod(namespace['_from_values'])
+    return methods
+
+
 ###############################################################################
 # Class factory
 ###############################################################################
 
+# Max. number of classes kept by the class cache.
+CLASS_CACHE_SIZE = 256
+
+# (fields, name, default value, module) -> class, in LRU order.
+_class_cache = collections.OrderedDict()
+
+
+def _datarow_class(fields, name, default_value, module):
+    u"""Return a cached class or create a new one (see 'datarow_factory')."""
+    # Types are part of the key: 'a' == u'a' and 0 == False.
+    key = (tuple((type(f), f) for f in fields), name,
+           type(default_value), default_value, module)
+    try:
+        cls = _class_cache.pop(key)
+    except KeyError:
+        cls = _new_datarow_class(fields, name, default_value, module)
+    except TypeError:
+        # Unhashable default value, not cached.
+        return _new_datarow_class(fields, name, default_value, module)
+    _class_cache[key] = cls
+    while len(_class_cache) > CLASS_CACHE_SIZE:
+        _class_cache.popitem(last=False)
+    return cls
+
 
 def datarow_factory(*fields, **factory_kwargs):
     u"""Factory function that generate a *DataRow* class.
@@ -134,7 +269,8 @@ def datarow_factory(*fields, **factory_kwargs):
 
     Returns:
         *DataRow*: Returns a *DataRow* class with the attribute names specified
-            in the factory (*fields argument).
+            in the factory (*fields argument). Classes are cached, the same
+            arguments return the same class.
     """
 
     if not fields:
@@ -147,6 +283,16 @@ def datarow_factory(*fields, **factory_kwargs):
         raise ValueError(
             "Unexpected keyword arguments: '{}'".format(factory_kwargs))
 
+    # Code from namedtuple
+    try:
+        module = sys._getframe(1).f_globals.get('__name__', '__main__')
+    except (AttributeError, ValueError):
+        module = None
+
+    return _datarow_class(fields, name, default_value, module)
+
+
+def _new_datarow_class(fields, name, default_value, module):
     def _update(self, *args, **kwargs):
         total_args = len(args) + len(kwargs)
         if total_args > self.slots_length:
@@ -175,6 +321,7 @@ def datarow_factory(*fields, **factory_kwargs):
 
     cls = {
         'from_json': classmethod(from_json),
+        '_from_values': classmethod(_from_values),
         '__slots__': fields,
         'slots_length': len(fields),
         '__init__': __init__,
@@ -202,15 +349,228 @@ def datarow_factory(*fields, **factory_kwargs):
         'json': _json
     }
 
-    # Code from namedtuple
-    try:
-        cls['__module__'] = sys._getframe(1).f_globals.get('__name__',
-                                                           '__main__')
-    except (AttributeError, ValueError):
-        pass
+    if module is not None:
+        cls['__module__'] = module
 
     cls = type(name, (object,), cls)
 
+    # Specialized methods, after 'type' validates the field names.
+    methods = _generate_methods(fields, default_value)
+    for attr, method in (methods or {}).items():
+        setattr(cls, attr, method)
+
     collections.MutableSequence.register(cls)
 
     return cls
+
+
+###############################################################################
+# Column-wise storage of DataRow records
+###############################################################################
+
+
+class DataRowView(object):
+    u"""Record of a 'DataRowArray' with the 'DataRow' API.
+
+    A view only stores its container and position, values are read from
+    (and written to) the columns of the container.
+    """
+
+    __slots__ = ('_array', '_index')
+
+    def __init__(self, array, index):
+        object.__setattr__(self, '_array', array)
+        object.__setattr__(self, '_index', index)
+
+    def __getattr__(self, attr):
+        try:
+            column = self._array.store.columns[self._array.positions[attr]]
+        except KeyError:
+            raise AttributeError(attr)
+        return column[self._index]
+
+    def __setattr__(self, attr, value):
+        try:
+            pos = self._array.positions[attr]
+        except KeyError:
+            raise AttributeError(attr)
+        self._array.store._writable(pos, value)[self._index] = value
+
+    def __len__(self):
+        return len(self._array.fields)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return list(self.values()[item])
+        return self.values()[item]
+
+    def __iter__(self):
+        return izip(self._array.fields, self.values())
+
+    def __eq__(self, other):
+        try:
+            return tuple(self) == tuple(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __contains__(self, attr):
+        return attr in self._array.positions
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        attr = ("%s=%r" % (k, v) for k, v in self)
+        return u"%s(%s)" % (self._array.row_class.__name__, ', '.join(attr))
+
+    def get(self, attr, default=None):
+        return getattr(self, attr, default)
+
+    def keys(self):
+        u"""Get keys from object."""
+        return self._array.fields
+
+    def values(self):
+        u"""Get values from object."""
+        index = self._index
+        return tuple(c[index] for c in self._array.store.columns)
+
+    def todict(self):
+        u"""Return unordered dict."""
+        return dict(izip(self._array.fields, self.values()))
+
+    def json(self):
+        """"""
+        return json.dumps(self.todict())
+
+    def materialize(self):
+        u"""Return a 'DataRow' object with the values of the view."""
+        return self._array.row_class(*self.values())
+
+
+class DataRowArray(object):
+    u"""Container of the records of a 'DataRow' class, column by column.
+
+    Numeric fields are stored in typed arrays and 'encoded' fields with
+    dictionary encoding (see '_columnar'), so there is no object per record.
+    Items are 'DataRowView' objects created on access.
+
+    Args:
+        row_class: class created by 'datarow_factory'.
+        rows: initial records ('DataRow' objects, dicts or sequences of
+            values).
+        encoded: fields with few distinct values (dictionary encoded).
+    """
+
+    batch_size = 10000
+
+    def __init__(self, row_class, rows=(), encoded=()):
+        self.row_class = row_class
+        self.fields = tuple(row_class.__slots__)
+        self.positions = dict((f, i) for i, f in enumerate(self.fields))
+        self.store = ColumnStore(encoded=set(self.positions[f]
+                                             for f in encoded))
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [DataRowView(self, i)
+                    for i in xrange(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DataRowArray index out of range")
+        return DataRowView(self, index)
+
+    def __setitem__(self, index, row):
+        self.store[index] = self._values(row)
+
+    def __delitem__(self, index):
+        del self.store[index]
+
+    def __iter__(self):
+        return imap(partial(DataRowView, self), xrange(len(self)))
+
+    def __repr__(self):
+        return "DataRowArray(%s, %i)" % (self.row_class.__name__, len(self))
+
+    def _values(self, row):
+        u"""Return the tuple of values of a record."""
+        if isinstance(row, self.row_class):
+            values = row.values()
+            if len(values) == len(self.fields):
+                return values
+        if isinstance(row, (dict, DataRowView)) or \
+                hasattr(row, 'slots_length'):
+            return tuple(row.get(f) for f in self.fields)
+        return tuple(row)
+
+    def append(self, row):
+        self.store.append(self._values(row))
+
+    def extend(self, rows):
+        rows = iter(rows)
+        while True:
+            # In batches, records are not all in memory at once.
+            batch = map(self._values, islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.store.extend(batch)
+
+    def cursor(self):
+        u"""Iterate over the records reusing the same view (flyweight).
+
+        The view moves to the next record on every iteration, so it must
+        not be stored (use 'materialize' or 'values').
+        """
+        view = DataRowView(self, 0)
+        for index in xrange(len(self)):
+            object.__setattr__(view, '_index', index)
+            yield view
+
+    def column(self, field):
+        u"""Return the values of a field."""
+        return self.store.column(self.positions[field])
+
+
+###############################################################################
+# Binary serialization
+###############################################################################
+
+
+def dumps_many(rows):
+    u"""Serialize records of a 'DataRow' class to a compact binary string.
+
+    Values are stored column by column (see '_codec'), 'rows' may be a
+    sequence of 'DataRow' objects of the same class or a 'DataRowArray'.
+    """
+    if isinstance(rows, DataRowArray):
+        return dumps_columns(rows.fields, len(rows),
+                             [list(c) for c in rows.store.columns])
+    rows = list(rows)
+    if not rows:
+        return dumps_columns((), 0, [])
+    fields = rows[0].__slots__
+    try:
+        columns = [map(attrgetter(str(f)), rows) for f in fields]
+    except AttributeError:
+        # Attributes not set.
+        columns = [[row.get(f) for row in rows] for f in fields]
+    return dumps_columns(fields, len(rows), columns)
+
+
+def loads_many(row_class, data):
+    u"""Return the list of 'row_class' objects serialized by 'dumps_many'."""
+    fields, nrows, columns = loads_columns(data)
+    if not nrows:
+        return []
+    if tuple(fields) != tuple(row_class.__slots__):
+        raise ValueError("Fields do not match the class (%s)"
+                         % ', '.join(fields))
+    return row_class._from_values(izip(*columns))
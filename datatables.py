@@ -4,16 +4,38 @@
 """
 
 
+import csv
+import pickle
 import string
 import operator
 import collections
 
-from itertools import imap, ifilter
+from collections import deque
+from itertools import chain, imap, ifilter, islice, izip
 
 from functools import wraps
+from multiprocessing import Pool, cpu_count
+from sys import getsizeof
+from timeit import default_timer
 
-from _utils import SDict
+from _utils import LEAF_TYPES, SDict, total_size
 from _signals import Signal
+from _aggregates import (Accumulator, Count, First, Last, Max, Mean, Min,
+                         Sum, accumulator, aggregate)
+from _binfmt import BinaryFormatError, read_table, write_table
+from _codec import dumps_columns, loads_columns
+from _columnar import ColumnStore, DictColumn
+from _fingerprints import BITS, f_fingerprint
+from _exprs import (Expr, UnsupportedExpression, col, compile_expr,
+                    equalities, parse, prefixes, ranges)
+from _indexes import HashIndex, SortedIndex
+from _parsers import convert_rows, infer_type
+from _profiling import PredicateCounter, Profile, operation_record
+from _retention import Retention
+from _ringbuffer import OVERFLOWS, RingBuffer, Window
+from _views import DistinctView
+from _vectorized import (NotVectorizable, column_values, numpy, positions,
+                         take, to_column)
 #from datarows import datarow_factory
 
 
@@ -67,6 +89,30 @@ class CapacityDesc(Typed):
     expected_type = int
 
 
+# Index types: kind -> index class.
+INDEXES = {
+    'hash': HashIndex,
+    'sorted': SortedIndex,
+}
+
+# Rows stored at once by 'DataTable.extend'.
+BATCH_SIZE = 10000
+
+# Storage backends: name -> factory of the row container.
+STORAGES = {
+    'rows': list,
+    'columnar': ColumnStore,
+}
+
+
+def native_str(text):
+    """Return 'str' for ascii text (json decode strings as 'unicode')."""
+    try:
+        return str(text)
+    except UnicodeError:
+        return text
+
+
 def get_datatype_name(cls):
     """"""
     if cls is None:
@@ -100,6 +146,43 @@ def tuple_insert(data, index, value):
     return data[:index] + (value,) + data[index:]
 
 
+def check_fields(fields, colnames):
+    """Validate the field names used in a projection."""
+    if not all(isinstance(x, basestring) for x in fields):
+        raise DataTableColumnError("Use only string types for parameter "
+                                   "'fields'.")
+
+    invalid_colnames = set(fields) - set(colnames)
+    if invalid_colnames:
+        raise DataTableColumnError("Column '%s' not found"
+                                   % ', '.join(invalid_colnames))
+
+
+def fields_getter(indexes):
+    """Return a function that project a row to the given positions."""
+    if len(indexes) == 1:
+        field_index = indexes[0]
+        return lambda row: (row[field_index],)
+    return operator.itemgetter(*indexes)
+
+
+def counted(function, counter):
+    """Return 'function' counting its calls in 'counter' (if any)."""
+    if counter is None:
+        return function
+    return counter.wrap(function)
+
+
+def f_and(*preds):
+    """Return a predicate true when all the predicates are true."""
+    def inner(row):
+        for pred in preds:
+            if not pred(row):
+                return False
+        return True
+    return inner
+
+
 ###############################################################################
 # Data functions
 ###############################################################################
@@ -126,6 +209,79 @@ def f_dup(data):
         seen[row] = 1
 
 
+def _parallel_select(task):
+    """Process pool task: filter and project a chunk of rows."""
+    rows, colnames, expr, indexes = task
+    if expr is not None:
+        rows = ifilter(expr_decorator(expr, colnames), rows)
+    if indexes is not None:
+        rows = imap(fields_getter(indexes), rows)
+    return list(rows)
+
+
+def _parallel_distinct(task):
+    """Process pool task: distinct rows of a chunk."""
+    rows, indexes = task
+    if indexes is not None:
+        rows = imap(fields_getter(indexes), rows)
+    return list(f_distinct(rows))
+
+
+def _parallel_dup(task):
+    """Process pool task: first and repeated rows of a chunk.
+
+    Return two lists of (position, row): the first occurrences in the chunk
+    (they may be duplicates of rows in previous chunks) and the duplicates.
+    """
+    rows, indexes, offset = task
+    if indexes is not None:
+        rows = imap(fields_getter(indexes), rows)
+    seen = {}
+    firsts = []
+    dups = []
+    for pos, row in enumerate(imap(tuple, rows), offset):
+        if row in seen:
+            dups.append((pos, row))
+        else:
+            seen[row] = 1
+            firsts.append((pos, row))
+    return firsts, dups
+
+
+def _load_table(cls, state, payload):
+    """Rebuild a pickled 'DataTable' (see 'DataTable.__reduce__')."""
+    indexes = state.pop('indexes')
+    obj = cls(**state)
+    if isinstance(payload, list):
+        rows = payload
+    else:
+        _, nrows, columns = loads_columns(payload)
+        rows = izip(*columns) if columns else [()] * nrows
+    obj.extend(rows)
+    for columns, kind in indexes:
+        obj.create_index(*columns, kind=kind)
+    return obj
+
+
+def _add_field_rows(rows, index, value, colnames):
+    """Insert a constant or calculated field at 'index' of the rows."""
+    if callable(value) or isinstance(value, Expr):
+        func = expr_decorator(value, colnames)
+        return (tuple_insert(row, index, func(row)) for row in rows)
+    return (tuple_insert(row, index, value) for row in rows)
+
+
+def _by_name(expr):
+    """Return True if the predicate access the columns only by name."""
+    if isinstance(expr, basestring):
+        try:
+            parse(expr)
+        except (UnsupportedExpression, SyntaxError):
+            return False
+        return True
+    return isinstance(expr, Expr)
+
+
 def _look(data):
     for row in data:
         print "- ilook -> {}".format(row)
@@ -138,10 +294,24 @@ def _look(data):
 
 
 def expr_decorator(method, colnames):
-    def inner(row):
-        sdict = SDict(zip(colnames, row))
-        return method(sdict)
-    return inner
+    """Compile 'method' to a function over the row tuples."""
+    try:
+        return compile_expr(method, colnames)
+    except KeyError as exc:
+        raise DataTableColumnError("Column '%s' not found" % exc.args[0])
+
+
+def _apply(self, method, args, kwargs, counter=None):
+    # method execution and new context
+    if counter is not None:
+        # Predicate counter of the operation (see 'profile').
+        kwargs = dict(kwargs, _counter=counter)
+    result = method(self, *args, **kwargs)
+    if isinstance(result, DataTable):
+        # Built by the method (vectorized execution).
+        return result
+    colnames = args if method.func_name == 'select' else None
+    return self._derive(result, colnames)
 
 
 def fluent(method):
@@ -150,18 +320,9 @@ def fluent(method):
         if (not self.is_initialized or
            (method.func_name.endswith('select') and not args)):
             return self
-        # Instance creation
-        obj = self.__class__.__new__(self.__class__)
-        # method execution and new context
-        result = method(self, *args, **kwargs)
-        # Copy new context to new instance
-        obj.__dict__ = self.__dict__.copy()
-        if method.func_name == 'select':
-            obj.colnames = args
-        # Populate object
-        obj.list = []
-        obj.extend(result)
-        return obj
+        if self.events.onOperation:
+            return self._profiled(method, args, kwargs)
+        return _apply(self, method, args, kwargs)
     return inner
 
 
@@ -181,44 +342,209 @@ class DataTable(collections.MutableSequence):
         """Store the name os the 'DataTable' object."""
         self.capacity = kwargs.pop('capacity', 0)
         """Store the max capacity of rows in the container."""
+        self.overflow = kwargs.pop('overflow', 'raise')
+        """Action when the capacity is reached: 'raise', 'evict_oldest' or
+        'evict_newest' (see '_ringbuffer')."""
         self.firstrow_header = kwargs.pop('firstrow_header', False)
         """Identify if the firstrow is a header line."""
+        self.storage = kwargs.pop('storage', 'rows')
+        """Storage backend: 'rows' (list of tuples) or 'columnar'."""
+        self.encoded = kwargs.pop('encoded', ())
+        """Dictionary encoded columns ('columnar'): names or 'auto'."""
+        retention = kwargs.pop('retention', None)
+        self.retention = None
+        """Retention policy (see 'set_retention')."""
         # input_converter = kwargs.pop('input_converter', True)
         # """Disable input conversion to 'tuple' object (more speed)."""
 
         if kwargs:
             raise DataTableError("Unexpected keyword arguments (%r)" % kwargs)
 
-        self.events = SDict(onAppend=Signal(), onInsert=Signal())
-
-        if self.capacity:
+        if self.storage not in STORAGES:
+            raise DataTableError("Unknown storage '%s'" % self.storage)
+
+        if self.encoded and self.storage != 'columnar':
+            raise DataTableError("Dictionary encoding needs 'columnar' "
+                                 "storage")
+        if self.encoded != 'auto':
+            self.encoded = tuple(self.encoded)
+
+        if self.overflow != 'raise':
+            if self.overflow not in OVERFLOWS:
+                raise DataTableError("Unknown overflow '%s'" % self.overflow)
+            if not self.capacity:
+                raise DataTableError("Overflow '%s' needs a capacity"
+                                     % self.overflow)
+            if self.storage != 'rows':
+                raise DataTableError("Overflow '%s' needs 'rows' storage"
+                                     % self.overflow)
+
+        self.events = self._new_events()
+        """Signals emitted before store rows: 'onAppend()' and 'onInsert()'
+        (also 'onAppend()' per row of 'extend'), with the rows:
+        'onAppendRow(row)', 'onInsertRow(index, row)' and 'onExtend(rows)'
+        (once per batch of 'extend'); before replace or delete rows:
+        'onUpdate(index, old, row)' and 'onDelete(rows)'; after rows are
+        evicted by the 'overflow' policy: 'onEvict(rows)'; after rows are
+        removed by the retention policy: 'onExpire(rows)'; and
+        'onOperation(record)' after every operation (see 'profile')."""
+        self.indexes = {}
+        """Column indexes: tuple of column names -> index."""
+        self.views = {}
+        """Distinct views: tuple of column names -> 'DistinctView'."""
+
+        if self.capacity and self.overflow == 'raise':
             # Connect events to handlers.
-            self.events.onAppend.append(self._capacity_checker)
-            self.events.onInsert.append(self._capacity_checker)
+            self.events.onAppendRow.append(self._capacity_checker)
+            self.events.onInsertRow.append(self._capacity_checker)
+            self.events.onExtend.append(self._batch_capacity_checker)
+
+        if args and not self.colnames and self.firstrow_header:
+            # Header is not stored, so it does not fix the column types.
+            self.colnames = tuple(args[0])
+            args = args[1:]
 
-        self.list = list()
+        if self.encoded != 'auto' and self.colnames:
+            check_fields(self.encoded, self.colnames)
+
+        self.list = self._new_storage()
         self.extend(args)
 
         if args and not self.colnames:
-            if self.firstrow_header:
-                self.colnames = tuple(self.list.pop(0))
-            else:
-                self.colnames = tuple("C%i" % x
-                                      for x in range(len(self.list[0])))
+            self.colnames = tuple("C%i" % x for x in range(len(self.list[0])))
+
+        if retention is not None:
+            self.set_retention(retention)
+
+    @classmethod
+    def from_csv(cls, path, chunksize=10000, dtypes=None, usecols=None,
+                 sample=1000, delimiter=',', **kwargs):
+        u"""Load a CSV file with header line in chunks.
+
+        The file is parsed in chunks of 'chunksize' rows that are converted
+        column by column and loaded in the storage, so memory stays near the
+        size of the final object.
+
+        Args:
+            path: path of the CSV file.
+            chunksize: number of rows parsed at once.
+            dtypes: {column: type} with the type (or conversion function) of
+                the columns. Types of the other columns are inferred ('int',
+                'float' or 'str') from the first 'sample' rows, where empty
+                values are missing values ('None').
+            usecols: names of the columns to load, in the given order.
+            sample: number of rows used for the type inference.
+            delimiter: field delimiter.
+            **kwargs: keyword arguments for the new object ('name',
+                'storage', 'capacity'...).
+
+        Returns:
+            New 'DataTable' object.
+        """
+        dtypes = dict(dtypes or {})
+        with open(path, 'rb') as csvfile:
+            reader = csv.reader(csvfile, delimiter=delimiter)
+            header = tuple(next(reader, ()))
+            colnames = tuple(usecols) if usecols else header
+            check_fields(colnames, header)
+            check_fields(tuple(dtypes), colnames)
+            getter = fields_getter(fields2index(colnames, header))
+            width = len(header)
+
+            def chunks():
+                chunk = []
+                for line, row in enumerate(reader, 2):
+                    if not row:
+                        continue
+                    if len(row) != width:
+                        raise DataTableError(
+                            "Line %i: expected %i fields, found %i"
+                            % (line, width, len(row)))
+                    chunk.append(getter(row))
+                    if len(chunk) >= chunksize:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+            obj = cls(colnames=colnames, **kwargs)
+            types = None
+            for chunk in chunks():
+                if types is None:
+                    sample_rows = zip(*chunk[:sample])
+                    types = [dtypes[c] if c in dtypes else
+                             infer_type(values)
+                             for c, values in zip(colnames, sample_rows)]
+                    strict = [c in dtypes for c in colnames]
+                try:
+                    obj.extend(convert_rows(chunk, types, strict))
+                except ValueError as exc:
+                    raise DataTableTypeError(exc)
+        return obj
+
+    @classmethod
+    def from_binary(cls, path, **kwargs):
+        u"""Open a file written by 'to_binary'.
+
+        With the default 'columnar' storage the file is mapped in memory
+        ('mmap'): the object is usable at once, pages are loaded on demand
+        and shared by all the processes that open the file. Columns are
+        copied to memory only when they are modified.
+
+        Args:
+            path: path of the binary file.
+            **kwargs: keyword arguments for the new object ('storage',
+                'capacity'...).
+        """
+        try:
+            header, columns = read_table(path)
+        except ValueError as exc:
+            # Format errors and files that can not be mapped (empty).
+            raise DataTableError("%s: %s" % (path, exc))
+        colnames = tuple(native_str(c) for c in header['colnames'])
+        name = header['name'].encode('utf-8')
+        storage = kwargs.pop('storage', 'columnar')
+        obj = cls(colnames=colnames, name=name, storage=storage, **kwargs)
+        if storage == 'columnar':
+            store = ColumnStore(columns)
+            if obj.capacity:
+                obj._batch_capacity_checker(store)
+            obj.list = store
+            if obj.encoded != 'auto':
+                obj.encode(*obj.encoded)
+        else:
+            obj.extend(izip(*columns))
+        return obj
+
+    def to_binary(self, path):
+        u"""Write the object to a binary file (see 'from_binary').
+
+        Columns may have 'int', 'float', 'bool', 'str' or 'unicode' values,
+        one type per column, and 'None'.
+        """
+        width = len(self.colnames)
+        if any(len(row) != width for row in self):
+            raise DataTableError("All rows must have '%i' columns" % width)
+        columns = [lambda idx=idx: iter(self._column(idx))
+                   for idx in range(width)]
+        try:
+            write_table(path, self.name, self.colnames, self.count, columns)
+        except BinaryFormatError as exc:
+            raise DataTableTypeError(exc)
 
     def __iter__(self):
+        if self.retention is not None:
+            self.retention.check(self)
         for row in self.list:
             yield row
 
     def __len__(self):
+        if self.retention is not None:
+            self.retention.check(self)
         return len(self.list)
 
     def __add__(self, value):
-        if value is not self:
-            self.extend(value)
-        else:
-            for row in self.list[:]:
-                self.append(row)
+        self.extend(value)
         return self
 
     __iadd__ = __add__
@@ -232,117 +558,827 @@ class DataTable(collections.MutableSequence):
 
             idx = self.colnames.index(item)
             # Add header name in the first position
-            l = (item,) + tuple(x[idx] for x in self.list)
+            l = (item,) + tuple(self._column(idx))
             return l
 
     def __delitem__(self, index):
+        if self.retention is not None:
+            self.retention.invalidate()
+        if self.events.onDelete:
+            if isinstance(index, slice):
+                self.events.onDelete(self.list[index])
+            else:
+                self.events.onDelete([self.list[index]])
+
         def delitem(idx):
+            if self.indexes:
+                self._index_delete(idx)
             del self.list[idx]
         if isinstance(index, slice):
-            [delitem(i) for i in xrange(*index.indices(len(self)))]
+            # Last first, positions before are not shifted.
+            for i in sorted(xrange(*index.indices(len(self))), reverse=True):
+                delitem(i)
         else:
             delitem(index)
 
     def __setitem__(self, index, row):
         # TODO(Alejandro): implement case when item is a 'slice'
+        row = tuple(row)
+        if self.retention is not None:
+            self.retention.invalidate()
         try:
-            self.list[index] = tuple(row)
+            old = self.list[index]
         except IndexError:
             raise DataTableError("Index '%i' not created" % index)
+        self.events.onUpdate(index, old, row)
+        self.list[index] = row
+        if self.indexes:
+            if index < 0:
+                index += len(self.list)
+            index += self._base
+            for idx in self.indexes.itervalues():
+                if not idx.stale:
+                    idx.discard(index, old)
+                    idx.add(index, row)
 
     def __repr__(self):
         return "DataTable(%s)" % self.list
 
+    def __reduce__(self):
+        u"""Pickle the rows column by column with the binary codec.
+
+        Event handlers and the retention policy are not pickled, indexes
+        are created again.
+        """
+        state = {'colnames': self.colnames, 'name': self.name,
+                 'capacity': self.capacity, 'overflow': self.overflow,
+                 'storage': self.storage,
+                 'encoded': self.encoded,
+                 'indexes': [(columns, idx.kind)
+                             for columns, idx in self.indexes.iteritems()]}
+        if self.storage == 'columnar':
+            widths = set([self.list.width] if len(self) else [])
+        else:
+            widths = set(imap(len, self.list))
+        if len(widths) > 1:
+            # Rows of different size, pickled as they are.
+            payload = list(self.list)
+        else:
+            width = widths.pop() if widths else 0
+            payload = dumps_columns((), len(self), [list(self._column(i))
+                                                    for i in range(width)])
+        return _load_table, (self.__class__, state, payload)
+
     def __str__(self):
         return str(self.list)
 
+    @staticmethod
+    def _new_events():
+        return SDict(onAppend=Signal(), onInsert=Signal(),
+                     onAppendRow=Signal(), onInsertRow=Signal(),
+                     onExtend=Signal(),
+                     onUpdate=Signal(), onDelete=Signal(), onEvict=Signal(),
+                     onExpire=Signal(), onOperation=Signal())
+
+    def _new_storage(self):
+        if self.capacity and self.overflow != 'raise':
+            return RingBuffer(self.capacity, self.overflow)
+        if self.retention is not None:
+            return Window()
+        if self.encoded:
+            encoded = self.encoded
+            if encoded != 'auto':
+                encoded = set(fields2index(encoded, self.colnames))
+            return ColumnStore(encoded=encoded)
+        return STORAGES[self.storage]()
+
+    def _derive(self, rows, colnames=None, columns=None):
+        u"""Create a new object with the context of this one and 'rows'.
+
+        With 'columns' the new object (columnar) stores these containers.
+        """
+        obj = self.__class__.__new__(self.__class__)
+        # Copy context to new instance
+        obj.__dict__ = self.__dict__.copy()
+        # The rows events are not shared with the source, the operations
+        # are (see 'profile').
+        obj.events = self._new_events()
+        obj.events.onOperation = self.events.onOperation
+        obj.indexes = {}
+        obj.views = {}
+        obj.retention = None
+        # The capacity bounds the source only, derived rows are not evicted.
+        obj.capacity = 0
+        obj.overflow = 'raise'
+        if colnames is not None:
+            obj.colnames = colnames
+        # Populate object
+        if columns is not None:
+            obj.list = ColumnStore(columns)
+            return obj
+        obj.list = obj._new_storage()
+        obj.extend(rows)
+        return obj
+
+    def _column(self, idx):
+        u"""Iterate over the values of the column at position 'idx'."""
+        if self.storage == 'columnar':
+            return self.list.column(idx)
+        return imap(operator.itemgetter(idx), self.list)
+
+    #
+    # Dictionary encoding
+    #
+
+    def encode(self, *columns):
+        u"""Dictionary encode 'columns' ('columnar' storage).
+
+        Every row stores the small integer code of its value and the
+        distinct values are stored once. Values are decoded on access;
+        equality filters, 'distinct' and 'group_by' work over the codes.
+        """
+        if self.storage != 'columnar':
+            raise DataTableError("Dictionary encoding needs 'columnar' "
+                                 "storage")
+        check_fields(columns, self.colnames)
+        if self.encoded != 'auto':
+            self.encoded += tuple(c for c in columns if c not in self.encoded)
+        if not self.is_initialized:
+            # Columns are encoded when created by the first row.
+            self.list = self._new_storage()
+        else:
+            for idx in fields2index(columns, self.colnames):
+                self.list.encode(idx)
+        return self
+
+    def _dictionaries(self):
+        u"""Return the dictionary encoded columns: name -> 'DictColumn'."""
+        if self.storage != 'columnar':
+            return {}
+        return dict((name, column)
+                    for name, column in izip(self.colnames, self.list.columns)
+                    if isinstance(column, DictColumn))
+
+    #
+    # Vectorized execution
+    #
+
+    def _vectorized(self, expr):
+        u"""Return 'expr' as 'Expr' if it can be evaluated with NumPy."""
+        if numpy is None or self.storage != 'columnar' or not len(self):
+            return None
+        if isinstance(expr, basestring):
+            try:
+                expr = parse(expr)
+            except UnsupportedExpression:
+                return None
+        if not isinstance(expr, Expr) or \
+                not expr.columns() <= set(self.colnames):
+            return None
+        return expr
+
+    def _vector_rows(self, expr):
+        u"""Return the positions of the rows matching 'expr' (or None)."""
+        expr = self._vectorized(expr)
+        if expr is None:
+            return None
+        try:
+            return positions(expr, self.colnames, self.list.columns,
+                             len(self))
+        except NotVectorizable:
+            return None
+
+    def _vector_take(self, rows, fields=None):
+        u"""Return a new object with the 'rows' positions of 'fields'."""
+        indexes = range(len(self.colnames))
+        if fields is not None:
+            indexes = fields2index(fields, self.colnames)
+        columns = [take(self.list.column(i), rows) for i in indexes]
+        return self._derive((), fields, columns)
+
+    #
+    # Instrumentation
+    #
+
+    def profile(self):
+        u"""Return a 'Profile' of the operations of this object.
+
+        Used as context manager, it collects a record of every operation
+        ('filter', 'select', 'distinct', 'dup', 'add_field') of this object
+        and of the objects derived from it::
+
+            with dt.profile() as prof:
+                dt.filter(col('age') > 30).select('name')
+            print prof.report()
+        """
+        return Profile(self)
+
+    def _profiled(self, method, args, kwargs):
+        u"""Apply an operation and emit its 'onOperation' record."""
+        counter = PredicateCounter()
+        start = default_timer()
+        result = _apply(self, method, args, kwargs, counter)
+        self.events.onOperation(operation_record(
+            self, method.func_name, args, kwargs, counter, start, result))
+        return result
+
+    #
+    # Index maintenance
+    #
+
+    @property
+    def _base(self):
+        u"""Absolute position of the first row (rows evicted before it).
+
+        Indexes store absolute positions, so they stay valid while the
+        window of a ring buffer moves.
+        """
+        if isinstance(self.list, (RingBuffer, Window)):
+            return self.list.offset
+        return 0
+
+    def _rows_at(self, positions):
+        u"""Return the rows at the absolute 'positions' of an index."""
+        rows = self.list
+        base = self._base
+        if not base:
+            return [rows[pos] for pos in positions]
+        return [rows[pos - base] for pos in positions]
+
+    def _index_add(self, pos, row):
+        pos += self._base
+        for idx in self.indexes.itervalues():
+            if not idx.stale:
+                idx.add(pos, row)
+
+    def _index_discard(self, pos, row):
+        u"""Remove the row at the absolute position 'pos' of the indexes."""
+        for idx in self.indexes.itervalues():
+            if not idx.stale:
+                idx.discard(pos, row)
+
+    def _index_insert(self, pos, row):
+        if pos >= len(self.list) - 1:
+            self._index_add(len(self.list) - 1, row)
+        else:
+            # Positions after 'pos' are shifted, rebuild on next use.
+            for idx in self.indexes.itervalues():
+                idx.stale = True
+
+    def _index_delete(self, pos):
+        size = len(self.list)
+        if pos < 0:
+            pos += size
+        for idx in self.indexes.itervalues():
+            if pos == size - 1 and not idx.stale:
+                idx.discard(pos + self._base, self.list[pos])
+            else:
+                idx.stale = True
+
+    def _get_index(self, columns):
+        idx = self.indexes[columns]
+        if idx.stale:
+            idx.build(self.list, self._base)
+        return idx
+
+    def _index_scan(self, expr):
+        u"""Return the rows that can match 'expr' using an index.
+
+        Dictionary encoded columns are used like indexes for equalities.
+        Return None when there is no index for the expression.
+        """
+        dictionaries = self._dictionaries()
+        if not self.indexes and not dictionaries:
+            return None
+        if isinstance(expr, basestring):
+            try:
+                expr = parse(expr)
+            except (UnsupportedExpression, SyntaxError):
+                return None
+        if not isinstance(expr, Expr):
+            return None
+        equal = equalities(expr)
+        # Most selective first: index with more columns.
+        for columns in sorted(self.indexes, key=len, reverse=True):
+            if all(c in equal for c in columns):
+                key = tuple(equal[c] for c in columns)
+                return self._index_rows(columns, key)
+        # Range and prefix terms over sorted indexes.
+        bounds = ranges(expr)
+        starts = prefixes(expr)
+        for columns, idx in self.indexes.iteritems():
+            if idx.kind != 'sorted' or len(columns) != 1:
+                continue
+            if columns[0] in bounds:
+                low, low_inclusive, high, high_inclusive = bounds[columns[0]]
+                return self.lookup_range(columns[0], low, high, low_inclusive,
+                                         high_inclusive)
+            if columns[0] in starts:
+                return self.lookup_prefix(columns[0], starts[columns[0]])
+        for name, column in dictionaries.iteritems():
+            if name in equal:
+                return [self.list[pos]
+                        for pos in column.positions(equal[name])]
+        return None
+
+    def _index_rows(self, columns, key):
+        idx = self._get_index(columns)
+        if len(columns) == 1:
+            key = key[0]
+        try:
+            positions = idx.lookup(key)
+        except TypeError:
+            # Unhashable key, no row can match.
+            positions = []
+        return self._rows_at(positions)
+
+    def create_index(self, *columns, **kwargs):
+        u"""Create an index over 'columns'.
+
+        Indexes are used by 'lookup' and by 'filter'/'select' when the
+        expression is a column or string expression with equality terms
+        over the indexed columns.
+        """
+        kind = kwargs.pop('kind', 'hash')
+        if kwargs:
+            raise DataTableError("Unexpected keyword arguments (%r)" % kwargs)
+        if kind not in INDEXES:
+            raise DataTableError("Unknown index kind '%s'" % kind)
+        if not columns:
+            raise DataTableColumnError("Index without columns")
+        check_fields(columns, self.colnames)
+        idx = INDEXES[kind](columns, fields2index(columns, self.colnames))
+        idx.build(self.list, self._base)
+        self.indexes[columns] = idx
+        return idx
+
+    def drop_index(self, *columns):
+        u"""Remove the index over 'columns'."""
+        try:
+            del self.indexes[columns]
+        except KeyError:
+            raise DataTableError("Index '%s' not found" % ', '.join(columns))
+
+    def lookup(self, **values):
+        u"""Return the rows with the given column values using an index."""
+        columns = tuple(c for c in self.indexes if set(c) == set(values))
+        if not columns:
+            raise DataTableError("Index '%s' not found"
+                                 % ', '.join(sorted(values)))
+        columns = columns[0]
+        return self._index_rows(columns, tuple(values[c] for c in columns))
+
+    def _sorted_index(self, column):
+        idx = self.indexes.get((column,))
+        if idx is None or idx.kind != 'sorted':
+            raise DataTableError("Sorted index '%s' not found" % column)
+        return self._get_index((column,))
+
+    def lookup_range(self, column, low=None, high=None, low_inclusive=True,
+                     high_inclusive=True):
+        u"""Return the rows with 'column' in a range using a sorted index.
+
+        'None' in 'low' or 'high' means no bound.
+        """
+        idx = self._sorted_index(column)
+        return self._rows_at(idx.range(low, high, low_inclusive,
+                                       high_inclusive))
+
+    def lookup_prefix(self, column, prefix):
+        u"""Return the rows with 'column' starting by 'prefix'."""
+        idx = self._sorted_index(column)
+        return self._rows_at(idx.prefix(prefix))
+
     #
     # built-in event handlers.
     #
 
-    def _capacity_checker(self):
+    def _capacity_checker(self, *args):
         if self.count >= self.capacity:
             raise DataTableCapacityError(
                 "Maximun capacity reached, stop ('%i')" % self.capacity)
 
+    def _batch_capacity_checker(self, rows):
+        if self.count + len(rows) > self.capacity:
+            raise DataTableCapacityError(
+                "Maximun capacity reached, stop ('%i')" % self.capacity)
+
     #
     # Special methods
     #
 
     def append(self, row):
         """"""
+        row = tuple(row)
         self.events.onAppend()
-        self.list.append(tuple(row))
+        self.events.onAppendRow(row)
+        # Ring buffers return the evicted (position, row).
+        evicted = self.list.append(row)
+        if self.indexes:
+            self._index_add(len(self.list) - 1, row)
+        if evicted is not None:
+            self._index_discard(*evicted)
+            self.events.onEvict([evicted[1]])
+        if self.retention is not None:
+            self.retention.enforce(self, (row,))
+
+    def extend(self, rows):
+        u"""Append the rows of an iterable.
+
+        Rows are stored in batches of 'BATCH_SIZE' rows: every batch fires
+        one 'onExtend(rows)' event (instead of 'onAppendRow' per row) and
+        it is stored completely or not at all. 'onAppend()' is still fired
+        for every row, before the batch is stored.
+        """
+        if rows is self:
+            rows = self.list[:]
+        rows = iter(rows)
+        while True:
+            # 'tuple' returns the same object for tuples.
+            batch = map(tuple, islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            self.events.onExtend(batch)
+            if self.events.onAppend:
+                for _ in batch:
+                    self.events.onAppend()
+            if isinstance(self.list, RingBuffer):
+                self._ring_extend(batch)
+            else:
+                start = len(self.list)
+                self.list.extend(batch)
+                if self.indexes:
+                    for pos, row in enumerate(batch, start):
+                        self._index_add(pos, row)
+            if self.retention is not None:
+                self.retention.enforce(self, batch)
+
+    append_many = extend
+
+    def _ring_extend(self, rows):
+        u"""Append rows one by one to the ring buffer ('onEvict' once)."""
+        evicted = []
+        for row in rows:
+            pair = self.list.append(row)
+            if self.indexes:
+                self._index_add(len(self.list) - 1, row)
+            if pair is not None:
+                self._index_discard(*pair)
+                evicted.append(pair[1])
+        if evicted:
+            self.events.onEvict(evicted)
 
     def insert(self, index, row):
+        row = tuple(row)
         self.events.onInsert()
-        self.list.insert(index, tuple(row))
+        self.events.onInsertRow(index, row)
+        evicted = self.list.insert(index, row)
+        if evicted is not None:
+            # All the positions are shifted.
+            for idx in self.indexes.itervalues():
+                idx.stale = True
+            self.events.onEvict([evicted[1]])
+        elif self.indexes:
+            if index < 0:
+                index += len(self.list) - 1
+            self._index_insert(index, row)
+        if self.retention is not None:
+            # The row may be the first one.
+            self.retention.invalidate()
+            self.retention.enforce(self, (row,))
+
+    #
+    # Retention
+    #
+
+    def set_retention(self, retention):
+        u"""Bound the rows by age and/or size with a 'Retention' policy.
+
+        Expired rows are removed from the front in bulk (see '_retention')
+        and reported with the 'onExpire(rows)' event, when the table is
+        written, iterated or counted. 'None' removes the policy. Needs 'rows'
+        storage.
+        """
+        if self.retention is not None:
+            self.retention.detach(self)
+            self.retention = None
+        if retention is None:
+            return self
+        if self.storage != 'rows':
+            raise DataTableError("Retention needs 'rows' storage")
+        if retention.column is not None:
+            check_fields((retention.column,), self.colnames)
+        if not isinstance(self.list, (RingBuffer, Window)):
+            self.list = Window(self.list)
+        retention.attach(self)
+        self.retention = retention
+        self.expire()
+        return self
+
+    def expire(self):
+        u"""Remove the expired rows now, return how many."""
+        if self.retention is None:
+            return 0
+        return self.retention.expire(self)
+
+    def _expire(self, count):
+        u"""Remove the first 'count' rows (see 'Retention.expire')."""
+        base = self._base
+        rows = self.list.popfront(count)
+        if self.indexes:
+            for pos, row in enumerate(rows, base):
+                self._index_discard(pos, row)
+        self.events.onExpire(rows)
 
     @fluent
-    def filter(self, expr):
+    def filter(self, expr, _counter=None):
         u"""Filter container data."""
-        data_kernel = self
-        if not is_attribute_access(data_kernel[0], self.colnames):
+        data_kernel = self._index_scan(expr)
+        if data_kernel is None:
+            rows = self._vector_rows(expr)
+            if rows is not None:
+                return self._vector_take(rows)
+            data_kernel = self
+        if not is_attribute_access(self[0], self.colnames):
             # Necessary for attribute access
             expr = expr_decorator(expr, self.colnames)
-        return ifilter(expr, data_kernel)
+        return ifilter(counted(expr, _counter), data_kernel)
         #return (x for x in data_kernel if expr(x))
 
     @fluent
     def select(self, *fields, **kwargs):
         u"""Select fields in the object."""
-        if not all(isinstance(x, basestring) for x in fields):
-            raise DataTableColumnError("Use only string types for parameter "
-                                       "'fields'.")
-
-        invalid_colnames = set(fields) - set(self.colnames)
-        if invalid_colnames:
-            raise DataTableColumnError("Column '%s' not found"
-                                       % ', '.join(invalid_colnames))
+        check_fields(fields, self.colnames)
 
         data_kernel = self
-        where = kwargs.pop('where', lambda x: x)
-        if not is_attribute_access(data_kernel[0], self.colnames):
-            # Necessary for attribute access
-            expr = expr_decorator(where, self.colnames)
-        if len(fields) == 1:
-            field_index = self.colnames.index(fields[0])
-            getter = lambda row: (row[field_index],)
-        else:
-            getter = operator.itemgetter(*fields2index(fields, self.colnames))
+        expr = kwargs.pop('where', None)
+        counter = kwargs.pop('_counter', None)
+        if expr is not None:
+            data_kernel = self._index_scan(expr)
+            if data_kernel is None:
+                rows = self._vector_rows(expr)
+                if rows is not None:
+                    return self._vector_take(rows, fields)
+                data_kernel = self
+            if not is_attribute_access(self[0], self.colnames):
+                # Necessary for attribute access
+                expr = expr_decorator(expr, self.colnames)
+            data_kernel = ifilter(counted(expr, counter), data_kernel)
+        getter = fields_getter(fields2index(fields, self.colnames))
         # getter transfor to tuples
-        return imap(getter, ifilter(expr, data_kernel))
+        return imap(getter, data_kernel)
 
     @fluent
-    def distinct(self, *fields):
-        """Return new 'datatable' with distinct rows."""
+    def distinct(self, *fields, **kwargs):
+        """Return new 'datatable' with distinct rows.
+
+        With 'fingerprint' (64 or 128) only a hash of every distinct row is
+        stored (see '_fingerprints'), and with 'verify' the rows with equal
+        hashes are compared.
+        """
+        kwargs.pop('_counter', None)
+        if kwargs:
+            return self._fingerprint(fields, kwargs, False)
+        view = self._ordered_view(fields)
+        if view is not None:
+            # A copy, the view changes with the table.
+            return list(view)
         data_kernel = self
         if fields:
-            data_kernel = self.select(*fields)
+            dictionaries = self._dictionaries()
+            if all(f in dictionaries for f in fields):
+                # Distinct codes, decoded at the end.
+                return self._distinct_codes([dictionaries[f] for f in fields])
+            data_kernel = self._project(fields)
         return f_distinct(data_kernel)
 
+    def _project(self, fields):
+        u"""Iterate over the 'fields' of the rows."""
+        check_fields(fields, self.colnames)
+        return imap(fields_getter(fields2index(fields, self.colnames)), self)
+
+    def _fingerprint(self, fields, kwargs, dup):
+        u"""Distinct or duplicate rows with fingerprints."""
+        bits = kwargs.pop('fingerprint', 64)
+        verify = kwargs.pop('verify', False)
+        if kwargs:
+            raise DataTableError("Unexpected keyword arguments (%r)" % kwargs)
+        if bits not in BITS:
+            raise DataTableError("Fingerprints of 64 or 128 bits")
+        check_fields(fields, self.colnames)
+        key = tuple
+        if fields:
+            key = fields_getter(fields2index(fields, self.colnames))
+        rows = self.list
+        source = None
+        if verify:
+            def source(pos):
+                return key(rows[pos])
+        return f_fingerprint(imap(key, rows), bits, source, dup)
+
+    def distinct_view(self, *fields):
+        u"""Return a 'DistinctView' of the 'fields' (all by default).
+
+        The view follows the events of this object and keeps the number of
+        rows of every distinct key, so 'count', 'dup_count' and 'dup' do not
+        scan the rows. While rows are only appended, 'distinct' and 'dup'
+        over the same fields are built from the view.
+        """
+        check_fields(fields, self.colnames)
+        view = self.views.get(fields)
+        if view is None or view.closed:
+            if fields:
+                key = fields_getter(fields2index(fields, self.colnames))
+            else:
+                key = tuple
+            view = self.views[fields] = DistinctView(self.events, self.list,
+                                                     key)
+        return view
+
+    def _ordered_view(self, fields):
+        u"""Return the view of 'fields' if it has the order of the rows."""
+        view = self.views.get(fields)
+        if view is not None and view.ordered and not view.closed:
+            return view
+        return None
+
+    def _distinct_codes(self, columns):
+        if len(columns) == 1:
+            return ((value,) for value in columns[0].distinct())
+        keys = f_distinct(izip(*[c.codes for c in columns]))
+        return (tuple(c.values[code] for c, code in izip(columns, key))
+                for key in keys)
+
     @fluent
-    def dup(self, *fields):
-        """Return new 'datatable' with distinct rows."""
+    def dup(self, *fields, **kwargs):
+        """Return new 'datatable' with duplicate rows (see 'distinct')."""
+        kwargs.pop('_counter', None)
+        if kwargs:
+            return self._fingerprint(fields, kwargs, True)
+        view = self._ordered_view(fields)
+        if view is not None:
+            return view.dup()
         data_kernel = self
         if fields:
-            data_kernel = self.select(*fields)
+            data_kernel = self._project(fields)
         return f_dup(data_kernel)
 
     @fluent
-    def add_field(self, name, value='', index=-1):
+    def add_field(self, name, value='', index=-1, _counter=None):
         """"""
-        if callable(value):
-            expr = expr_decorator(value, self.colnames)
+        if index == -1:
+            index = len(self.colnames)
+        colnames = tuple_insert(self.colnames, index, name)
+
+        expr = None
+        if isinstance(value, Expr):
+            expr = self._vectorized(value)
+        if expr is not None:
+            try:
+                values = column_values(expr, self.colnames,
+                                       self.list.columns, len(self))
+            except NotVectorizable:
+                pass
+            else:
+                # Mapped columns are read-only, the rest are copied.
+                columns = [c if getattr(c, 'readonly', False) else c[:]
+                           for c in self.list.columns]
+                columns.insert(index, to_column(values))
+                return self._derive((), colnames, columns)
+
+        if callable(value) or isinstance(value, Expr):
+            expr = counted(expr_decorator(value, self.colnames), _counter)
             data_kernel = (tuple_insert(row, index, expr(row)) for row in self)
         else:
             data_kernel = (tuple_insert(row, index, value) for row in self)
-
-        if index == -1:
-            index = len(self.colnames)
-
-        self.colnames = tuple_insert(self.colnames, index, name)
-        return data_kernel
+        return self._derive(data_kernel, colnames)
+
+    def lazy(self):
+        u"""Return a 'QueryPlan' that record operations over this object."""
+        return QueryPlan(self)
+
+    def parallel(self, workers=None, chunksize=None):
+        u"""Return a 'ParallelExecutor' that run operations in processes."""
+        return ParallelExecutor(self, workers, chunksize)
+
+    def group_by(self, *fields):
+        u"""Return a 'GroupBy' object for aggregate the rows by 'fields'."""
+        return GroupBy(self, self.colnames, fields)
+
+    def _join_probe(self, on):
+        u"""Return a function that get the rows with a key of 'on' values.
+
+        Use an existing index over the 'on' columns, or build a hash table.
+        """
+        for columns in self.indexes:
+            if set(columns) == set(on):
+                idx = self._get_index(columns)
+                order = operator.itemgetter(*[on.index(c) for c in columns])
+                if len(columns) == 1:
+                    return lambda key: self._rows_at(idx.lookup(key[0]))
+                return lambda key: self._rows_at(idx.lookup(order(key)))
+
+        table = {}
+        key = fields_getter(fields2index(on, self.colnames))
+        for row in self.list:
+            k = key(row)
+            bucket = table.get(k)
+            if bucket is None:
+                table[k] = [row]
+            else:
+                bucket.append(row)
+        return lambda key: table.get(key, ())
+
+    def join(self, other, on, how='inner', suffix='_right'):
+        u"""Hash join with other 'DataTable'.
+
+        The hash table is built over the smaller object (or taken from an
+        index over the 'on' columns) and the other object is streamed, so it
+        runs in linear time.
+
+        Args:
+            other: 'DataTable' to join with.
+            on: column name (or tuple of names) present in both objects.
+            how: 'inner', 'left' (keep rows of this object without match) or
+                'outer' (keep rows without match of both objects).
+            suffix: added to the columns of 'other' with a name already used.
+
+        Returns:
+            New 'DataTable' with the columns of this object followed by the
+            columns of 'other' not in 'on'. Missing values are 'None'.
+        """
+        if isinstance(on, basestring):
+            on = (on,)
+        on = tuple(on)
+        if how not in ('inner', 'left', 'outer'):
+            raise DataTableError("Unknown join type '%s'" % how)
+        if not on:
+            raise DataTableColumnError("Join without columns")
+        check_fields(on, self.colnames)
+        check_fields(on, other.colnames)
+
+        left_key = fields_getter(fields2index(on, self.colnames))
+        right_key = fields_getter(fields2index(on, other.colnames))
+        rest = [i for i, c in enumerate(other.colnames) if c not in on]
+        right_rest = fields_getter(rest) if rest else (lambda row: ())
+        colnames = self.colnames + tuple(
+            c + suffix if c in self.colnames else c
+            for c in other.colnames if c not in on)
+
+        # Row for 'outer' joins: only the key columns of this object.
+        positions = fields2index(on, self.colnames)
+        width = len(self.colnames)
+
+        def left_from_key(key):
+            out = [None] * width
+            for pos, value in zip(positions, key):
+                out[pos] = value
+            return tuple(out)
+
+        right_nulls = (None,) * len(rest)
+
+        def stream_left(probe):
+            matched = set()
+            for row in self:
+                k = left_key(row)
+                found = probe(k)
+                if found:
+                    if how == 'outer':
+                        matched.add(k)
+                    for r in found:
+                        yield row + right_rest(r)
+                elif how != 'inner':
+                    yield row + right_nulls
+            if how == 'outer':
+                for r in other:
+                    k = right_key(r)
+                    if k not in matched:
+                        yield left_from_key(k) + right_rest(r)
+
+        def stream_right(probe):
+            matched = set()
+            for r in other:
+                k = right_key(r)
+                found = probe(k)
+                if found:
+                    matched.add(k)
+                    for row in found:
+                        yield row + right_rest(r)
+                elif how == 'outer':
+                    yield left_from_key(k) + right_rest(r)
+            if how != 'inner':
+                for row in self:
+                    if left_key(row) not in matched:
+                        yield row + right_nulls
+
+        def indexed(table):
+            return any(set(c) == set(on) for c in table.indexes)
+
+        if indexed(other) or (not indexed(self) and len(other) <= len(self)):
+            rows = stream_left(other._join_probe(on))
+        else:
+            rows = stream_right(self._join_probe(on))
+        return self._derive(rows, colnames)
 
     def clear(self, init=0, offset=0):
         u"""Clear object."""
@@ -360,5 +1396,454 @@ class DataTable(collections.MutableSequence):
     @property
     def shape(self):
         rows = self.count
+        if self.storage == 'columnar':
+            return (self.list.width, rows)
         cols = max(len(x) for x in self)
         return (cols, rows)
+
+    def memory_usage(self, deep=True, sample=None):
+        u"""Return the memory used by the object, in bytes.
+
+        Args:
+            deep: include the size of the values referenced by the columns
+                (typed arrays store the values, mapped files are not in
+                memory).
+            sample: number of rows used for estimate the size of the values
+                and of the rows (None for use all the rows). Objects found
+                more than once in the sample are counted once, the rest
+                are scaled to the number of rows.
+
+        Returns:
+            dict with 'columns' (name -> bytes of the column containers and
+            values), 'rows' (the row containers: list and tuples of the
+            'rows' storage), 'indexes' (columns -> bytes, estimated from
+            'sample' entries or '_indexes.SAMPLE'; keys shared with the
+            columns are not counted) and 'total'.
+        """
+        count = len(self)
+        step = 1
+        if sample and count > sample:
+            step = count // sample
+        positions = xrange(0, count, step)
+        scale = float(count) / len(positions) if count else 0
+        seen = {}
+
+        def values_size(values, scale=scale):
+            found = {}
+            for value in values:
+                key = id(value)
+                if key in seen:
+                    continue
+                if key in found:
+                    found[key][1] += 1
+                    continue
+                if type(value) in LEAF_TYPES:
+                    size = getsizeof(value)
+                else:
+                    size = total_size(value, readable_output=False)
+                found[key] = [size, 1]
+            seen.update(found)
+            return int(sum(size if n > 1 else size * scale
+                           for size, n in found.itervalues()))
+
+        columns = collections.OrderedDict()
+        if self.storage == 'columnar':
+            store = self.list
+            rows = (getsizeof(store) + getsizeof(store.columns) +
+                    getsizeof(store.types))
+            for name, column in izip(self.colnames, store.columns):
+                size = getsizeof(column)
+                if isinstance(column, DictColumn):
+                    size += (getsizeof(column.codes) +
+                             getsizeof(column.values) +
+                             getsizeof(column.lookup))
+                    if deep:
+                        size += values_size(column.values, 1)
+                elif deep and isinstance(column, list):
+                    size += values_size(column[p] for p in positions)
+                columns[name] = size
+        else:
+            sampled = self.list
+            if step > 1:
+                sampled = [self.list[p] for p in positions]
+            rows = getsizeof(self.list) + int(
+                sum(imap(getsizeof, sampled)) * scale)
+            for idx, name in enumerate(self.colnames):
+                size = 0
+                if deep:
+                    size = values_size(
+                        row[idx] for row in sampled if len(row) > idx)
+                columns[name] = size
+
+        indexes = dict((key, idx.nbytes(sample) if sample else idx.nbytes())
+                       for key, idx in self.indexes.iteritems())
+        total = rows + sum(columns.values()) + sum(indexes.values())
+        return {'columns': columns, 'rows': rows, 'indexes': indexes,
+                'total': total}
+
+
+class QueryPlan(object):
+    u"""Lazy chain of 'DataTable' operations.
+
+    Operations are recorded as a logical plan and executed in one streaming
+    pass when the plan is iterated, counted, indexed or collected. Adjacent
+    filters are fused in one predicate, filters that access the columns by
+    name are pushed below projections and adjacent projections are composed
+    in one getter.
+    """
+
+    def __init__(self, source, colnames=None, steps=()):
+        self.source = source
+        """Object with the input rows (usually a 'DataTable')."""
+        self.colnames = source.colnames if colnames is None else colnames
+        """Column names of the rows produced by the plan."""
+        self.steps = steps
+        """Logical steps: tuples of (operation, argument, input colnames)."""
+
+    def __iter__(self):
+        return self._execute()
+
+    def __getitem__(self, item):
+        if isinstance(item, int):
+            if item < 0:
+                rows = deque(self, maxlen=-item)
+                if len(rows) < -item:
+                    raise IndexError("QueryPlan index out of range")
+                return rows[0]
+            for row in islice(self, item, None):
+                return row
+            raise IndexError("QueryPlan index out of range")
+        elif isinstance(item, basestring):
+            if item not in self.colnames:
+                raise DataTableColumnError("Column '%s' not found" % item)
+            idx = self.colnames.index(item)
+            return (item,) + tuple(row[idx] for row in self)
+
+    def __repr__(self):
+        return "QueryPlan(%s)" % ' -> '.join(self.explain())
+
+    def _step(self, operation, argument, colnames=None):
+        steps = self.steps + ((operation, argument, self.colnames),)
+        return self.__class__(self.source, colnames or self.colnames, steps)
+
+    def filter(self, expr):
+        u"""Filter rows."""
+        return self._step('filter', expr)
+
+    def select(self, *fields, **kwargs):
+        u"""Select fields."""
+        if not fields:
+            return self
+        check_fields(fields, self.colnames)
+        plan = self
+        where = kwargs.pop('where', None)
+        if where is not None:
+            plan = plan.filter(where)
+        return plan._step('select', tuple(fields2index(fields, plan.colnames)),
+                          fields)
+
+    def distinct(self, *fields):
+        u"""Distinct rows."""
+        return self.select(*fields)._step('distinct', None)
+
+    def dup(self, *fields):
+        u"""Duplicate rows."""
+        return self.select(*fields)._step('dup', None)
+
+    def add_field(self, name, value='', index=-1):
+        u"""Add a constant or calculated field."""
+        if index == -1:
+            index = len(self.colnames)
+        return self._step('add_field', (value, index),
+                          tuple_insert(self.colnames, index, name))
+
+    def optimize(self):
+        u"""Return the physical steps of the plan."""
+        ops = []
+        for operation, argument, colnames in self.steps:
+            if operation == 'filter':
+                # Push filter below projections when the predicate access
+                # columns by name, so it gives the same result on the wider
+                # row (callables may use positions).
+                pos = len(ops)
+                while (pos and ops[pos - 1][0] == 'select' and
+                       _by_name(argument)):
+                    pos -= 1
+                    colnames = ops[pos][2]
+                if pos and ops[pos - 1][0] == 'filter':
+                    ops[pos - 1][1].append(argument)
+                else:
+                    ops.insert(pos, ('filter', [argument], colnames))
+            elif operation == 'select' and ops and ops[-1][0] == 'select':
+                # Compose adjacent projections.
+                previous = ops[-1]
+                indexes = tuple(previous[1][i] for i in argument)
+                ops[-1] = ('select', indexes, previous[2])
+            else:
+                ops.append((operation, argument, colnames))
+        return ops
+
+    def explain(self):
+        u"""Describe the physical steps of the plan."""
+        out = []
+        for operation, argument, colnames in self.optimize():
+            if operation == 'filter':
+                out.append('filter(%i)' % len(argument))
+            elif operation == 'select':
+                out.append('select(%s)' % ', '.join(colnames[i]
+                                                    for i in argument))
+            else:
+                out.append(operation)
+        return out
+
+    def _execute(self):
+        rows = iter(self.source)
+        for operation, argument, colnames in self.optimize():
+            if operation == 'filter':
+                preds = [expr_decorator(pred, colnames) for pred in argument]
+                rows = ifilter(f_and(*preds) if len(preds) > 1 else preds[0],
+                               rows)
+            elif operation == 'select':
+                rows = imap(fields_getter(argument), rows)
+            elif operation == 'distinct':
+                rows = f_distinct(rows)
+            elif operation == 'dup':
+                rows = f_dup(rows)
+            elif operation == 'add_field':
+                value, index = argument
+                rows = _add_field_rows(rows, index, value, colnames)
+        return rows
+
+    def collect(self):
+        u"""Execute the plan and return a new 'DataTable'."""
+        return self.source._derive(self, self.colnames)
+
+    def group_by(self, *fields):
+        u"""Aggregate the rows streamed by the plan."""
+        return GroupBy(self, self.colnames, fields)
+
+    @property
+    def count(self):
+        return sum(1 for _ in self)
+
+
+class GroupBy(object):
+    u"""Rows of a 'DataTable' (or of a 'QueryPlan') grouped by fields.
+
+    Aggregation is done in a single pass over the rows with a hash table of
+    the groups, so rows are streamed and memory is proportional to the
+    number of groups.
+    """
+
+    def __init__(self, source, colnames, fields):
+        check_fields(fields, colnames)
+        self.source = source
+        """Iterable with the rows to aggregate."""
+        self.colnames = colnames
+        """Column names of the source rows."""
+        self.fields = fields
+        """Names of the group columns."""
+
+    def __repr__(self):
+        return "GroupBy(%s)" % ', '.join(self.fields)
+
+    def agg(self, *aggregations, **named):
+        u"""Aggregate groups and return a new 'DataTable'.
+
+        Aggregations are given as '(name, spec)' pairs or as keyword
+        arguments 'name=spec' (sorted by name, after the pairs). 'spec' is an
+        'Accumulator' (like 'Sum("age")'), a tuple ('sum', 'age') or the
+        name of a function without column ('count').
+
+        The new object has the group fields and one column per aggregation.
+        """
+        aggregations = list(aggregations) + sorted(named.items())
+        if not aggregations:
+            raise DataTableError("No aggregations")
+        names = tuple(name for name, _ in aggregations)
+        try:
+            accumulators = [accumulator(spec) for _, spec in aggregations]
+        except ValueError as exc:
+            raise DataTableError(exc.args[0])
+
+        getters = []
+        for name, acc in izip(names, accumulators):
+            if acc.column is None:
+                if isinstance(acc, (Sum, Min, Max, Mean, First)):
+                    raise DataTableError("Aggregation '%s' needs a column"
+                                         % name)
+                getters.append(lambda row: row)
+            else:
+                check_fields((acc.column,), self.colnames)
+                getters.append(
+                    operator.itemgetter(self.colnames.index(acc.column)))
+        rows = self.source
+        if self.fields:
+            key = fields_getter(fields2index(self.fields, self.colnames))
+            dictionaries = self._dictionaries()
+            if dictionaries:
+                # Group by the codes, appended to the rows.
+                width = len(self.colnames)
+                rows = izip(*(self.source.list.columns +
+                              [d.codes for d in dictionaries]))
+                key = fields_getter(range(width, width + len(dictionaries)))
+        else:
+            def key(row):
+                return ()
+
+        rows = aggregate(rows, key, accumulators, getters)
+        if self.fields and dictionaries:
+            size = len(dictionaries)
+            rows = (tuple(d.values[code]
+                          for d, code in izip(dictionaries, row[:size])) +
+                    row[size:] for row in rows)
+        return self._table()._derive(rows, self.fields + names)
+
+    def _dictionaries(self):
+        u"""Return the 'DictColumn' of the fields if all are encoded."""
+        if not isinstance(self.source, DataTable):
+            return []
+        dictionaries = self.source._dictionaries()
+        if not all(f in dictionaries for f in self.fields):
+            return []
+        return [dictionaries[f] for f in self.fields]
+
+    def _table(self):
+        if isinstance(self.source, QueryPlan):
+            return self.source.source
+        return self.source
+
+
+class ParallelExecutor(object):
+    u"""Run 'filter', 'select', 'distinct' and 'dup' in a process pool.
+
+    Rows are split in chunks that are processed by the pool and the results
+    are merged in order, so the result is the same than the sequential
+    methods. Expressions must be picklable: column expressions, string
+    expressions or functions defined at module level.
+
+    Use it as context manager for reuse the pool in several operations::
+
+        with dt.parallel(workers=8) as executor:
+            males = executor.filter(col('gender') == 'Male')
+            names = executor.distinct('first_name')
+    """
+
+    def __init__(self, table, workers=None, chunksize=None):
+        self.table = table
+        """Source 'DataTable'."""
+        self.workers = workers or cpu_count()
+        """Number of processes."""
+        self.chunksize = chunksize
+        """Rows per task (by default, four tasks per process)."""
+        self.pool = None
+        """Pool of processes (only inside a 'with' block)."""
+
+    def __enter__(self):
+        self.pool = Pool(self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+
+    def __repr__(self):
+        return "ParallelExecutor(workers=%i)" % self.workers
+
+    def _chunks(self):
+        size = self.chunksize or max(1, -(-len(self.table) //
+                                          (self.workers * 4)))
+        rows = iter(self.table)
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _map(self, function, tasks):
+        if self.pool is not None:
+            return self.pool.imap(function, tasks)
+        pool = Pool(self.workers)
+        try:
+            return pool.map(function, tasks)
+        finally:
+            pool.terminate()
+
+    def _check_picklable(self, expr):
+        try:
+            pickle.dumps(expr, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            raise DataTableError("Expression '%r' can not be sent to other "
+                                 "processes (use column expressions, string "
+                                 "expressions or module functions)" % expr)
+
+    def _indexes(self, fields):
+        if not fields:
+            return None
+        check_fields(fields, self.table.colnames)
+        return tuple(fields2index(fields, self.table.colnames))
+
+    def filter(self, expr):
+        u"""Parallel version of 'DataTable.filter'."""
+        return self.select(*self.table.colnames, where=expr)
+
+    def select(self, *fields, **kwargs):
+        u"""Parallel version of 'DataTable.select'."""
+        table = self.table
+        if not table.is_initialized or not fields:
+            return table
+        indexes = self._indexes(fields)
+        expr = kwargs.pop('where', None)
+        if expr is not None:
+            self._check_picklable(expr)
+        if fields == table.colnames:
+            indexes = None
+        tasks = ((chunk, table.colnames, expr, indexes)
+                 for chunk in self._chunks())
+        results = self._map(_parallel_select, tasks)
+        return table._derive(chain.from_iterable(results), fields)
+
+    def distinct(self, *fields):
+        u"""Parallel version of 'DataTable.distinct'.
+
+        Every chunk is reduced to its distinct rows in the pool and the
+        partial results are merged keeping the first occurrences.
+        """
+        table = self.table
+        if not table.is_initialized:
+            return table
+        indexes = self._indexes(fields)
+        tasks = ((chunk, indexes) for chunk in self._chunks())
+        results = self._map(_parallel_distinct, tasks)
+        rows = f_distinct(chain.from_iterable(results))
+        return table._derive(rows, fields or None)
+
+    def dup(self, *fields):
+        u"""Parallel version of 'DataTable.dup'."""
+        table = self.table
+        if not table.is_initialized:
+            return table
+        indexes = self._indexes(fields)
+
+        def tasks():
+            offset = 0
+            for chunk in self._chunks():
+                yield chunk, indexes, offset
+                offset += len(chunk)
+
+        def merge(results):
+            seen = set()
+            for firsts, dups in results:
+                out = list(dups)
+                for pos, row in firsts:
+                    if row in seen:
+                        out.append((pos, row))
+                    else:
+                        seen.add(row)
+                out.sort(key=operator.itemgetter(0))
+                for _, row in out:
+                    yield row
+
+        rows = merge(self._map(_parallel_dup, tasks()))
+        return table._derive(rows, fields or None)
@@ -1,12 +1,200 @@
 # -*- coding: utf-8 -*-
+import threading
+import time
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+
+class Slot(object):
+    """Function connected to a 'Signal' with a priority."""
+    def __init__(self, function, priority=0):
+        self.function = function
+        self.priority = priority
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def __eq__(self, other):
+        if isinstance(other, Slot):
+            return self.function == other.function
+        return self.function == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.function)
+
+    def flush(self):
+        """Deliver pending events."""
+        flush = getattr(self.function, 'flush', None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        """Deliver pending events and release resources."""
+        close = getattr(self.function, 'close', None)
+        if close is not None:
+            close()
+
+
+class BatchSlot(Slot):
+    """Coalesce events: the function receives a list of argument tuples.
+
+    The keyword arguments of an event are added to its tuple as a dict.
+    Batches are delivered in the thread that emits the events: when 'size'
+    events are pending, when an event arrives 'interval' seconds after the
+    first pending one and by 'flush'. There is no timer, the last events
+    wait for the next event or 'flush' (connect with 'thread' to deliver
+    them in a background thread).
+    """
+    def __init__(self, function, priority=0, size=None, interval=None):
+        Slot.__init__(self, function, priority)
+        self.size = size
+        self.interval = interval
+        self.pending = []
+        self.since = None
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        if kwargs:
+            args += (kwargs,)
+        with self.lock:
+            if not self.pending:
+                self.since = time.time()
+            self.pending.append(args)
+            if not ((self.size is not None and
+                     len(self.pending) >= self.size) or
+                    (self.interval is not None and
+                     time.time() - self.since >= self.interval)):
+                return
+            pending, self.pending = self.pending, []
+        # The function is called out of the lock, it may emit events.
+        self.function(pending)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if pending:
+            self.function(pending)
+        Slot.flush(self)
+
+    def close(self):
+        self.flush()
+        Slot.close(self)
+
+
+class ThreadSlot(Slot):
+    """Call the function in a background thread.
+
+    Events wait in a queue of 'maxsize' events (0 for no limit); when the
+    queue is full the emitter waits (backpressure). Errors of the function
+    are raised on the next event, 'flush' or 'close'.
+    """
+    _stop = object()
+
+    def __init__(self, function, priority=0, maxsize=0):
+        Slot.__init__(self, function, priority)
+        self.queue = Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._stop:
+                    return
+                args, kwargs = item
+                self.function(*args, **kwargs)
+            except Exception as exc:
+                self.error = exc
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def __call__(self, *args, **kwargs):
+        self._check()
+        self.queue.put((args, kwargs))
+
+    def flush(self):
+        """Wait until all the queued events are delivered."""
+        self.queue.join()
+        Slot.flush(self)
+        self._check()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(self._stop)
+            self.thread.join()
+        Slot.close(self)
+        self._check()
 
 
 class Signal(list):
     """Implement the classical 'signal/slot' pattern."""
     def __call__(self, *args, **kwargs):
         """"""
+        if not self:
+            # Fast path, no subscribers.
+            return
         for f in self:
             f(*args, **kwargs)
 
     def __repr__(self):
         return "Signal(%s)" % list.__repr__(self)
+
+    def connect(self, function, priority=0, batch=None, interval=None,
+                thread=False, maxsize=0):
+        """Connect a function and return its slot.
+
+        Args:
+            function: function called with the arguments of the signal.
+            priority: slots with higher priority are called first (slots
+                added with 'append' have priority 0).
+            batch, interval: coalesce events, the function receives a list
+                of argument tuples (see 'BatchSlot').
+            thread: call the function in a background thread, with a queue
+                of 'maxsize' events (see 'ThreadSlot').
+        """
+        slot = function
+        if thread:
+            slot = ThreadSlot(slot, priority, maxsize)
+        if batch is not None or interval is not None:
+            slot = BatchSlot(slot, priority, batch, interval)
+        if not isinstance(slot, Slot):
+            slot = Slot(slot, priority)
+        index = len(self)
+        for i, other in enumerate(self):
+            if getattr(other, 'priority', 0) < priority:
+                index = i
+                break
+        self.insert(index, slot)
+        return slot
+
+    def disconnect(self, function):
+        """Remove the slot of a function (and release it)."""
+        slot = self.pop(self.index(function))
+        if isinstance(slot, Slot):
+            slot.close()
+
+    def flush(self):
+        """Deliver the pending events of batched and threaded slots."""
+        for slot in self:
+            if isinstance(slot, Slot):
+                slot.flush()
+
+    def close(self):
+        """Deliver pending events and stop the background threads."""
+        for slot in self:
+            if isinstance(slot, Slot):
+                slot.close()
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+u"""Benchmarks of the 'DataTable' and 'DataRow' hot paths.
+
+Every benchmark runs over synthetic datasets of configurable size, width and
+cardinality, in a child process, and reports the best time of several runs,
+the throughput (rows per second) and the peak memory allocated by the
+operation (growth of 'ru_maxrss'). Results are written as JSON and can be
+compared with a previous output to flag regressions.
+
+Run from the parent directory of the 'datatable' package::
+
+    python -m datatable.test.benchmarks --rows 1000 100000 -o current.json
+    python -m datatable.test.benchmarks --baseline current.json
+
+The exit status is 1 when some result is slower (or uses more memory) than
+the baseline by more than the tolerance.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+
+from collections import OrderedDict
+from itertools import izip
+from timeit import default_timer
+
+from ..datarows import datarow_factory
+from ..datatables import DataTable, col
+
+# Default sizes of the datasets.
+ROWS = (1000, 100000)
+WIDTH = 6
+CARDINALITY = 100
+STORAGES = ('rows', 'columnar')
+REPEAT = 3
+# Max. slowdown (or memory growth) before flag a regression.
+TOLERANCE = 0.2
+# Memory peaks below this size (KiB) are not compared, they are noise.
+MIN_PEAK_KB = 1024
+
+# Fields that identify a result.
+KEY_FIELDS = ('name', 'rows', 'width', 'cardinality', 'storage')
+
+
+class Dataset(object):
+    u"""Synthetic rows: an unique 'id' column and columns of int, float and
+    str values with 'cardinality' distinct values."""
+
+    def __init__(self, rows, width=WIDTH, cardinality=CARDINALITY, seed=0):
+        self.size = rows
+        self.width = width
+        self.cardinality = cardinality
+        self.colnames = ('id',) + tuple('f%i' % i for i in range(1, width))
+        rnd = random.Random(seed)
+        makers = [lambda: rnd.randrange(cardinality),
+                  lambda: rnd.randrange(cardinality) / 4.0,
+                  lambda: 'v%i' % rnd.randrange(cardinality)]
+        makers = [makers[i % len(makers)] for i in range(width - 1)]
+        self.rows = [(i,) + tuple(make() for make in makers)
+                     for i in xrange(rows)]
+
+    def table(self, storage):
+        return DataTable(*self.rows, colnames=self.colnames, storage=storage)
+
+    def column(self, typ):
+        u"""Return the name of the first column of the values of 'typ'."""
+        row = self.rows[0] if self.rows else ()
+        for name, value in izip(self.colnames[1:], row[1:]):
+            if type(value) is typ:
+                return name
+        return 'id'
+
+
+###############################################################################
+# Benchmarks
+###############################################################################
+
+BENCHMARKS = OrderedDict()
+"""Name -> (setup function, uses the storage)."""
+
+
+def benchmark(name, storage=True):
+    u"""Register a benchmark.
+
+    The decorated function receives the 'Dataset' and the storage, prepares
+    the data (not measured) and returns the function to measure.
+    """
+    def decorator(function):
+        BENCHMARKS[name] = (function, storage)
+        return function
+    return decorator
+
+
+@benchmark('datatable.construct')
+def bench_construct(data, storage):
+    return lambda: data.table(storage)
+
+
+@benchmark('datatable.append')
+def bench_append(data, storage):
+    def run():
+        dt = DataTable(colnames=data.colnames, storage=storage)
+        for row in data.rows:
+            dt.append(row)
+    return run
+
+
+@benchmark('datatable.extend')
+def bench_extend(data, storage):
+    def run():
+        dt = DataTable(colnames=data.colnames, storage=storage)
+        dt.extend(data.rows)
+    return run
+
+
+@benchmark('datatable.filter')
+def bench_filter(data, storage):
+    dt = data.table(storage)
+    name = data.column(int)
+    half = data.cardinality // 2
+    return lambda: dt.filter(lambda row: getattr(row, name) < half)
+
+
+@benchmark('datatable.filter_expr')
+def bench_filter_expr(data, storage):
+    dt = data.table(storage)
+    expr = col(data.column(int)) < data.cardinality // 2
+    return lambda: dt.filter(expr)
+
+
+@benchmark('datatable.select')
+def bench_select(data, storage):
+    dt = data.table(storage)
+    fields = data.colnames[:2]
+    return lambda: dt.select(*fields)
+
+
+@benchmark('datatable.select_where')
+def bench_select_where(data, storage):
+    dt = data.table(storage)
+    fields = data.colnames[:2]
+    where = col(data.column(int)) < data.cardinality // 2
+    return lambda: dt.select(*fields, where=where)
+
+
+@benchmark('datatable.distinct')
+def bench_distinct(data, storage):
+    dt = data.table(storage)
+    name = data.column(str)
+    return lambda: dt.distinct(name)
+
+
+@benchmark('datatable.dup')
+def bench_dup(data, storage):
+    dt = data.table(storage)
+    name = data.column(str)
+    return lambda: dt.dup(name)
+
+
+@benchmark('datatable.add_field')
+def bench_add_field(data, storage):
+    dt = data.table(storage)
+    return lambda: dt.add_field('extra', lambda row: row.id * 2)
+
+
+@benchmark('datatable.getitem')
+def bench_getitem(data, storage):
+    dt = data.table(storage)
+    names = data.colnames
+
+    def run():
+        for name in names:
+            dt[name]
+    return run
+
+
+@benchmark('datarow.construct', storage=False)
+def bench_datarow_construct(data, storage):
+    row_class = datarow_factory(*data.colnames)
+    rows = data.rows
+    return lambda: [row_class(*row) for row in rows]
+
+
+@benchmark('datarow.update', storage=False)
+def bench_datarow_update(data, storage):
+    row_class = datarow_factory(*data.colnames)
+    records = [row_class() for _ in data.rows]
+    pairs = zip(records, data.rows)
+
+    def run():
+        for record, row in pairs:
+            record.update(*row)
+    return run
+
+
+@benchmark('datarow.json', storage=False)
+def bench_datarow_json(data, storage):
+    row_class = datarow_factory(*data.colnames)
+    records = [row_class(*row) for row in data.rows]
+    return lambda: [record.json() for record in records]
+
+
+@benchmark('datarow.from_json', storage=False)
+def bench_datarow_from_json(data, storage):
+    row_class = datarow_factory(*data.colnames)
+    texts = [row_class(*row).json() for row in data.rows]
+    return lambda: [row_class.from_json(text) for text in texts]
+
+
+###############################################################################
+# Runner
+###############################################################################
+
+
+def maxrss_kb():
+    u"""Return the peak resident memory of the process in KiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # Bytes in macOS.
+        rss //= 1024
+    return rss
+
+
+def measure(name, data, storage, repeat=REPEAT):
+    u"""Run a benchmark in the current process and return its result."""
+    function = BENCHMARKS[name][0](data, storage)
+    before = maxrss_kb()
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        function()
+        times.append(default_timer() - start)
+    best = min(times)
+    return OrderedDict([
+        ('name', name),
+        ('rows', data.size),
+        ('width', data.width),
+        ('cardinality', data.cardinality),
+        ('storage', storage),
+        ('seconds', best),
+        ('mean', sum(times) / len(times)),
+        ('rows_per_sec', data.size / best if best else None),
+        ('peak_kb', maxrss_kb() - before),
+    ])
+
+
+def _child(conn, name, data, storage, repeat):
+    try:
+        conn.send(measure(name, data, storage, repeat))
+    except Exception as exc:
+        conn.send(exc)
+    finally:
+        conn.close()
+
+
+def measure_isolated(name, data, storage, repeat=REPEAT):
+    u"""Run a benchmark in a child process, so the memory peaks of every
+    benchmark are independent."""
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_child,
+                                      args=(child, name, data, storage,
+                                            repeat))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = RuntimeError("Benchmark '%s' died (exit code %s)"
+                              % (name, process.exitcode))
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def run(names=None, rows=ROWS, width=WIDTH, cardinality=CARDINALITY,
+        storages=STORAGES, repeat=REPEAT, isolate=True, report=None):
+    u"""Run benchmarks over datasets of every size.
+
+    Args:
+        names: benchmarks to run (all by default), see 'BENCHMARKS'.
+        rows: sizes of the datasets.
+        width, cardinality: shape of the datasets (see 'Dataset').
+        storages: 'DataTable' storages measured.
+        repeat: runs of every benchmark, the best time is reported.
+        isolate: run every benchmark in a child process.
+        report: function called with every result.
+
+    Returns:
+        Document with the environment ('meta') and the 'results'.
+    """
+    names = list(names or BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError("Unknown benchmark '%s'" % name)
+    measurer = measure_isolated if isolate else measure
+    results = []
+    for size in rows:
+        data = Dataset(size, width, cardinality)
+        for name in names:
+            for storage in (storages if BENCHMARKS[name][1] else (None,)):
+                result = measurer(name, data, storage, repeat)
+                results.append(result)
+                if report is not None:
+                    report(result)
+    return OrderedDict([
+        ('meta', OrderedDict([
+            ('python', platform.python_version()),
+            ('implementation', platform.python_implementation()),
+            ('platform', platform.platform()),
+            ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ])),
+        ('results', results),
+    ])
+
+
+def result_key(result):
+    return tuple(result[field] for field in KEY_FIELDS)
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_peak_kb=MIN_PEAK_KB):
+    u"""Return the regressions of 'results' against 'baseline'.
+
+    Both arguments are documents returned by 'run'. A result regresses when
+    its time, or its memory peak (when over 'min_peak_kb'), exceeds the
+    baseline by more than 'tolerance' (a fraction). Results without
+    baseline are ignored.
+    """
+    base = dict((result_key(r), r) for r in baseline['results'])
+    regressions = []
+    for result in results['results']:
+        old = base.get(result_key(result))
+        if old is None:
+            continue
+        for metric, floor in (('seconds', 0), ('peak_kb', min_peak_kb)):
+            if old[metric] is None or result[metric] is None:
+                continue
+            limit = max(old[metric], floor) * (1 + tolerance)
+            if result[metric] > limit:
+                regression = OrderedDict(
+                    (field, result[field]) for field in KEY_FIELDS)
+                regression['metric'] = metric
+                regression['baseline'] = old[metric]
+                regression['current'] = result[metric]
+                regressions.append(regression)
+    return regressions
+
+
+def _format(result):
+    return ("%-24s %9i %-8s %10.4fs %12.0f rows/s %8i KiB"
+            % (result['name'], result['rows'], result['storage'] or '-',
+               result['seconds'], result['rows_per_sec'] or 0,
+               result['peak_kb']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*', metavar='benchmark',
+                        help="benchmarks to run (default all): %s"
+                        % ', '.join(BENCHMARKS))
+    parser.add_argument('--rows', nargs='+', type=int, default=ROWS)
+    parser.add_argument('--width', type=int, default=WIDTH)
+    parser.add_argument('--cardinality', type=int, default=CARDINALITY)
+    parser.add_argument('--storage', nargs='+', default=STORAGES,
+                        choices=STORAGES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--no-isolate', dest='isolate', action='store_false',
+                        help="run in this process (memory peaks overlap)")
+    parser.add_argument('-o', '--output', help="write the results as JSON")
+    parser.add_argument('--baseline', help="JSON results to compare with")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    def report(result):
+        print(_format(result))
+        sys.stdout.flush()
+
+    results = run(args.names, args.rows, args.width, args.cardinality,
+                  args.storage, args.repeat, args.isolate, report)
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            json.dump(results, fileobj, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fileobj:
+            baseline = json.load(fileobj)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION %(name)s rows=%(rows)s storage=%(storage)s "
+                  "%(metric)s: %(baseline)s -> %(current)s" % regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import copy
+
+from .benchmarks import BENCHMARKS, compare, run
+
+
+def test_run_benchmarks():
+    results = run(rows=(50,), width=4, cardinality=5, repeat=1)
+    names = set(r['name'] for r in results['results'])
+    assert names == set(BENCHMARKS)
+    for result in results['results']:
+        assert result['seconds'] >= 0
+        assert result['peak_kb'] >= 0
+    assert not compare(results, results)
+
+
+def test_compare_regressions():
+    results = run(['datatable.extend'], rows=(50,), storages=('rows',),
+                  repeat=1, isolate=False)
+    baseline = copy.deepcopy(results)
+    baseline['results'][0]['seconds'] = results['results'][0]['seconds'] / 2
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert [(r['name'], r['metric']) for r in regressions] == \
+        [('datatable.extend', 'seconds')]
+    assert not compare(results, baseline, tolerance=2)
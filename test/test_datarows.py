@@ -5,7 +5,7 @@ import pytest
 
 from operator import itemgetter, attrgetter
 
-from ..datarows import datarow_factory
+from ..datarows import DataRowArray, datarow_factory, dumps_many, loads_many
 
 
 # Clases for testing
@@ -201,6 +201,87 @@ def test_attrget():
     assert not hasattr(new_dr, 'hello_a')
 
 
+def test_update_mixed_arguments():
+    dr = DataRow('one', test_a='ignored', test_c='three')
+    assert dr.values() == ('one', None, 'three')
+    dr.update('uno')
+    assert dr.values() == ('uno', None, 'three')
+    dr.update(1, 2, 3)
+    assert dr.values() == (1, 2, 3)
+    with pytest.raises(ValueError):
+        dr.update(1, 2, test_c=3, test_d=4)
+
+
+def test_unset_attributes():
+    dr = DataRow('one', 'two', 'three')
+    del dr.test_b
+    assert tuple(dr) == (('test_a', 'one'), ('test_c', 'three'))
+    assert dr.values() == ('one', 'three')
+    assert dr != DataRow('one', 'two', 'three')
+
+
+def test_keyword_fields():
+    Row = datarow_factory('if', 'value', default_value=0)
+    row = Row(**{'if': 1})
+    assert row.values() == (1, 0)
+    assert row == Row(1, 0)
+
+
+def test_class_cache(monkeypatch):
+    from .. import datarows
+    assert datarow_factory('test_a', 'test_b', 'test_c') is DataRow
+    assert datarow_factory(u'test_a', u'test_b', u'test_c') is UDataRow
+    assert datarow_factory('test_a', 'test_b', 'test_c',
+                           default_value=0) is not DataRow
+    assert datarow_factory('test_a', default_value=[]) is not \
+        datarow_factory('test_a', default_value=[])
+    dr = DataRow('hello_a', 'hello_b')
+    assert dr.attrget('test_b').__class__ is dr.attrget('test_b').__class__
+    monkeypatch.setattr(datarows, 'CLASS_CACHE_SIZE', 2)
+    first = datarow_factory('one')
+    datarow_factory('two')
+    datarow_factory('three')
+    assert len(datarows._class_cache) == 2
+    assert datarow_factory('one') is not first
+
+
+def test_datarow_array():
+    Row = datarow_factory('id', 'name', 'score')
+    rows = DataRowArray(Row, [Row(1, 'one', 1.5), {'id': 2, 'name': 'two'},
+                              (3, 'three', 3.5)], encoded=('name',))
+    assert rows.column('id').typecode == 'l'
+    rows.append(DataRow('x', 'y', 'z').attrget('id'))
+    assert len(rows) == 4
+    assert rows.column('name').values == ['one', 'two', 'three', None]
+    view = rows[0]
+    assert view.name == 'one'
+    assert view.get('bad', 0) == 0
+    assert view.keys() == ('id', 'name', 'score')
+    assert view.values() == (1, 'one', 1.5)
+    assert view.todict() == Row(1, 'one', 1.5).todict()
+    assert view.json() == Row(1, 'one', 1.5).json()
+    assert view == Row(1, 'one', 1.5)
+    assert view[1:] == ['one', 1.5]
+    assert repr(rows[-1]) == "DataRow(id=None, name=None, score=None)"
+    view.score = 'high'
+    assert rows[0].materialize() == Row(1, 'one', 'high')
+    with pytest.raises(IndexError):
+        rows[4]
+
+
+def test_datarow_array_cursor():
+    Row = datarow_factory('a', 'b')
+    rows = DataRowArray(Row, ((i, i * 2) for i in range(5)))
+    cursor = rows.cursor()
+    first = next(cursor)
+    assert [view.b for view in cursor] == [2, 4, 6, 8]
+    assert first.a == 4
+    assert [view.values() for view in rows] == [(i, i * 2) for i in range(5)]
+    del rows[0]
+    rows[0] = Row(10, 20)
+    assert list(rows[0]) == [('a', 10), ('b', 20)]
+
+
 def test_json():
     dr = DataRow(test_a='hello_a', test_b='hello_b')
     assert dr.json() == json.dumps({'test_a': 'hello_a',
@@ -231,6 +312,31 @@ def test_pickle(tmpdir):
     dr2 = pickle.loads(pic_dr1)
     assert dr1 == dr2
 
+
+def test_pickle_state():
+    dr = DataRow('hello_a', 'hello_b')
+    assert dr.__getstate__() == ('hello_a', 'hello_b', None)
+    del dr.test_c
+    dr2 = pickle.loads(pickle.dumps(dr, 2))
+    assert not hasattr(dr2, 'test_c')
+    assert dr2.test_b == 'hello_b'
+
+
+def test_dumps_many():
+    rows = [DataRow(1, 'one', u'caño'), DataRow(None, '', None),
+            DataRow(2 ** 70, None, {'nested': True})]
+    data = dumps_many(rows)
+    assert loads_many(DataRow, data) == rows
+    many = [DataRow(i, 'name %i' % i, i * 0.5) for i in range(100)]
+    assert len(dumps_many(many)) < len(pickle.dumps(many, 2))
+    assert loads_many(DataRow, dumps_many([])) == []
+    array = DataRowArray(DataRow, rows[:2])
+    assert loads_many(DataRow, dumps_many(array)) == rows[:2]
+    with pytest.raises(ValueError):
+        loads_many(UDataRow().attrget('test_a').__class__, data)
+    with pytest.raises(ValueError):
+        loads_many(DataRow, 'bad data')
+
 # if __name__ == '__main__':
 
 #     import sys
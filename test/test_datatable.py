@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
+import array
+import os
+import pickle
 import pytest
 import types
 
 from . import test_csv
 from .._utils import SDict
-from ..datatables import DataTable
+from .._signals import Signal
+from ..datatables import DataTable, col
+from ..datatables import (Accumulator, Count, First, Max, Mean, Min,
+                          Retention, Sum)
 from ..datatables import (DataTableError, DataTableColumnError,
-                          DataTableCapacityError)
+                          DataTableCapacityError, DataTableTypeError)
 
 
+football_csv = os.path.join(os.path.dirname(__file__),
+                            'Spanish_league_2015_2016.csv')
+
 matrix_1 = [(0, 1, 2, 3, 4),
             (5, 6, 7, 7, 8),
             (9, 10, 11, 12, 13),
@@ -162,6 +171,41 @@ def test_extend():
     assert len(dt) == 10
 
 
+def test_extend_batch_events(monkeypatch):
+    from .. import datatables
+    monkeypatch.setattr(datatables, 'BATCH_SIZE', 4)
+    dt = DataTable(colnames=('C0',))
+    batches = []
+    dt.events.onExtend.append(lambda rows: batches.append(len(rows)))
+    dt.events.onAppendRow.append(lambda row: batches.append(row))
+    rows = [(x,) for x in range(10)]
+    dt.append_many(iter(rows))
+    assert batches == [4, 4, 2]
+    assert dt[3] is rows[3]
+    dt.create_index('C0')
+    dt.extend([[10], [11]])
+    assert dt.lookup(C0=11) == [(11,)]
+    # Subscribers without arguments are still called for every row.
+    calls = []
+    dt.events.onAppend.append(lambda: calls.append(len(dt)))
+    dt.events.onInsert.append(lambda: calls.append('insert'))
+    dt.extend(rows[:5])
+    dt.append((12,))
+    dt.insert(0, (13,))
+    assert calls == [12] * 4 + [16] + [17, 'insert']
+
+
+def test_extend_capacity():
+    dt = DataTable(capacity=5)
+    dt.extend(matrix_1[:3])
+    with pytest.raises(DataTableCapacityError):
+        dt.extend(matrix_1[:3])
+    # Batches are stored completely or not at all.
+    assert dt.count == 3
+    dt.extend(matrix_1[:2])
+    assert dt.count == 5
+
+
 def test_delete_item():
     dt = DataTable(['hello'])
     assert dt.count == 1
@@ -247,11 +291,11 @@ def test_filter_lambda(raw_container):
     assert isinstance(r, DataTable)
 
 
-# def test_filter_expr(raw_container):
-#     dt = raw_container
-#     r = dt.filter("row.first_name.startswith('P')")
-#     assert r.count == 3
-#     assert isinstance(r, DataTable)
+def test_filter_expr(raw_container):
+    dt = raw_container
+    r = dt.filter("row.first_name.startswith('P')")
+    assert r.count == 3
+    assert isinstance(r, DataTable)
 
 
 def test_filter_chained(raw_container):
@@ -384,3 +428,1305 @@ def test_add_field_callable_chain(raw_container):
           .select('id', 'Initial')
     assert isinstance(dtn, DataTable)
     assert dtn[0] == ('1', 'D')
+
+
+###############################################################################
+# Test section: Columnar storage
+###############################################################################
+
+
+@pytest.fixture
+def columnar_container():
+    tcsv = test_csv[:]
+    dt = DataTable(*tcsv, firstrow_header=True, storage='columnar')
+    return dt
+
+
+def test_columnar_unknown_storage():
+    with pytest.raises(DataTableError):
+        DataTable(storage='unknown')
+
+
+def test_columnar_same_rows(raw_container, columnar_container):
+    assert list(columnar_container) == list(raw_container)
+    assert columnar_container.colnames == raw_container.colnames
+    assert columnar_container.shape == raw_container.shape
+    assert repr(columnar_container) == repr(raw_container)
+
+
+def test_columnar_typed_columns():
+    dt = DataTable(*matrix_1, storage='columnar')
+    assert dt.list.column(0).typecode == 'l'
+    assert dt['C1'] == ('C1', 1, 6, 10, 15, 20)
+    assert dt.shape == (5, 5)
+
+
+def test_columnar_type_promotion():
+    dt = DataTable((1, 2.5), storage='columnar')
+    dt.append(('one', 3.5))
+    dt[0] = (1, None)
+    assert list(dt) == [(1, None), ('one', 3.5)]
+
+
+def test_columnar_bad_width():
+    dt = DataTable((1, 2), storage='columnar')
+    with pytest.raises(ValueError):
+        dt.append((1, 2, 3))
+
+
+def test_columnar_extend():
+    dt = DataTable(*matrix_1, storage='columnar')
+    dt.extend([(1, 2, 3, 4, 5), (1.5, None, 'a', True, 5)])
+    assert [type(c) for c in dt.list.columns[:4]] == [list] * 4
+    assert dt.list.column(4).typecode == 'l'
+    assert list(dt)[-2:] == [(1, 2, 3, 4, 5), (1.5, None, 'a', True, 5)]
+    with pytest.raises(ValueError):
+        dt.extend([(1, 2, 3, 4, 5), (1, 2)])
+
+
+def test_columnar_mutations():
+    dt = DataTable(*matrix_1, storage='columnar')
+    dt.insert(0, (-1, -1, -1, -1, -1))
+    assert dt[0] == (-1, -1, -1, -1, -1)
+    del dt[0]
+    assert dt.pop() == matrix_1[-1]
+    assert dt.count == 4
+    assert dt[-1] == matrix_1[-2]
+
+
+def test_columnar_fluent(columnar_container):
+    dt = columnar_container
+    r = dt.filter(lambda row: row.first_name.startswith('P'))
+    assert r.count == 3
+    assert r.storage == 'columnar'
+    assert dt.select('ip_address', where=lambda row: not row.ip_address) \
+             .count == 2
+    assert (dt + dt).distinct().count == 25
+    assert dt.distinct('first_name').count == 23
+
+
+###############################################################################
+# Test section: Lazy query plans
+###############################################################################
+
+
+def test_lazy_is_not_executed(raw_container):
+    def fail(row):
+        raise AssertionError("Plan executed")
+
+    plan = raw_container.lazy().filter(fail).select('id')
+    assert plan.colnames == ('id',)
+
+
+def test_lazy_same_result(raw_container):
+    dt = raw_container
+
+    def cond_expr(row):
+        return row.gender == 'Male' and row.first_name.endswith('s')
+
+    eager = (dt
+             .select('id', 'first_name', 'gender', 'ip_address',
+                     where=cond_expr)
+             .select('id', 'ip_address'))
+    plan = (dt.lazy()
+            .select('id', 'first_name', 'gender', 'ip_address',
+                    where=cond_expr)
+            .select('id', 'ip_address'))
+    assert list(plan) == list(eager) == [('5', '7.106.49.156')]
+    assert plan.count == 1
+    calls = []
+    counted = dt.lazy().filter(lambda row: calls.append(row) or True)
+    # Executed once ('list' does not count the rows first).
+    assert len(list(counted)) == 25 and len(calls) == 25
+    assert plan[0] == ('5', '7.106.49.156')
+    assert plan['ip_address'] == ('ip_address', '7.106.49.156')
+
+
+def test_lazy_fusion(raw_container):
+    plan = (raw_container.lazy()
+            .filter(lambda row: row.gender == 'Male')
+            .select('id', 'first_name', 'gender')
+            .filter(lambda row: row.first_name.startswith('J'))
+            .select('first_name'))
+    assert plan.explain() == ['filter(1)', 'select(id, first_name, gender)',
+                              'filter(1)', 'select(first_name)']
+    assert list(plan) == [('James',), ('Joshua',), ('Jimmy',), ('Jimmy',),
+                          ('Jose',), ('Jimmy',)]
+    plan = (raw_container.lazy()
+            .filter("row.gender == 'Male'")
+            .select('id', 'first_name', 'gender')
+            .filter(col('first_name').startswith('J'))
+            .select('first_name'))
+    assert plan.explain() == ['filter(2)', 'select(first_name)']
+    assert len(list(plan)) == 6
+
+
+def test_lazy_positional_filter():
+    dt = DataTable(*[('a', 'b', 'c', 'd'), (1, 2, 3, 2), (4, 5, 6, 7)],
+                   firstrow_header=True)
+    # Positions are relative to the selected row, not pushed down.
+    plan = dt.lazy().select('d', 'a').filter(lambda r: r[0] == 2)
+    assert list(plan) == list(dt.select('d', 'a').filter(
+        lambda r: r[0] == 2)) == [(2, 1)]
+    plan = dt.lazy().select('d', 'a').filter('row[0] == 2')
+    assert list(plan) == [(2, 1)]
+
+
+def test_lazy_chained_add_field():
+    dt = DataTable(*[('a', 'b', 'c', 'd'), (1, 2, 3, 2), (4, 5, 6, 7)],
+                   firstrow_header=True)
+    plan = dt.lazy().add_field('x', 'X').add_field('y', 'Y', 0)
+    assert list(plan)[0] == ('Y', 1, 2, 3, 2, 'X')
+    assert list(plan) == list(dt.add_field('x', 'X').add_field('y', 'Y', 0))
+    plan = (dt.lazy()
+            .add_field('x', lambda row: row.a * 10)
+            .add_field('y', lambda row: row.x + 1))
+    assert list(plan) == [(1, 2, 3, 2, 10, 11), (4, 5, 6, 7, 40, 41)]
+    plan = dt.lazy().add_field('x', 'X').filter('row.d == 2').select('x', 'a')
+    assert list(plan) == list(dt.add_field('x', 'X').filter('row.d == 2')
+                              .select('x', 'a')) == [('X', 1)]
+
+
+def test_lazy_distinct_dup(raw_container):
+    assert raw_container.lazy().distinct('first_name').count == 23
+    assert raw_container.lazy().dup('first_name').count == 2
+    dt = raw_container + raw_container
+    assert dt.lazy().distinct().count == 25
+    assert dt.lazy().dup().count == 25
+
+
+def test_lazy_add_field_collect(raw_container):
+    dtn = (raw_container.lazy()
+           .add_field('test_calculated_field',
+                      lambda row: row.id + ':' + row.ip_address)
+           .add_field('Initial', lambda row: row.first_name[0])
+           .select('id', 'Initial')
+           .collect())
+    assert isinstance(dtn, DataTable)
+    assert dtn.colnames == ('id', 'Initial')
+    assert dtn[0] == ('1', 'D')
+    assert dtn[-1] == ('25', 'K')
+
+
+def test_lazy_index(raw_container):
+    plan = raw_container.lazy().select('id')
+    assert plan[-1] == ('25',)
+    with pytest.raises(IndexError):
+        plan[25]
+    with pytest.raises(DataTableColumnError):
+        plan.select('not_found')
+
+
+###############################################################################
+# Test section: Compiled expressions
+###############################################################################
+
+
+def test_filter_column_expr(raw_container):
+    dt = raw_container
+    r = dt.filter(col('first_name').startswith('P') &
+                  (col('gender') == 'Male'))
+    assert list(r['first_name']) == ['first_name', 'Patrick', 'Peter']
+
+
+def test_filter_expr_fallback(raw_container):
+    dt = raw_container
+    # 'len' has no column expression, it is rewritten to positional access.
+    r = dt.filter("len(row.first_name) == 3 and row['gender'] == 'Male'")
+    assert set(r['first_name'][1:]) == set(['Roy'])
+
+
+def test_filter_expr_bad_column(raw_container):
+    with pytest.raises(DataTableColumnError):
+        raw_container.filter(col('not_found') == 1)
+    with pytest.raises(DataTableColumnError):
+        raw_container.filter("row.not_found == 1")
+
+
+def test_column_expr_truth_value():
+    with pytest.raises(TypeError):
+        col('a') == 1 and col('b') == 2
+
+
+def test_callable_row_access(raw_container):
+    def fnc(row):
+        return row['first_name'] == row.first_name and row[0] == row.id
+
+    assert raw_container.filter(fnc).count == 25
+
+
+def test_add_field_column_expr():
+    dt = DataTable(*matrix_1, colnames=('a', 'b', 'c', 'd', 'e'))
+    dtn = dt.add_field('total', col('a') * col('b') + 1)
+    assert dtn['total'] == ('total', 1, 31, 91, 211, 381)
+    assert dt.filter("row.a in (0, 9)").count == 2
+    assert dt.filter(col('a').between(5, 14)).count == 3
+    assert dt.filter(~col('a').isin([0, 5])).count == 3
+
+
+###############################################################################
+# Test section: Hash indexes
+###############################################################################
+
+
+def test_index_lookup(raw_container):
+    dt = raw_container
+    dt.create_index('email')
+    assert dt.lookup(email='pbrooks9@biglobe.ne.jp') == [dt[9]]
+    assert dt.lookup(email='not_found') == []
+    with pytest.raises(DataTableError):
+        dt.lookup(gender='Male')
+
+
+def test_index_composite(raw_container):
+    dt = raw_container
+    dt.create_index('first_name', 'gender')
+    rows = dt.lookup(gender='Male', first_name='Jimmy')
+    assert [row[0] for row in rows] == ['16', '20', '24']
+
+
+def test_index_bad_columns(raw_container):
+    with pytest.raises(DataTableColumnError):
+        raw_container.create_index('not_found')
+    with pytest.raises(DataTableError):
+        raw_container.create_index('id', kind='unknown')
+    with pytest.raises(DataTableError):
+        raw_container.drop_index('id')
+
+
+def test_index_maintenance(raw_container):
+    dt = raw_container
+    dt.create_index('first_name')
+    dt.append(('26', 'Jimmy', 'Last', 'mail', 'Male', ''))
+    assert [row[0] for row in dt.lookup(first_name='Jimmy')] == \
+        ['16', '20', '24', '26']
+    dt[-1] = ('26', 'Diane', 'Last', 'mail', 'Female', '')
+    assert [row[0] for row in dt.lookup(first_name='Diane')] == ['1', '26']
+    del dt[-1]
+    assert [row[0] for row in dt.lookup(first_name='Diane')] == ['1']
+    dt.insert(0, ('0', 'Diane', 'Last', 'mail', 'Female', ''))
+    assert [row[0] for row in dt.lookup(first_name='Diane')] == ['0', '1']
+    del dt[0]
+    assert [row[0] for row in dt.lookup(first_name='Diane')] == ['1']
+    assert dt.lookup(first_name='Jimmy')[0] == dt[15]
+
+
+def test_index_filter(raw_container):
+    dt = raw_container
+    dt.create_index('gender')
+    assert len(dt._index_scan(col('gender') == 'Male')) == 14
+    expected = list(dt.filter(lambda row: row.gender == 'Male' and
+                              row.first_name.startswith('J')))
+    r = dt.filter((col('gender') == 'Male') &
+                  col('first_name').startswith('J'))
+    assert list(r) == expected
+    r = dt.filter("row.gender == 'Male' and row.first_name.startswith('J')")
+    assert list(r) == expected
+    r = dt.select('id', where=col('gender') == 'Unknown')
+    assert r.count == 0
+    assert dt.filter(col('gender') == 'Female').indexes == {}
+
+
+###############################################################################
+# Test section: Sorted indexes
+###############################################################################
+
+
+@pytest.fixture
+def numeric_container(raw_container):
+    return raw_container.add_field('num', lambda row: int(row.id))
+
+
+def test_sorted_index_range(numeric_container):
+    dt = numeric_container
+    dt.create_index('num', kind='sorted')
+
+    def ids(rows):
+        return [row[-1] for row in rows]
+
+    assert ids(dt.lookup_range('num', 3, 6)) == [3, 4, 5, 6]
+    assert ids(dt.lookup_range('num', 3, 6, False, False)) == [4, 5]
+    assert ids(dt.lookup_range('num', high=2)) == [1, 2]
+    assert ids(dt.lookup_range('num', 24)) == [24, 25]
+    assert ids(dt.lookup(num=7)) == [7]
+    with pytest.raises(DataTableError):
+        dt.lookup_range('id', 1, 2)
+
+
+def test_sorted_index_prefix(raw_container):
+    dt = raw_container
+    dt.create_index('first_name', kind='sorted')
+    rows = dt.lookup_prefix('first_name', 'J')
+    assert [row[1] for row in rows] == ['James', 'Joshua', 'Judith', 'Jimmy',
+                                        'Jimmy', 'Jose', 'Jacqueline',
+                                        'Jimmy']
+
+
+def test_sorted_index_maintenance(numeric_container):
+    dt = numeric_container
+    dt.create_index('num', kind='sorted')
+    dt.append(dt[0][:-1] + (0,))
+    assert dt.lookup_range('num', high=0) == [dt[-1]]
+    dt[-1] = dt[0][:-1] + (100,)
+    assert dt.lookup_range('num', high=1) == [dt[0]]
+    assert dt.lookup_range('num', 50) == [dt[-1]]
+    del dt[0]
+    assert dt.lookup_range('num', high=2) == [dt[0]]
+
+
+def test_sorted_index_filter(numeric_container):
+    dt = numeric_container
+    dt.create_index('num', kind='sorted')
+    dt.create_index('first_name', kind='sorted')
+    assert len(dt._index_scan(col('num') >= 20)) == 6
+    assert len(dt._index_scan(col('first_name').startswith('Ji'))) == 3
+    assert len(dt._index_scan((col('num') > 2) & (col('num') < 10))) == 7
+    assert len(dt._index_scan("5 < row.num <= 8")) == 3
+    r = dt.filter(col('num').between(10, 12) & (col('gender') == 'Male'))
+    assert list(r['num']) == ['num', 10, 12]
+    assert dt.filter("row.num >= 20").count == 6
+
+
+###############################################################################
+# Test section: Group by
+###############################################################################
+
+
+def test_group_by_count(raw_container):
+    r = raw_container.group_by('gender').agg(n='count')
+    assert isinstance(r, DataTable)
+    assert r.colnames == ('gender', 'n')
+    assert list(r) == [('Female', 11), ('Male', 14)]
+
+
+def test_group_by_aggregations(numeric_container):
+    dt = numeric_container
+    r = dt.group_by('gender').agg(('total', Sum('num')),
+                                  ('low', Min('num')),
+                                  ('high', ('max', 'num')),
+                                  ('avg', Mean('num')),
+                                  ('n', Count()))
+    assert r.colnames == ('gender', 'total', 'low', 'high', 'avg', 'n')
+    female = r[0]
+    assert female[:4] == ('Female', 142, 1, 25)
+    assert female[4] == pytest.approx(142 / 11.)
+    assert female[5] == 11
+
+
+def test_group_by_many_fields(raw_container):
+    r = raw_container.group_by('first_name', 'gender').agg(n='count')
+    assert r.count == 23
+    assert ('Jimmy', 'Male', 3) in list(r)
+
+
+def test_group_by_whole_table(numeric_container):
+    r = numeric_container.group_by().agg(total=('sum', 'num'))
+    assert list(r) == [(325,)]
+
+
+def test_group_by_custom_accumulator(raw_container):
+    class Concat(Accumulator):
+        def start(self):
+            return []
+
+        def add(self, state, value):
+            state.append(value)
+            return state
+
+        def result(self, state):
+            return ','.join(state)
+
+    r = (raw_container
+         .filter(lambda row: row.first_name == 'Jimmy')
+         .group_by('first_name')
+         .agg(ids=Concat('id')))
+    assert list(r) == [('Jimmy', '16,20,24')]
+
+
+def test_group_by_lazy(raw_container):
+    r = (raw_container.lazy()
+         .filter(col('gender') == 'Male')
+         .group_by('gender')
+         .agg(n='count'))
+    assert list(r) == [('Male', 14)]
+
+
+def test_group_by_errors(raw_container):
+    with pytest.raises(DataTableColumnError):
+        raw_container.group_by('not_found')
+    with pytest.raises(DataTableColumnError):
+        raw_container.group_by('gender').agg(total=Sum('not_found'))
+    with pytest.raises(DataTableError):
+        raw_container.group_by('gender').agg(total='unknown')
+    with pytest.raises(DataTableError):
+        raw_container.group_by('gender').agg()
+    # Only 'count' aggregates without column.
+    with pytest.raises(DataTableError):
+        raw_container.group_by('gender').agg(total='sum')
+    with pytest.raises(DataTableError):
+        raw_container.group_by('gender').agg(first=First())
+
+
+###############################################################################
+# Test section: Join
+###############################################################################
+
+
+@pytest.fixture
+def events_container():
+    return DataTable(('1', 'login'), ('2', 'login'), ('1', 'logout'),
+                     ('99', 'login'), colnames=('id', 'event'))
+
+
+def test_join_inner(raw_container, events_container):
+    users = raw_container.select('id', 'first_name')
+    r = users.join(events_container, on='id')
+    assert isinstance(r, DataTable)
+    assert r.colnames == ('id', 'first_name', 'event')
+    assert sorted(r) == [('1', 'Diane', 'login'), ('1', 'Diane', 'logout'),
+                         ('2', 'Keith', 'login')]
+    # Build side over the bigger object gives the same rows.
+    assert sorted(events_container.join(users, on=('id',))) == \
+        [('1', 'login', 'Diane'), ('1', 'logout', 'Diane'),
+         ('2', 'login', 'Keith')]
+
+
+def test_join_left(raw_container, events_container):
+    users = raw_container.select('id', 'first_name')
+    r = users.join(events_container, on='id', how='left')
+    assert r.count == 26
+    assert ('3', 'Margaret', None) in list(r)
+    r = events_container.join(users, on='id', how='left')
+    assert r.count == 4
+    assert ('99', 'login', None) in list(r)
+
+
+def test_join_outer(raw_container, events_container):
+    users = raw_container.select('id', 'first_name')
+    r = users.join(events_container, on='id', how='outer')
+    assert r.count == 27
+    assert ('99', None, 'login') in list(r)
+    assert ('3', 'Margaret', None) in list(r)
+
+
+def test_join_index_and_suffix(raw_container, events_container):
+    users = raw_container.select('id', 'first_name')
+    events_container.create_index('id')
+    other = events_container.add_field('first_name', 'x')
+    other.create_index('id')
+    r = users.join(other, on='id')
+    assert r.colnames == ('id', 'first_name', 'event', 'first_name_right')
+    assert sorted(r)[0] == ('1', 'Diane', 'login', 'x')
+
+
+def test_join_errors(raw_container, events_container):
+    with pytest.raises(DataTableColumnError):
+        raw_container.join(events_container, on='event')
+    with pytest.raises(DataTableError):
+        raw_container.join(events_container, on='id', how='cross')
+
+
+###############################################################################
+# Test section: CSV loader
+###############################################################################
+
+
+@pytest.fixture
+def csv_file(tmpdir):
+    path = tmpdir.join('users.csv')
+    path.write('\n'.join(','.join(row) for row in test_csv))
+    return str(path)
+
+
+def test_from_csv(csv_file, raw_container):
+    dt = DataTable.from_csv(csv_file, chunksize=7)
+    assert dt.colnames == raw_container.colnames
+    assert dt.count == 25
+    # 'id' is inferred as 'int', empty strings of 'str' columns are kept.
+    assert dt[0] == (1,) + raw_container[0][1:]
+    assert dt[12][-1] == ''
+
+
+def test_from_csv_usecols_dtypes(csv_file):
+    dt = DataTable.from_csv(csv_file, usecols=('gender', 'id'),
+                            dtypes={'id': float}, storage='columnar',
+                            name='users')
+    assert dt.colnames == ('gender', 'id')
+    assert dt.name == 'users'
+    assert dt[0] == ('Female', 1.0)
+    assert dt.list.column(1).typecode == 'd'
+
+
+def test_from_csv_inference():
+    dt = DataTable.from_csv(football_csv, sample=10)
+    assert dt.count == 179
+    row = dt[0]
+    assert row[dt.colnames.index('Date')] == '21/08/15'
+    assert row[dt.colnames.index('FTHG')] == 0
+    assert row[dt.colnames.index('B365H')] == 3.4
+
+
+def test_from_csv_fallback_types(tmpdir):
+    path = tmpdir.join('mixed.csv')
+    path.write('a,b\n1,x\n2,y\n,z\n4.5,w\nfive,v\n')
+    dt = DataTable.from_csv(str(path), sample=2)
+    assert dt['a'] == ('a', 1, 2, None, 4.5, 'five')
+    with pytest.raises(DataTableTypeError):
+        DataTable.from_csv(str(path), dtypes={'a': int})
+
+
+def test_from_csv_errors(csv_file, tmpdir):
+    with pytest.raises(DataTableColumnError):
+        DataTable.from_csv(csv_file, usecols=('not_found',))
+    path = tmpdir.join('bad.csv')
+    path.write('a,b\n1,2\n3\n')
+    with pytest.raises(DataTableError):
+        DataTable.from_csv(str(path))
+
+
+###############################################################################
+# Test section: Binary format
+###############################################################################
+
+
+def test_binary_roundtrip(tmpdir):
+    path = str(tmpdir.join('table.dtb'))
+    rows = [(1, 1.5, True, 'one', u'caño'),
+            (2, None, False, None, u''),
+            (None, -2.5, None, '', None)]
+    dt = DataTable(*rows, colnames=('i', 'f', 'b', 's', 'u'), name='binary')
+    dt.to_binary(path)
+    dtn = DataTable.from_binary(path)
+    assert dtn.name == 'binary'
+    assert dtn.colnames == ('i', 'f', 'b', 's', 'u')
+    assert dtn.storage == 'columnar'
+    assert list(dtn) == rows
+    assert dtn['u'] == ('u', u'caño', u'', None)
+    assert dtn[-1] == rows[-1]
+    assert list(DataTable.from_binary(path, storage='rows')) == rows
+
+
+def test_binary_capacity(tmpdir):
+    path = str(tmpdir.join('table.dtb'))
+    DataTable(*matrix_1).to_binary(path)
+    assert DataTable.from_binary(path, capacity=5).count == 5
+    with pytest.raises(DataTableCapacityError):
+        DataTable.from_binary(path, capacity=4)
+    with pytest.raises(DataTableCapacityError):
+        DataTable.from_binary(path, capacity=4, storage='rows')
+    dt = DataTable.from_binary(path, capacity=2, storage='rows',
+                               overflow='evict_oldest')
+    assert list(dt) == matrix_1[-2:]
+
+
+def test_binary_mapped_copy_on_write(tmpdir, csv_file):
+    path = str(tmpdir.join('users.dtb'))
+    DataTable.from_csv(csv_file).to_binary(path)
+    dt = DataTable.from_binary(path)
+    assert dt.count == 25
+    assert dt.list.column(0).readonly
+    dt.append((26,) + dt[0][1:])
+    dt[0] = (0,) + dt[0][1:]
+    assert dt['id'][1:] == tuple([0] + range(2, 27))
+    assert dt.filter(col('gender') == 'Male').count == 14
+    # The file is not modified.
+    assert DataTable.from_binary(path)[0][0] == 1
+
+
+def test_binary_errors(tmpdir):
+    path = str(tmpdir.join('bad.dtb'))
+    with pytest.raises(DataTableTypeError):
+        DataTable((1, 'a'), ('b', 2)).to_binary(path)
+    tmpdir.join('other.dtb').write('not a table file')
+    with pytest.raises(DataTableError):
+        DataTable.from_binary(str(tmpdir.join('other.dtb')))
+    tmpdir.join('empty.dtb').write('')
+    with pytest.raises(DataTableError):
+        DataTable.from_binary(str(tmpdir.join('empty.dtb')))
+
+
+###############################################################################
+# Test section: Parallel execution
+###############################################################################
+
+
+def starts_with_j(row):
+    return row.first_name.startswith('J')
+
+
+def test_parallel_filter(raw_container):
+    dt = raw_container
+    expected = list(dt.filter(starts_with_j))
+    r = dt.parallel(workers=2, chunksize=4).filter(starts_with_j)
+    assert isinstance(r, DataTable)
+    assert list(r) == expected
+    r = dt.parallel(workers=2, chunksize=4).filter(col('gender') == 'Male')
+    assert r.count == 14
+
+
+def test_parallel_select(raw_container):
+    dt = raw_container
+    with dt.parallel(workers=2, chunksize=3) as executor:
+        r = executor.select('ip_address', 'id',
+                            where="row.gender == 'Female'")
+        assert r.colnames == ('ip_address', 'id')
+        assert list(r) == list(dt.select('ip_address', 'id',
+                                         where="row.gender == 'Female'"))
+        assert executor.select('id').count == 25
+
+
+def test_parallel_distinct_dup(raw_container):
+    dt = raw_container + raw_container
+    with dt.parallel(workers=3, chunksize=7) as executor:
+        assert list(executor.distinct()) == list(dt.distinct())
+        assert list(executor.dup()) == list(dt.dup())
+        assert list(executor.distinct('first_name')) == \
+            list(dt.distinct('first_name'))
+        assert list(executor.dup('gender')) == list(dt.dup('gender'))
+
+
+def test_parallel_not_picklable(raw_container):
+    with pytest.raises(DataTableError):
+        raw_container.parallel(workers=2).filter(lambda row: True)
+
+
+###############################################################################
+# Test section: Vectorized execution
+###############################################################################
+
+
+@pytest.fixture
+def numpy_module():
+    return pytest.importorskip('numpy')
+
+
+def test_vectorized_filter(numpy_module, raw_container, columnar_container):
+    dt = DataTable(*matrix_1, storage='columnar')
+    rows = DataTable(*matrix_1)
+    expr = (col('C1') > 5) & ~col('C3').isin([17]) | (col('C0') == 0)
+    assert dt._vector_rows(expr) is not None
+    r = dt.filter(expr)
+    assert list(r) == list(rows.filter(expr))
+    assert r.list.column(0).typecode == 'l'
+    source = 'row.C2 % 2 == 0 and row.C0 > 0'
+    assert list(dt.filter(source)) == list(rows.filter(source))
+    expr = (col('gender') == 'Female') & col('id').between('10', '20')
+    assert list(columnar_container.filter(expr)) == \
+        list(raw_container.filter(expr))
+
+
+def test_vectorized_select(numpy_module):
+    dt = DataTable(*matrix_1, storage='columnar')
+    r = dt.select('C4', 'C0', where=col('C2') / 2 >= 5)
+    assert r.colnames == ('C4', 'C0')
+    assert list(r) == [(13, 9), (18, 14), (23, 19)]
+    assert dt.select('C0', where=col('C0') > 100).count == 0
+
+
+def test_vectorized_add_field(numpy_module):
+    dt = DataTable(*matrix_1, storage='columnar')
+    r = dt.add_field('total', col('C0') * col('C1') + 0.5, index=1)
+    assert r.colnames[:3] == ('C0', 'total', 'C1')
+    assert dt.colnames == ('C0', 'C1', 'C2', 'C3', 'C4')
+    assert r['total'][1:] == (0.5, 30.5, 90.5, 210.5, 380.5)
+    assert r.list.column(1).typecode == 'd'
+    r.append((1, 1.0, 1, 1, 1, 1))
+    assert dt.count == 5
+    assert dt.add_field('big', col('C4') > 10)['big'][1:] == \
+        (False, False, True, True, True)
+
+
+def test_vectorized_fallback(numpy_module, monkeypatch):
+    from .. import datatables
+    dt = DataTable(*matrix_1, storage='columnar')
+    # Division by zero is not vectorized, python raise the error.
+    with pytest.raises(ZeroDivisionError):
+        dt.filter(col('C0') / col('C0') == 1)
+    assert dt._vector_rows(lambda row: row.C0 > 5) is None
+    assert dt._vector_rows(col('C0').startswith(1)) is None
+    # NumPy integers wrap around, python integers do not.
+    big = DataTable(*[('a', 'b'), (2 ** 62, 200), (1, 100)],
+                    firstrow_header=True, storage='columnar')
+    assert big.list.column(0).typecode == 'l'
+    assert big.filter(col('a') + col('a') > 0).count == 2
+    assert big.add_field('c', col('a') * 4)['c'][1:] == (2 ** 64, 4)
+    monkeypatch.setattr(datatables, 'numpy', None)
+    assert dt._vector_rows(col('C0') > 5) is None
+    assert list(dt.filter(col('C0') > 5)) == matrix_1[2:]
+
+
+###############################################################################
+# Test section: Dictionary encoding
+###############################################################################
+
+
+@pytest.fixture
+def encoded_container():
+    tcsv = test_csv[:]
+    return DataTable(*tcsv, firstrow_header=True, storage='columnar',
+                     encoded=('gender',))
+
+
+def test_encoded_columns(raw_container, encoded_container):
+    dt = encoded_container
+    gender = dt.list.column(dt.colnames.index('gender'))
+    assert gender.codes.typecode == 'B'
+    assert gender.values == ['Female', 'Male']
+    assert list(dt) == list(raw_container)
+    assert dt['gender'] == raw_container['gender']
+    dt.append(dt[0][:-2] + ('Other', '1.1.1.1'))
+    dt[0] = dt[0][:-2] + ('Male', '')
+    assert dt[-1][-2] == 'Other' and dt[0][-2] == 'Male'
+    assert gender.values == ['Female', 'Male', 'Other']
+    del dt[0]
+    assert dt.count == 25
+
+
+def test_encoded_auto():
+    rows = [('a%i' % i, 'x' if i % 2 else 'y', i) for i in range(300)]
+    dt = DataTable(*rows, storage='columnar', encoded='auto')
+    assert type(dt.list.column(0)) is list
+    assert dt.list.column(1).values == ['y', 'x']
+    assert dt.list.column(2).typecode == 'l'
+    assert list(dt) == rows
+    with pytest.raises(DataTableError):
+        DataTable(*rows, encoded='auto')
+    with pytest.raises(DataTableColumnError):
+        DataTable(colnames=('a',), storage='columnar', encoded=('b',))
+
+
+def test_encoded_operations(raw_container, encoded_container):
+    dt = encoded_container
+    for expr in (col('gender') == 'Female', col('gender') == 'None',
+                 (col('gender') == 'Male') & (col('id') > '2'),
+                 col('gender').isin(['Male']) | (col('id') == '1')):
+        assert list(dt.filter(expr)) == list(raw_container.filter(expr))
+    assert list(dt.distinct('gender')) == [('Female',), ('Male',)]
+    assert list(dt.distinct('gender')) == \
+        list(raw_container.distinct('gender'))
+    dt.encode('first_name')
+    assert list(dt.distinct('gender', 'first_name')) == \
+        list(raw_container.distinct('gender', 'first_name'))
+    r = dt.group_by('gender').agg(n=Count(), last=('last', 'id'))
+    assert list(r) == list(raw_container.group_by('gender')
+                           .agg(n=Count(), last=('last', 'id')))
+    assert r.colnames == ('gender', 'last', 'n')
+    from .._columnar import DictColumn
+    column = DictColumn('cabab')
+    column[0] = 'b'
+    # Order of first appearance, unused values are skipped.
+    assert column.distinct() == ['b', 'a']
+
+
+def test_encoded_from_csv(csv_file):
+    dt = DataTable.from_csv(csv_file, storage='columnar', encoded=('gender',))
+    assert isinstance(dt.list.column(dt.colnames.index('gender')).codes,
+                      type(dt.list.column(0)))
+    assert dt.filter(col('gender') == 'Male').count == 14
+
+
+###############################################################################
+# Test section: Signals
+###############################################################################
+
+
+def test_signal_priorities():
+    calls = []
+    signal = Signal()
+    signal.append(lambda x: calls.append(('append', x)))
+    signal.connect(lambda x: calls.append(('low', x)), priority=-1)
+
+    def high(x):
+        calls.append(('high', x))
+
+    signal.connect(high, priority=10)
+    signal(1)
+    assert calls == [('high', 1), ('append', 1), ('low', 1)]
+    signal.disconnect(high)
+    assert len(signal) == 2
+    assert Signal()() is None
+
+
+def test_signal_batch():
+    batches = []
+    signal = Signal()
+    signal.connect(batches.append, batch=3)
+    for x in range(7):
+        signal(x)
+    assert batches == [[(0,), (1,), (2,)], [(3,), (4,), (5,)]]
+    signal.flush()
+    assert batches[-1] == [(6,)]
+    signal.connect(batches.append, interval=0)
+    signal('now')
+    assert batches[-1] == [('now',)]
+
+
+def test_signal_batch_interval():
+    import threading
+    import time
+    batches = []
+    signal = Signal()
+
+    def deliver(batch):
+        batches.append((threading.current_thread(), batch))
+        # Called out of the lock of the slot.
+        signal('again')
+
+    signal.connect(deliver, interval=0.01)
+    signal('later', key=1)
+    time.sleep(0.02)
+    # No timer, the batch is delivered with the next event.
+    assert batches == []
+    signal('now')
+    assert batches == [(threading.current_thread(),
+                        [('later', {'key': 1}), ('now',)])]
+    signal.flush()
+    assert batches[-1][1] == [('again',)]
+
+
+def test_signal_thread():
+    calls = []
+    signal = Signal()
+    signal.connect(calls.append, thread=True, maxsize=2)
+    for x in range(10):
+        signal(x)
+    signal.flush()
+    assert calls == range(10)
+    signal.close()
+    signal = Signal()
+    signal.connect(lambda x, y=0: calls.append(x + y), thread=True)
+    signal(1, y=2)
+    signal.flush()
+    assert calls[-1] == 3
+    signal.connect(lambda x: 1 / x, thread=True)
+    signal(0)
+    with pytest.raises(ZeroDivisionError):
+        signal.flush()
+    signal.close()
+
+
+def test_signal_datatable_events():
+    dt = DataTable(colnames=('a',))
+    rows = []
+    dt.events.onAppendRow.connect(rows.append, batch=100, thread=True)
+    for x in range(10):
+        dt.append((x,))
+    assert rows == []
+    dt.events.onAppendRow.close()
+    assert rows == [[((x,),) for x in range(10)]]
+
+
+###############################################################################
+# Test section: Pickle
+###############################################################################
+
+
+def test_pickle_datatable(raw_container):
+    import pickle
+    raw_container.create_index('gender')
+    dt = pickle.loads(pickle.dumps(raw_container, 2))
+    assert list(dt) == list(raw_container)
+    assert dt.colnames == raw_container.colnames
+    assert dt.lookup(gender='Male') == raw_container.lookup(gender='Male')
+    columnar = DataTable(*matrix_1, storage='columnar', capacity=5,
+                         encoded=('C2',))
+    dt = pickle.loads(pickle.dumps(columnar))
+    assert list(dt) == matrix_1
+    assert dt.capacity == 5 and dt.list.column(0).typecode == 'l'
+    assert dt.list.column(2).values == [2, 7, 11, 16, 21]
+    ragged = DataTable((1, 2), (3,), colnames=('a', 'b'))
+    assert list(pickle.loads(pickle.dumps(ragged))) == [(1, 2), (3,)]
+    assert pickle.loads(pickle.dumps(DataTable())).count == 0
+
+
+###############################################################################
+# Test section: Memory usage
+###############################################################################
+
+
+def test_memory_usage(raw_container, columnar_container):
+    usage = raw_container.memory_usage()
+    assert list(usage['columns']) == list(raw_container.colnames)
+    assert usage['total'] == usage['rows'] + sum(usage['columns'].values())
+    assert all(size > 0 for size in usage['columns'].values())
+    shallow = raw_container.memory_usage(deep=False)
+    assert shallow['rows'] == usage['rows']
+    assert shallow['total'] == shallow['rows']
+    raw_container.create_index('id')
+    assert raw_container.memory_usage()['indexes'][('id',)] > 0
+    columnar_container.encode('gender')
+    usage = columnar_container.memory_usage()
+    assert usage['columns']['gender'] < usage['columns']['email']
+
+
+def test_memory_usage_sample():
+    dt = DataTable(*[(i, 'x' * (i % 10), 'ab') for i in range(10000)],
+                   colnames=('n', 's', 'shared'))
+    exact = dt.memory_usage()
+    estimate = dt.memory_usage(sample=100)
+    for key in ('rows', 'total'):
+        assert abs(estimate[key] - exact[key]) < exact[key] * 0.1
+    assert estimate['columns']['shared'] == exact['columns']['shared']
+    columnar = DataTable(*matrix_1, storage='columnar')
+    assert columnar.memory_usage()['columns']['C0'] == \
+        columnar.memory_usage(deep=False)['columns']['C0']
+
+
+def test_memory_usage_indexes():
+    from sys import getsizeof
+    dt = DataTable(*[(i, i % 7) for i in range(20000)], colnames=('a', 'b'))
+    hash_idx = dt.create_index('a')
+    sorted_idx = dt.create_index('a', 'b', kind='sorted')
+    # Keys of one column are the values of the rows.
+    exact = (getsizeof(hash_idx.map) +
+             sum(map(getsizeof, hash_idx.map.values())))
+    usage = dt.memory_usage(sample=100)['indexes']
+    assert abs(usage[('a',)] - exact) < exact * 0.1
+    exact = (getsizeof(sorted_idx.keys) + getsizeof(sorted_idx.positions) +
+             sum(map(getsizeof, sorted_idx.keys)))
+    assert abs(usage[('a', 'b')] - exact) < exact * 0.1
+
+
+###############################################################################
+# Test section: Profiling
+###############################################################################
+
+
+def test_operation_events(raw_container):
+    records = []
+    raw_container.events.onOperation.connect(records.append)
+    result = raw_container.filter(lambda row: row.gender == 'Male')
+    assert len(records) == 1
+    record = records[0]
+    assert record.operation == 'filter'
+    assert record.rows_in == 25
+    assert record.rows_out == len(result) == 14
+    assert record.predicate_calls == 25
+    assert record.seconds >= 0 and record.bytes > 0
+    # Derived objects share the events.
+    result.select('id')
+    assert [r.operation for r in records] == ['filter', 'select']
+    assert records[1].predicate_calls == 0
+    assert '_counter' not in vars(result)
+
+
+def test_operation_events_nested(raw_container):
+    dt = raw_container
+    records = []
+    dt.events.onOperation.connect(records.append)
+
+    def predicate(row):
+        if row.id == '1':
+            # Operation on the same object inside an operation.
+            dt.filter(lambda row: row.id == '2')
+        return True
+    dt.filter(predicate)
+    assert [r.predicate_calls for r in records] == [25, 25]
+    assert '_counter' not in vars(dt)
+
+
+def test_profile(raw_container):
+    with raw_container.profile() as prof:
+        raw_container.filter(col('gender') == 'Female').distinct('first_name')
+        raw_container.add_field('n', lambda row: row.id * 2)
+    raw_container.select('id')
+    assert not raw_container.events.onOperation
+    assert [r.operation for r in prof.records] == \
+        ['filter', 'distinct', 'add_field']
+    summary = prof.summary()
+    assert summary['add_field']['predicate_calls'] == 25
+    assert summary['filter']['count'] == 1
+    report = prof.report().splitlines()
+    assert len(report) == 4
+    assert 'gender' in report[1] + report[2] + report[3]
+
+
+###############################################################################
+# Test section: Ring buffer capacity
+###############################################################################
+
+
+def test_evict_oldest():
+    evicted = []
+    dt = DataTable(colnames=('C0', 'C1'), capacity=3, overflow='evict_oldest')
+    dt.events.onEvict.append(evicted.extend)
+    dt.create_index('C0')
+    dt.create_index('C1', kind='sorted')
+    for i in range(5):
+        dt.append((i, i % 2))
+    assert list(dt) == [(2, 0), (3, 1), (4, 0)]
+    assert dt[0] == (2, 0) and dt[-1] == (4, 0)
+    assert evicted == [(0, 0), (1, 1)]
+    assert dt.lookup(C0=3) == [(3, 1)]
+    assert dt.lookup(C0=0) == []
+    assert dt.lookup(C1=0) == [(2, 0), (4, 0)]
+    assert dt.lookup_range('C1', 1) == [(3, 1)]
+    assert dt.filter(col('C1') == 0).count == 2
+    assert dt.select('C0').shape == (1, 3)
+    dt.extend([(5, 1), (6, 0)])
+    assert list(dt) == [(4, 0), (5, 1), (6, 0)]
+    assert evicted[2:] == [(2, 0), (3, 1)]
+    assert dt.lookup(C1=1) == [(5, 1)]
+    dt[0] = (7, 1)
+    assert dt.lookup(C0=7) == [(7, 1)]
+    del dt[0]
+    assert dt.lookup(C0=5) == [(5, 1)]
+    assert len(dt) == 2
+
+
+def test_evict_newest():
+    evicted = []
+    dt = DataTable(colnames=('C0',), capacity=2, overflow='evict_newest')
+    dt.events.onEvict.append(evicted.extend)
+    dt.create_index('C0')
+    dt.extend([(0,), (1,), (2,), (3,)])
+    assert list(dt) == [(0,), (3,)]
+    assert evicted == [(1,), (2,)]
+    assert dt.lookup(C0=3) == [(3,)] and dt.lookup(C0=1) == []
+    dt.insert(0, (4,))
+    assert list(dt) == [(4,), (0,)]
+    assert dt.lookup(C0=0) == [(0,)]
+
+
+def test_overflow_errors():
+    with pytest.raises(DataTableError):
+        DataTable(capacity=2, overflow='wrong')
+    with pytest.raises(DataTableError):
+        DataTable(overflow='evict_oldest')
+    with pytest.raises(DataTableError):
+        DataTable(capacity=2, overflow='evict_oldest', storage='columnar')
+    dt = DataTable(*matrix_1, capacity=2, overflow='evict_oldest')
+    assert list(dt) == matrix_1[-2:]
+    copy = pickle.loads(pickle.dumps(dt))
+    assert copy.overflow == 'evict_oldest'
+    copy.append(matrix_1[0])
+    assert list(copy) == [matrix_1[-1], matrix_1[0]]
+
+
+def test_evict_derived():
+    dt = DataTable(colnames=('k', 'C1'), capacity=3, overflow='evict_oldest')
+    dt.extend((0, i) for i in range(5))
+    other = DataTable(*[(0, i) for i in range(4)], colnames=('k', 'C2'))
+    # Derived objects are not bounded by the capacity of the source.
+    joined = dt.join(other, on='k')
+    assert joined.count == 12
+    assert joined.capacity == 0 and joined.overflow == 'raise'
+    assert dt.join(dt, on='k').count == 9
+    assert dt.filter(col('k') == 0).count == 3
+
+
+###############################################################################
+# Test section: Retention
+###############################################################################
+
+
+class FakeClock(object):
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_retention_by_age():
+    clock = FakeClock(100)
+    expired = []
+    dt = DataTable(*[(t, 'x') for t in range(90, 101)], colnames=('ts', 'v'),
+                   retention=Retention(max_age=5, column='ts', clock=clock))
+    dt.events.onExpire.append(expired.append)
+    dt.create_index('ts')
+    assert [r[0] for r in dt] == [95, 96, 97, 98, 99, 100]
+    clock.now = 103
+    dt.append((103, 'y'))
+    assert dt[0] == (98, 'x') and len(dt) == 4
+    assert expired == [[(95, 'x'), (96, 'x'), (97, 'x')]]
+    assert dt.lookup(ts=99) == [(99, 'x')]
+    assert dt.lookup(ts=96) == []
+    clock.now = 200
+    assert dt.expire() == 4
+    assert len(dt) == 0 and dt.lookup(ts=103) == []
+    dt.extend([(200, 'z'), (201, 'z')])
+    assert dt.lookup(ts=201) == [(201, 'z')]
+    assert dt.filter(lambda row: row.ts > 200).count == 1
+
+
+def test_retention_by_size():
+    dt = DataTable(colnames=('C0', 'C1'))
+    dt.set_retention(Retention(max_bytes='1 KB'))
+    for i in range(100):
+        dt.append((i, 'value %i' % i))
+    assert dt[-1] == (99, 'value 99')
+    assert 0 < len(dt) < 100
+    assert dt.memory_usage()['total'] < 2048
+    size = len(dt)
+    dt[-1] = (99, 'x' * 500)
+    dt.append((100, 'value 100'))
+    assert len(dt) < size
+    dt.set_retention(None)
+    dt.extend((i, 'value') for i in range(100))
+    assert len(dt) > 100
+
+
+def test_retention_on_access():
+    clock = FakeClock(10)
+    expired = []
+    dt = DataTable(*[(t,) for t in range(11)], colnames=('ts',),
+                   retention=Retention(max_age=5, column='ts', clock=clock))
+    dt.events.onExpire.append(expired.append)
+    assert len(dt) == 6
+    # Without writes, the rows expire when the table is read.
+    clock.now = 13
+    assert list(dt) == [(8,), (9,), (10,)]
+    clock.now = 15
+    assert len(dt) == 1
+    assert expired == [[(5,), (6,), (7,)], [(8,), (9,)]]
+
+
+def test_retention_interval():
+    clock = FakeClock(10)
+    retention = Retention(max_age=1, column='ts', interval=5, clock=clock)
+    dt = DataTable(colnames=('ts',), retention=retention)
+    dt.extend([(8,), (9,), (10,)])
+    assert list(dt) == [(9,), (10,)]
+    # Not checked again until the interval elapses.
+    clock.now = 12
+    dt.append((12,))
+    assert len(dt) == 3
+    clock.now = 15
+    dt.append((15,))
+    assert list(dt) == [(15,)]
+    assert repr(retention) == ("Retention(max_age=1, column='ts', "
+                               "interval=5)")
+    dt.set_retention(None)
+    assert dt.retention is None
+
+
+def test_retention_errors():
+    with pytest.raises(ValueError):
+        Retention()
+    with pytest.raises(ValueError):
+        Retention(max_age=10)
+    with pytest.raises(DataTableColumnError):
+        DataTable(colnames=('C0',), retention=Retention(max_age=1,
+                                                         column='C1'))
+    with pytest.raises(DataTableError):
+        DataTable(colnames=('C0',), storage='columnar',
+                  retention=Retention(max_bytes=10))
+
+
+###############################################################################
+# Test section: Distinct views
+###############################################################################
+
+
+def test_distinct_view(raw_container):
+    dt = raw_container
+    view = dt.distinct_view('gender')
+    assert view.count == 2 and view.dup_count == 23
+    assert list(view) == [('Female',), ('Male',)]
+    assert view[('Male',)] == 14
+    dt.append(('26', 'Ann', 'Lee', 'alee@x.org', 'Other', '1.1.1.1'))
+    assert view.count == 3 and ('Other',) in view
+    assert list(dt.distinct('gender')) == list(view)
+    dt.extend([('27', 'Bo', 'Li', 'bli@x.org', 'Other', '1.1.1.2')] * 2)
+    assert view[('Other',)] == 3 and view.dup_count == 25
+    assert sorted(view.dup()).count(('Other',)) == 2
+    # Reference counts follow deletes and updates.
+    del dt[-3:]
+    assert view.count == 2 and ('Other',) not in view
+    assert not view.ordered
+    dt[0] = dt[0][:4] + ('Other',) + dt[0][5:]
+    assert view[('Female',)] == 10 and view[('Other',)] == 1
+    assert sorted(dt.distinct('gender')) == sorted(view)
+    assert dt.distinct_view('gender') is view
+    # Derived objects do not feed the view.
+    dt.filter(lambda row: row.gender == 'Male')
+    assert view.size == len(dt)
+    view.close()
+    dt.append(dt[0])
+    assert view.size == len(dt) - 1
+    assert dt.distinct_view('gender') is not view
+
+
+def test_distinct_view_rows():
+    dt = DataTable(colnames=('C0', 'C1'), capacity=3, overflow='evict_oldest')
+    view = dt.distinct_view()
+    dt.extend([(1, 1), (1, 1), (2, 2)])
+    assert view.count == 2 and view.dup() == [(1, 1)]
+    dt.append((3, 3))
+    assert view.count == 3 and view.dup_count == 0
+    dt.insert(1, (0, 0))
+    assert list(dt) == [(0, 0), (2, 2), (3, 3)]
+    assert view.count == 3 and view.dup_count == 0
+    assert sorted(dt.distinct()) == sorted(view)
+
+
+def test_distinct_view_dup(monkeypatch):
+    from .. import datatables
+    dt = DataTable(*[(x,) for x in 'abcaba'], colnames=('C0',))
+    view = dt.distinct_view('C0')
+    expected = list(dt.dup('C0'))
+    assert expected == [('a',), ('b',), ('a',)]
+    # Answered from the view, in row order.
+    monkeypatch.setattr(datatables, 'f_dup', None)
+    assert view.dup() == expected
+    assert list(dt.dup('C0')) == expected
+    rows = dt.distinct('C0')
+    dt.append(('d',))
+    assert list(rows) == [('a',), ('b',), ('c',)]
+    del dt[0]
+    assert view.dup() == [('a',), ('b',)]
+
+
+###############################################################################
+# Test section: Fingerprints
+###############################################################################
+
+
+def test_distinct_fingerprint(raw_container):
+    dt = raw_container
+    for bits in (64, 128):
+        for verify in (False, True):
+            kwargs = dict(fingerprint=bits, verify=verify)
+            assert list(dt.distinct(**kwargs)) == list(dt.distinct())
+            assert list(dt.distinct('first_name', **kwargs)) == \
+                list(dt.distinct('first_name'))
+            assert list(dt.dup('first_name', **kwargs)) == \
+                list(dt.dup('first_name'))
+    with pytest.raises(DataTableError):
+        dt.distinct(fingerprint=32)
+    with pytest.raises(DataTableError):
+        dt.dup(wrong=True)
+    with pytest.raises(DataTableColumnError):
+        dt.distinct('wrong', fingerprint=64)
+
+
+def test_fingerprint_set():
+    from .._fingerprints import FingerprintSet
+    rows = [(i % 3000, 'x') for i in range(10000)]
+    seen = FingerprintSet(128, source=rows.__getitem__)
+    added = [seen.add(row, pos) for pos, row in enumerate(rows)]
+    assert len(seen) == sum(added) == 3000
+    assert seen.nbytes() == (16 + array.array('l').itemsize) * 8192
+
+
+def test_fingerprint_collisions(monkeypatch):
+    from .. import _fingerprints
+    # Every key with the same fingerprint.
+    monkeypatch.setattr(_fingerprints, 'fingerprint',
+                        lambda key, bits: '\7' * (bits // 8))
+    dt = DataTable(*matrix_1)
+    assert len(dt.distinct(fingerprint=64)) == 1
+    assert list(dt.distinct(fingerprint=64, verify=True)) == matrix_1
+    assert len(dt.dup(fingerprint=64, verify=True)) == 0
+
+
+def test_fingerprint_hash_collisions():
+    # Equal Python hashes, different fingerprints.
+    dt = DataTable((-1,), (-2,), (3,))
+    for bits in (64, 128):
+        assert list(dt.distinct(fingerprint=bits)) == [(-1,), (-2,), (3,)]
+        assert len(dt.dup(fingerprint=bits)) == 0
+    dt = DataTable((1, 2 ** 64), (1, 1), (1, 1.0), (u'a', 'x'), ('a', 'x'))
+    assert list(dt.distinct(fingerprint=128)) == list(dt.distinct())
+    assert list(dt.dup(fingerprint=64)) == list(dt.dup())
@@ -1,5 +1,6 @@
 
 from __future__ import print_function
+from array import array
 from sys import getsizeof, stderr
 from itertools import chain
 from collections import deque
@@ -48,10 +49,26 @@ def total_size(o, handlers={}, verbose=False, readable_output=True):
         if verbose:
             print(s, type(o), repr(o), file=stderr)
 
-        for typ, handler in all_handlers.items():
-            if isinstance(o, typ):
-                s += sum(map(sizeof, handler(o)))
-                break
+        typ = type(o)
+        if typ in LEAF_TYPES and typ not in all_handlers:
+            return s
+        # Exact type first, the isinstance loop is only for subclasses.
+        handler = all_handlers.get(typ)
+        if handler is None:
+            for typ, handler in all_handlers.items():
+                if isinstance(o, typ):
+                    break
+            else:
+                return s
+        if (typ is tuple and handler is iter and not verbose and
+                all(type(x) in LEAF_TYPES for x in o)):
+            # Flat tuples (rows): no recursive calls.
+            for x in o:
+                if id(x) not in seen:
+                    seen.add(id(x))
+                    s += getsizeof(x)
+            return s
+        s += sum(map(sizeof, handler(o)))
         return s
 
     if readable_output:
@@ -59,6 +76,11 @@ def total_size(o, handlers={}, verbose=False, readable_output=True):
     return sizeof(o)
 
 
+# Types without references to other objects ('getsizeof' is their size).
+LEAF_TYPES = frozenset([type(None), bool, int, long, float, complex, str,
+                        unicode, bytearray, array])
+
+
 def sizeof_fmt(num, suffix='B'):
     """Format size data in human readable."""
     #TODO(alexmarco): put credits of this function (stackoverflow).
@@ -118,3 +140,14 @@ def size_fmt(nbytes):
         i += 1
     f = ('%.2f' % nbytes).rstrip('0').rstrip('.')
     return '%s %s' % (f, suffixes[i])
+
+
+def parse_size(size):
+    """Return the number of bytes of a size like '512 MB' (see 'size_fmt')."""
+    if isinstance(size, (int, long)):
+        return size
+    text = size.strip().upper()
+    for i, suffix in reversed(list(enumerate(suffixes))):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * 1024 ** i)
+    return int(float(text))